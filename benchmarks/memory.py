@@ -0,0 +1,90 @@
+"""
+Compares the memory used by Article and CompactArticle instances.
+
+    python -m benchmarks.memory                    # synthetic articles
+    python -m benchmarks.memory ./saved/articles   # saved articles
+"""
+import sys
+import gc
+import glob
+import json
+import os
+import random
+import time
+import tracemalloc
+from util.classes import Article, CompactArticle
+
+
+def synthetic_article_dicts(num_articles=20000, links_per_article=150, num_categories=22, seed=0):
+    """
+    Generate article dicts in the saved json format. Links point into a pool of titles which is
+    larger than the number of articles, like relations to articles that have not been saved.
+    :return: list of article dicts
+    """
+    rng = random.Random(seed)
+    pool = [f"Synthetic_article_{i}" for i in range(num_articles * 4)]
+    categories = [f"Category:Synthetic_category_{i}" for i in range(num_categories)]
+    dicts = []
+    for i in range(num_articles):
+        dicts.append({
+            "type": "Article",
+            "autosave": False,
+            "title": pool[i],
+            "source": rng.sample(pool[:100], 2),
+            "root categories": rng.sample(categories, 1),
+            "related categories": rng.sample(categories, rng.randint(1, 4)),
+            "relations": rng.sample(pool, links_per_article),
+        })
+    return dicts
+
+
+def saved_article_dicts(save_dir):
+    dicts = []
+    for file in glob.glob(os.path.join(save_dir, "*.json")):
+        with open(file, "r") as json_file:
+            dicts.append(json.load(json_file))
+    return dicts
+
+
+def measure(cls, serialized):
+    """
+    Parse serialized article dicts, create instances of cls and measure the memory the instances keep alive
+    (including the title strings, which are parsed inside the measurement like when loading json files)
+    :param cls: Article or CompactArticle
+    :param serialized: json list of article dicts
+    :return: (bytes in use, seconds)
+    """
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    instances = [cls.from_dict(data) for data in json.loads(serialized)]
+    duration = time.perf_counter() - start
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del instances
+    return current, duration
+
+
+def run(dicts):
+    """
+    :return: dict mapping mode name to {"bytes": ..., "seconds": ...}
+    """
+    serialized = json.dumps(dicts)
+    results = {}
+    for name, cls in (("Article", Article), ("CompactArticle", CompactArticle)):
+        current, duration = measure(cls, serialized)
+        results[name] = {"bytes": current, "seconds": duration}
+    return results
+
+
+if __name__ == "__main__":
+
+    dicts = saved_article_dicts(sys.argv[1]) if len(sys.argv) > 1 else synthetic_article_dicts()
+    num_relations = sum(len(data["relations"]) for data in dicts)
+    print(f"{len(dicts)} articles, {num_relations} relations")
+
+    results = run(dicts)
+    for name, result in results.items():
+        print(f"{name.ljust(15)}: {result['bytes'] / 1024 ** 2:8.1f} MB, {result['seconds']:6.2f} s")
+    print(f"-> CompactArticle uses {results['CompactArticle']['bytes'] / results['Article']['bytes']:.1%} of the memory")
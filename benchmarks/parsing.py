@@ -0,0 +1,93 @@
+"""
+Compares the streaming extractor (util.html_extract) with the former BeautifulSoup based extraction.
+
+    python -m benchmarks.parsing [directory with saved .html pages]
+
+Without argument, the bodies in the response cache (saved/http_cache/bodies) are used as sample pages.
+"""
+import sys
+import os
+import re
+import glob
+import time
+from bs4 import BeautifulSoup
+from util.html_extract import WikiPageExtractor, url_encode
+from util.http_cache import get_default_cache_dir
+
+
+def legacy_extract(html):
+    """ links and categories the way extract_wikipedia_links and get_categories extracted them before """
+    soup = BeautifulSoup(html, 'html.parser')
+    links = set()
+    for link in soup.find_all('a'):
+        href = link.get('href')
+        if href and re.match(r'^/wiki/[^:]+$', href):
+            links.add(url_encode(href.replace("/wiki/", "").split("#", 1)[0]))
+    categories = []
+    categories_section = soup.find(id='mw-normal-catlinks')
+    if categories_section:
+        for link in categories_section.find_all('a'):
+            if link.text != 'Categories':
+                categories.append(link.text)
+    return links, categories
+
+
+def streaming_extract(html):
+    extractor = WikiPageExtractor(("content", "categories")).extract(html)
+    return extractor.links, extractor.categories
+
+
+def load_pages(directory=None):
+    """
+    :param directory: directory with .html files. Default: bodies of the response cache which look like wiki pages
+    :return: list of html strings
+    """
+    if directory is not None:
+        files = glob.glob(os.path.join(directory, "*.html"))
+    else:
+        files = glob.glob(os.path.join(get_default_cache_dir(), "bodies", "*", "*"))
+    pages = []
+    for file in files:
+        with open(file, "rb") as html_file:
+            html = html_file.read().decode("utf-8", errors="replace")
+        if 'id="mw-content-text"' in html:
+            pages.append(html)
+    return pages
+
+
+def pages_per_second(extract, pages, min_seconds=2.0):
+    """ :return: pages/second of an extraction function, running over the pages for at least min_seconds """
+    count = 0
+    start = time.perf_counter()
+    while True:
+        for html in pages:
+            extract(html)
+        count += len(pages)
+        duration = time.perf_counter() - start
+        if duration >= min_seconds:
+            return count / duration
+
+
+def run(pages):
+    """
+    :return: dict mapping extractor name to pages/second
+    """
+    return {
+        "beautifulsoup": pages_per_second(legacy_extract, pages),
+        "streaming": pages_per_second(streaming_extract, pages),
+    }
+
+
+if __name__ == "__main__":
+
+    pages = load_pages(sys.argv[1] if len(sys.argv) > 1 else None)
+    if not pages:
+        print("No sample pages found.")
+        sys.exit(1)
+    size = sum(map(len, pages)) / len(pages)
+    print(f"{len(pages)} sample pages, {size / 1024:.0f} kB on average")
+
+    results = run(pages)
+    for name, result in results.items():
+        print(f"{name.ljust(15)}: {result:8.1f} pages/s")
+    print(f"-> streaming extractor is {results['streaming'] / results['beautifulsoup']:.1f}x faster")
@@ -0,0 +1,186 @@
+"""
+Offline benchmark suite. Every run serves a synthetic wiki (benchmarks.synthetic_wiki) on localhost and measures,
+for several dataset scales:
+    crawl:         pages/s of fill-style crawling with the html and the api backend (response cache disabled)
+    parse:         pages/s and MB/s of the streaming extractor
+    load:          seconds and MB of load_all_articles (Article and CompactArticle) from json files
+    cooccurrence:  seconds of the category co-occurrence matrix
+
+    python -m benchmarks.suite                              # all scales, results in benchmarks/results.json
+    python -m benchmarks.suite small medium -o out.json     # selected scales, other output file
+
+If the output file exists, the new results are compared with it before it is replaced.
+"""
+import os
+import gc
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import tracemalloc
+from datetime import datetime, timezone
+from benchmarks.synthetic_wiki import SyntheticWiki, WikiServer
+from util import scraping
+from util.scraping import fetch_many, fetch_page, fetch_pages, set_wiki_base, set_backend, set_cache, set_scheduler
+from util.scheduler import RequestScheduler
+from util.html_extract import WikiPageExtractor
+from util.classes import Article, load_all_articles, set_store, titles_table, _fetch_chunks
+from util.cooccurrence import cooccurrence
+
+# name -> SyntheticWiki parameters and number of pages crawled per backend
+SCALES = {
+    "small": {"num_articles": 1000, "links_per_article": 50, "num_categories": 22, "crawl_pages": 300},
+    "medium": {"num_articles": 5000, "links_per_article": 100, "num_categories": 50, "crawl_pages": 1000},
+    "large": {"num_articles": 20000, "links_per_article": 150, "num_categories": 100, "crawl_pages": 2000},
+}
+
+DEFAULT_OUTPUT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results.json")
+
+
+def bench_crawl(wiki, num_pages, concurrency=16):
+    """ :return: pages/s of the html backend (one page per request) and the api backend (50 titles per request) """
+    titles = wiki.titles[:num_pages]
+    results = {}
+    with WikiServer(wiki) as server:
+        set_wiki_base(server.url)
+        set_cache(None)
+        # a scheduler whose limits are never reached, so only its overhead is measured
+        set_scheduler(RequestScheduler(rate=1e6, initial_concurrency=concurrency, max_concurrency=concurrency))
+        for backend in ("html", "api"):
+            set_backend(backend)
+            start = time.perf_counter()
+            if backend == "html":
+                fetched = fetch_many(titles, fetch_page, concurrency=concurrency)
+            else:
+                fetched = _fetch_chunks(titles, fetch_pages, concurrency=concurrency)
+            duration = time.perf_counter() - start
+            failed = sum(result.error is not None or result.result.status != "ok" for result in fetched.values())
+            results[backend] = {"pages_per_second": len(titles) / duration, "seconds": duration, "failed": failed}
+    set_backend("html")
+    return results
+
+
+def bench_parse(wiki, num_pages=200, min_seconds=1.0):
+    """ :return: pages/s and MB/s of the streaming extractor over generated pages """
+    pages = [wiki.article_html(article) for article in range(min(num_pages, len(wiki.titles)))]
+    size = sum(map(len, pages))
+    count = 0
+    start = time.perf_counter()
+    while True:
+        for html in pages:
+            WikiPageExtractor(("content", "categories"), title=True).extract(html)
+        count += 1
+        duration = time.perf_counter() - start
+        if duration >= min_seconds:
+            break
+    return {"pages_per_second": count * len(pages) / duration, "mb_per_second": count * size / duration / 1024 ** 2,
+            "page_kb": size / len(pages) / 1024}
+
+
+def _measure_load(directory, compact):
+    # every load starts with an empty title table, like the first load of a process. Otherwise compact articles
+    # would find their titles already interned by an earlier load (or scale) and their memory would be under-reported.
+    gc.collect()
+    titles_table.clear()
+    start = time.perf_counter()
+    articles = load_all_articles(directory, autosave=False, compact=compact)
+    duration = time.perf_counter() - start
+    del articles
+    gc.collect()
+    titles_table.clear()
+
+    tracemalloc.start()
+    articles = load_all_articles(directory, autosave=False, compact=compact)
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"seconds": duration, "mb": current / 1024 ** 2, "articles": len(articles)}
+
+
+def bench_load(wiki):
+    """ :return: time and memory of load_all_articles from a directory of json files """
+    directory = tempfile.mkdtemp(prefix="wiki_bench_")
+    try:
+        for data in wiki.article_dicts():
+            with open(os.path.join(directory, f"{data['title']}.json"), "w") as file:
+                json.dump(data, file)
+        return {"Article": _measure_load(directory, compact=False),
+                "CompactArticle": _measure_load(directory, compact=True)}
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def bench_cooccurrence(wiki):
+    """ :return: seconds to build the co-occurrence matrix of all categories """
+    articles = [Article.from_dict(data) for data in wiki.article_dicts()]
+    start = time.perf_counter()
+    matrix = cooccurrence(articles, wiki.categories)
+    return {"seconds": time.perf_counter() - start, "categories": len(matrix)}
+
+
+def run(scales):
+    """ :return: results dict of the selected scale names """
+    set_store(None)
+    base, cache, scheduler = scraping.WIKI_BASE, scraping._cache, scraping._scheduler
+    results = {}
+    try:
+        for name in scales:
+            parameters = dict(SCALES[name])
+            crawl_pages = parameters.pop("crawl_pages")
+            print(f"{name}: generating {parameters['num_articles']} articles")
+            wiki = SyntheticWiki(**parameters)
+            results[name] = {
+                "parameters": SCALES[name],
+                "crawl": bench_crawl(wiki, crawl_pages),
+                "parse": bench_parse(wiki),
+                "load": bench_load(wiki),
+                "cooccurrence": bench_cooccurrence(wiki),
+            }
+            print(json.dumps(results[name], indent=4))
+    finally:
+        set_wiki_base(base)
+        set_cache(cache)
+        set_scheduler(scheduler)
+    return results
+
+
+def _flatten(results, prefix=""):
+    values = {}
+    for key, value in results.items():
+        if isinstance(value, dict):
+            values.update(_flatten(value, f"{prefix}{key}."))
+        elif isinstance(value, float):
+            values[f"{prefix}{key}"] = value
+    return values
+
+
+def compare(previous, current):
+    """ print the relative change of every measured value which both results contain """
+    old, new = _flatten(previous.get("scales", {})), _flatten(current["scales"])
+    for key in sorted(old.keys() & new.keys()):
+        if old[key]:
+            print(f"{key.ljust(50)} {old[key]:12.3f} -> {new[key]:12.3f} ({new[key] / old[key] - 1:+.1%})")
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Offline benchmarks against a synthetic wiki")
+    parser.add_argument("scales", nargs="*", default=list(SCALES), choices=list(SCALES))
+    parser.add_argument("-o", "--output", default=DEFAULT_OUTPUT, help="json file for the results")
+    args = parser.parse_args()
+
+    results = {
+        "created": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "scales": run(args.scales),
+    }
+
+    if os.path.exists(args.output):
+        with open(args.output, "r") as file:
+            compare(json.load(file), results)
+    with open(args.output, "w") as file:
+        json.dump(results, file, indent=4)
+    print(f"Results written to {args.output}")
@@ -0,0 +1,240 @@
+"""
+Synthetic stand-in for wikipedia: generated article pages, category pages and api.php answers,
+served by a local http server. Point the scraping functions at it with util.scraping.set_wiki_base(server.url).
+
+    python -m benchmarks.synthetic_wiki [num_articles] [port]    # serve a synthetic wiki until interrupted
+"""
+import sys
+import json
+import random
+import threading
+from html import escape
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs, unquote
+
+# maximum number of links or members per api response, like the api limit for normal users
+API_LIMIT = 500
+
+
+class SyntheticWiki:
+    """
+    Deterministic synthetic wiki. Article i links to links_per_article random articles and belongs to
+    categories_per_article of num_categories categories. Categories form a tree below Category:Synthetic_root
+    (category i has the subcategories 2i + 1 and 2i + 2).
+    """
+    def __init__(self, num_articles=1000, links_per_article=100, num_categories=22, categories_per_article=2,
+                 padding=20000, seed=0):
+        """
+        :param num_articles: number of articles
+        :param links_per_article: number of links in the content of each article
+        :param num_categories: number of categories
+        :param categories_per_article: number of categories of each article
+        :param padding: number of bytes of navigation and text around the links, real pages are mostly markup
+        :param seed: random seed, equal parameters generate the same wiki
+        """
+        rng = random.Random(seed)
+        self.titles = [f"Synthetic_article_{i}" for i in range(num_articles)]
+        self.ids = {title: i for i, title in enumerate(self.titles)}
+        self.categories = [f"Category:Synthetic_category_{i}" for i in range(num_categories)]
+        self.links = [rng.sample(range(num_articles), min(links_per_article, num_articles)) for _ in range(num_articles)]
+        self.article_categories = [rng.sample(range(num_categories), min(categories_per_article, num_categories))
+                                   for _ in range(num_articles)]
+        self.members = [[] for _ in range(num_categories)]
+        for article, categories in enumerate(self.article_categories):
+            for category in categories:
+                self.members[category].append(article)
+        self.padding = padding
+
+    def subcategories(self, category):
+        """ :return: category ids of the subcategories of a category id, -1 is the root """
+        children = (0,) if category == -1 else (2 * category + 1, 2 * category + 2)
+        return [child for child in children if child < len(self.categories)]
+
+    def category_id(self, title):
+        title = title.replace(" ", "_")
+        if title == "Category:Synthetic_root":
+            return -1
+        if title.startswith("Category:Synthetic_category_"):
+            category = int(title.rsplit("_", 1)[1])
+            if category < len(self.categories):
+                return category
+        return None
+
+    def article_html(self, article):
+        """ :return: rendered page of an article id, structured like a wikipedia page """
+        title = self.titles[article]
+        filler = "<p>" + "Lorem ipsum dolor sit amet. " * (self.padding // 56) + "</p>"
+        links = "".join(f'<li><a href="/wiki/{self.titles[target]}" title="{self.titles[target]}">'
+                        f'{self.titles[target].replace("_", " ")}</a></li>' for target in self.links[article])
+        categories = "".join(f'<li><a href="/wiki/{self.categories[category]}">'
+                             f'{self.categories[category][len("Category:"):].replace("_", " ")}</a></li>'
+                             for category in self.article_categories[article])
+        return (f'<!DOCTYPE html><html><head><title>{title} - Wikipedia</title>'
+                f'<link rel="canonical" href="https://en.wikipedia.org/wiki/{title}">'
+                f'<script>RLCONF={{"wgCurRevisionId":{1000 + article},"wgTitle":"{title}"}};</script></head><body>'
+                f'<div id="mw-navigation"><a href="/wiki/Main_Page">Main page</a>{filler}</div>'
+                f'<h1 id="firstHeading">{escape(title.replace("_", " "))}</h1>'
+                f'<div id="bodyContent"><div id="mw-content-text"><div class="mw-parser-output">{filler}'
+                f'<ul>{links}</ul>{filler}</div></div>'
+                f'<div id="catlinks"><div id="mw-normal-catlinks"><a href="/wiki/Help:Category">Categories</a>'
+                f'<ul>{categories}</ul></div></div></div></body></html>')
+
+    def category_html(self, category):
+        """ :return: rendered category page listing the members of a category id """
+        title = self.categories[category]
+        members = "".join(f'<li><a href="/wiki/{self.titles[article]}">{self.titles[article]}</a></li>'
+                          for article in self.members[category][:200])
+        return (f'<!DOCTYPE html><html><head><title>{title}</title></head><body>'
+                f'<div id="mw-navigation"><a href="/wiki/Main_Page">Main page</a></div>'
+                f'<h1 id="firstHeading">{escape(title.replace("_", " "))}</h1>'
+                f'<div id="mw-content-text"><div id="mw-pages"><ul>{members}</ul></div></div></body></html>')
+
+    def page(self, title):
+        """ :return: (status code, html) of /wiki/<title> """
+        title = unquote(title)
+        if title in self.ids:
+            return 200, self.article_html(self.ids[title])
+        category = self.category_id(title)
+        if category is not None and category >= 0:
+            return 200, self.category_html(category)
+        return 404, "<html><body>Wikipedia does not have an article with this exact name.</body></html>"
+
+    def api(self, params):
+        """ :return: api.php answer (dict) for action=query requests with titles or list=categorymembers """
+        if params.get("list") == "categorymembers":
+            return self._category_members(params)
+        titles = [title for title in params.get("titles", "").split("|") if title]
+        props = set(params.get("prop", "").split("|"))
+        offset = int(params.get("plcontinue", 0))
+
+        pages, pairs = [], []
+        for title in titles:
+            article = self.ids.get(title.replace(" ", "_"))
+            if article is None:
+                pages.append({"title": title, "missing": True})
+                continue
+            page = {"pageid": article + 1, "ns": 0, "title": title}
+            if "info" in props:
+                page.update(lastrevid=1000 + article, touched="2024-01-01T00:00:00Z")
+            if "categories" in props and offset == 0:
+                page["categories"] = [{"ns": 14, "title": self.categories[category].replace("_", " ")}
+                                      for category in self.article_categories[article]]
+            pages.append(page)
+            if "links" in props:
+                pairs.extend((page, target) for target in self.links[article])
+
+        data = {"batchcomplete": True, "query": {"pages": pages}}
+        if "links" in props:
+            for page, target in pairs[offset:offset + API_LIMIT]:
+                page.setdefault("links", []).append({"ns": 0, "title": self.titles[target].replace("_", " ")})
+            if offset + API_LIMIT < len(pairs):
+                data["continue"] = {"plcontinue": str(offset + API_LIMIT), "continue": "||"}
+        return data
+
+    def _category_members(self, params):
+        category = self.category_id(params.get("cmtitle", ""))
+        if category is None:
+            return {"query": {"categorymembers": []}}
+        if params.get("cmtype") == "subcat":
+            members = [self.categories[child].replace("_", " ") for child in self.subcategories(category)]
+        else:
+            members = [self.titles[article].replace("_", " ") for article in self.members[category]] if category >= 0 else []
+        offset = int(params.get("cmcontinue", 0))
+        data = {"query": {"categorymembers": [{"title": title} for title in members[offset:offset + API_LIMIT]]}}
+        if offset + API_LIMIT < len(members):
+            data["continue"] = {"cmcontinue": str(offset + API_LIMIT), "continue": "-||"}
+        return data
+
+    def article_dicts(self):
+        """ :return: the articles in the saved json format, filled from this wiki """
+        return [{
+            "type": "Article",
+            "autosave": False,
+            "title": title,
+            "source": [],
+            "root categories": [self.categories[self.article_categories[i][0]]],
+            "related categories": [self.categories[category] for category in self.article_categories[i]],
+            "relations": [self.titles[target] for target in self.links[i]],
+        } for i, title in enumerate(self.titles)]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path.startswith("/wiki/"):
+            status, body = self.server.wiki.page(url.path[len("/wiki/"):])
+            self._send(status, body.encode("utf-8"), "text/html; charset=UTF-8")
+        elif url.path == "/w/api.php":
+            params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+            self._send(200, json.dumps(self.server.wiki.api(params)).encode("utf-8"), "application/json")
+        else:
+            self._send(404, b"", "text/plain")
+
+    def do_HEAD(self):
+        url = urlsplit(self.path)
+        status = self.server.wiki.page(url.path[len("/wiki/"):])[0] if url.path.startswith("/wiki/") else 404
+        self.send_response(status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def _send(self, status, body, content_type):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class WikiServer:
+    """
+    Serves a SyntheticWiki on localhost from a background thread:
+
+        with WikiServer(SyntheticWiki(1000)) as server:
+            set_wiki_base(server.url)
+    """
+    def __init__(self, wiki, port=0):
+        """
+        :param wiki: SyntheticWiki
+        :param port: port to listen on. Default: any free port
+        """
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), _Handler)
+        self.server.daemon_threads = True
+        self.server.wiki = wiki
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, name="synthetic-wiki", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+
+if __name__ == "__main__":
+
+    num_articles = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    port = int(sys.argv[2]) if len(sys.argv) > 2 else 8000
+    server = WikiServer(SyntheticWiki(num_articles), port=port)
+    print(f"Serving {num_articles} synthetic articles on {server.url}")
+    try:
+        server.server.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
@@ -1,56 +1,36 @@
 """
 This script contains several functions used to count certain values of multiple articles or categories
+All functions take either a list of articles or a CategoryIndex built from them.
+When running several counts on the same articles, build the index once and pass it to every function.
 """
 import matplotlib.pyplot as plt
 from util.classes import *
+from util.category_index import CategoryIndex
 
-def count_articles_by_root_cats(articles):
-    count_dict = {}  # Dictionary to store the count for each number of root categories
 
-    for article in articles:
-        num_root_cats = len(article.root_cats)  # Calculate the number of root categories for the article
+def get_index(articles):
+    """ :return: articles if they already are a CategoryIndex, else a new index built from them """
+    return articles if isinstance(articles, CategoryIndex) else CategoryIndex(articles)
 
-        if num_root_cats in count_dict:
-            count_dict[num_root_cats] += 1
-        else:
-            count_dict[num_root_cats] = 1
 
-    return count_dict
+def count_articles_by_root_cats(articles):
+    # Dictionary with the number of articles for each number of root categories
+    return get_index(articles).histogram("root_cats")
 
 
 def count_articles_by_related_cats(articles):
-    count_dict = {}  # Dictionary to store the count for each number of root categories
-
-    for article in articles:
-        num_related_cats = len(article.related_cats)  # Calculate the number of root categories for the article
-
-        if num_related_cats in count_dict:
-            count_dict[num_related_cats] += 1
-        else:
-            count_dict[num_related_cats] = 1
-
-    return count_dict
+    # Dictionary with the number of articles for each number of related categories
+    return get_index(articles).histogram("related_cats")
 
 
 def count_relations(articles):
-    num_relations = 0
-    individual_relations = set()
-    for article in articles:
-        num_relations += len(article.relations)
-        individual_relations.update(article.relations)
-    print(f"{num_relations} Links leading to {len(individual_relations)} individual articles.")
+    index = get_index(articles)
+    print(f"{index.total('relations')} Links leading to {index.num_unique_relations} individual articles.")
 
 
 def count_sources(articles, prt=True):
-    count_dict = {}  # Dictionary to store the count for each number of root categories
-
-    for article in articles:
-        num_sources = len(article.source)  # Calculate the number of root categories for the article
-
-        if num_sources in count_dict:
-            count_dict[num_sources] += 1
-        else:
-            count_dict[num_sources] = 1
+    # Dictionary with the number of articles for each number of sources
+    count_dict = get_index(articles).histogram("source")
 
     if prt:
         for num_sources, count in count_dict.items():
@@ -61,12 +41,7 @@ def count_sources(articles, prt=True):
 
 def count_cat_occurrences_in_articles(categories, articles, prt=True):
 
-    count_dict = {category.title: 0 for category in categories}
-
-    for article in tqdm.tqdm(articles, desc="Counting category occurrences in articles"):
-        for category in [c.title for c in categories]:
-            if category in article.related_cats:
-                count_dict[category] += 1
+    count_dict = get_index(articles).occurrences(categories)
 
     if prt:
         for num_cat_occs, count in count_dict.items():
@@ -81,6 +56,8 @@ if __name__ == "__main__":
     categories = load_all_categories("./saved/categories", autosave=False)
     root_articles = load_all_articles("./saved/_root_articles", autosave=False)
     articles = load_all_articles("./saved/articles", autosave=False)
+    # single pass over all articles, every count below is answered from the index
+    article_index = CategoryIndex(articles)
 
     """ get number of root categories """
     # article_count_by_root_cats = count_articles_by_root_cats(articles)
@@ -91,15 +68,15 @@ if __name__ == "__main__":
     # count_relations(articles)
 
     """ get number of related categories """
-    article_count_by_related_cats = count_articles_by_related_cats(articles)
+    article_count_by_related_cats = count_articles_by_related_cats(article_index)
     # for num_related_cats, count in article_count_by_related_cats.items():
     #     print(f"Articles with {num_related_cats} related categories: {count}")
 
     """ get number of related categories """
-    article_count_by_related_cats = count_sources(articles, prt=True)
+    article_count_by_related_cats = count_sources(article_index, prt=True)
 
     """ get number of category occurrences in articles """
-    ncaia = count_cat_occurrences_in_articles(categories, articles)
+    ncaia = count_cat_occurrences_in_articles(categories, article_index)
 
     # fig, ax = plt.subplots(figsize=(10, 6))
     # bars = ax.barh(list(ncaia.keys())[::-1], list(ncaia.values())[::-1], color='blue')
@@ -1,8 +1,10 @@
 import glob
 import os
-import tqdm
-from util.classes import Category, Article
+from util.classes import Category, create_articles, creation_outcome
 from util.category_scraper import get_direct_subcategories, get_pages_in_category
+from util.journal import CrawlJournal, get_default_journal_path
+from util.metrics import metrics
+from util.scraping import get_cache
 
 
 if __name__ == "__main__":
@@ -10,7 +12,14 @@ if __name__ == "__main__":
     category_save_dir = "./saved/categories"
     category_json_files = glob.glob(os.path.join(category_save_dir, "*.json"))
     categories = []
-    articles = []
+
+    # request, parse and store metrics of the run, every minute and at the end
+    metrics.export_every("./saved/metrics/create_articles.prom", interval=60)
+    metrics.export_on_exit("./saved/metrics/create_articles.json")
+
+    # (root category, title) pairs which are done or missing are skipped, failed ones are retried on a rerun
+    journal = CrawlJournal(get_default_journal_path("create_articles"))
+    print(journal)
 
     num_articles = 0
     for file in category_json_files:
@@ -18,9 +27,18 @@ if __name__ == "__main__":
         categories.append(current_category)
         num_articles += len(current_category.articles)
 
-        for article in tqdm.tqdm(current_category.articles, desc=f"Fetching articles for {current_category.title}"):
-            articles.append(Article(article, root_cats=current_category.title, autosave=True))
+        def create(keys, root_cat=current_category.title):
+            created = create_articles([key.split("|", 1)[1] for key in keys], root_cats=root_cat, autosave=True)
+            # articles which could not be checked or saved are retried on a rerun, missing pages are not
+            return {key: creation_outcome(article) for key, article in zip(keys, created)}
+
+        num_failed = journal.run((f"{current_category.title}|{title}" for title in current_category.articles), create,
+                                 desc=f"Fetching articles for {current_category.title}")
+
+        print(f"{current_category.title} done! ({len(categories)}/{len(category_json_files)}, {num_failed} failed)")
 
-        print(f"{current_category.title} done! ({len(categories)}/{len(category_json_files)})")
+    journal.close()
+    print(journal)
+    print(get_cache())
 
     pass
@@ -2,60 +2,31 @@
 In this script, data is evaluated.
 Evaluated data is brought into a format that is usable for visualization using Gephi
 """
-import tqdm
-import csv
 import numpy as np
 import matplotlib.pyplot as plt
 from util.classes import load_all_articles, load_all_categories
-from itertools import combinations
-from counting import count_cat_occurrences_in_articles
-from statistics import mean
+from util.cooccurrence import CooccurrenceAccumulator
+from util.export import export_graph
 
 
 if __name__ == "__main__":
 
-    # load all categories and articles instances from JSON files
+    # load all categories instances from JSON files
     categories = load_all_categories("./saved/categories", autosave=False)
-    articles = load_all_articles("./saved/articles", autosave=False)
+    # lazy: the articles are only read if there are no saved counts for these categories yet
+    articles = load_all_articles("./saved/articles", autosave=False, lazy=True)
 
-    category_titles = [category.title.replace("Category:", "") for category in categories]
-    category_titles.sort()
-
-    # create dict with category pairs
-    cat_combs = set(combinations(category_titles, 2))
-    cat_comb_occurrences = {f"{comb[0]}+{comb[1]}": 0 for comb in cat_combs}
-
-    for article in tqdm.tqdm(articles, desc="Evaluating articles"):
-        if len(article.related_cats) > 1:
-            article_related_categories = [r.replace("Category:", "") for r in article.related_cats]
-            article_related_categories.sort()
-
-            article_cat_combs = set(combinations(article_related_categories, 2))
-            article_cat_combs = set(f"{comb[0]}+{comb[1]}" for comb in article_cat_combs)
-            for comb in article_cat_combs:
-                cat_comb_occurrences[comb] += 1
+    # count articles shared by each pair of categories, kept up to date by the crawl scripts
+    cat_comb_occurrences = CooccurrenceAccumulator.load_or_build(articles, categories).matrix()
+    category_titles = cat_comb_occurrences.labels
 
     """ Normalize values """
-    rep = count_cat_occurrences_in_articles(categories, articles)
-    rep_mean = mean([value for value in rep.values()])
-    normalized_cat_comb_occurrences = dict()
-    for comb, value in cat_comb_occurrences.items():
-        # calculate normalization factor
-        comb_list = comb.split("+")
-        cat_a = f"Category:{comb_list[0]}"
-        cat_b = f"Category:{comb_list[1]}"
-        normalization_factor = 1/(rep[cat_a]/rep_mean) + 1/(rep[cat_b]/rep_mean)
-        normalized_cat_comb_occurrences[comb] = cat_comb_occurrences[comb] * normalization_factor
-
-    pass
+    # pair count * (mean occurrences / occurrences of category a + mean occurrences / occurrences of category b)
+    normalized_cat_comb_occurrences = cat_comb_occurrences.normalized("mean")
 
 
     """ Visualize relations in table """
-    value_array = np.array([[0 for _ in range(22)] for _ in range(22)])
-    for cat_pair, value in normalized_cat_comb_occurrences.items():
-        cat_pair = cat_pair.split("+")
-        value_array[category_titles.index(cat_pair[0])][category_titles.index(cat_pair[1])] = value
-        value_array[category_titles.index(cat_pair[1])][category_titles.index(cat_pair[0])] = value
+    value_array = normalized_cat_comb_occurrences.matrix.astype(int)
     # Normalize the data for color mapping
     normalized_value_array = (value_array - np.min(value_array)) / (np.max(value_array) - np.min(value_array))
 
@@ -87,22 +58,9 @@ if __name__ == "__main__":
     plt.show()
 
 
-    """ Create node csv """
-    node_data = [["Id", "Label"]]
-    for i, category in enumerate(category_titles):
-        node_data.append([i, category.replace("Category:", "")])
-    with open("./results/nodes_normalized.csv", "w", newline="") as csvfile:
-        csvwriter = csv.writer(csvfile, delimiter=";")
-        for row in node_data:
-            csvwriter.writerow(row)
-
-    """ Create edge csv """
-    edge_data = [["Source", "Target", "Type", "Weight"]]
-    for key, value in normalized_cat_comb_occurrences.items():
-        source, target = key.split("+")
-        edge_data.append([category_titles.index(source), category_titles.index(target), "Undirected", round(value)])
-    with open("./results/edges_normalized.csv", "w", newline="") as csvfile:
-        csvwriter = csv.writer(csvfile, delimiter=";")
-        for row in edge_data:
-            csvwriter.writerow(row)
-
+    """ Create node and edge csv for Gephi """
+    # streamed from the non-zero pairs, the csv export also writes ./results/edges_normalized.csv
+    for path in ("./results/nodes_normalized.csv", "./results/categories_normalized.gexf"):
+        rounded = ((source, target, round(weight))
+                   for source, target, weight in normalized_cat_comb_occurrences.iter_edges())
+        export_graph(path, enumerate(category_titles), rounded, min_weight=1)
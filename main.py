@@ -5,8 +5,13 @@ if __name__ == "__main__":
 
     root_category = "Fields_of_mathematics"
     subcategories = get_direct_subcategories(root_category)
+    if subcategories is None:
+        raise SystemExit(f"Could not get the subcategories of \"{root_category}\".")
 
     for subcategory in subcategories:
         pages = get_pages_in_category(subcategory)
+        if pages is None:
+            print(f"Skipping \"{subcategory}\": could not get its pages.")
+            continue
         Category(subcategory, pages)
 
@@ -0,0 +1,20 @@
+import sys
+from util.store import ArticleStore
+
+
+if __name__ == "__main__":
+    """
+    Imports all saved json files (saved/categories, saved/articles, saved/_root_articles) into a single sqlite store.
+    Afterwards call util.classes.set_store("./saved/store.sqlite") in a script to work on the store.
+
+    Usage: python migrate_to_store.py [saved_dir] [store_path]
+    """
+
+    saved_dir = sys.argv[1] if len(sys.argv) > 1 else "./saved"
+    store_path = sys.argv[2] if len(sys.argv) > 2 else "./saved/store.sqlite"
+
+    store = ArticleStore(store_path)
+    imported = store.import_json_tree(saved_dir)
+    for directory, count in imported.items():
+        print(f"{directory}: {count} imported")
+    print(store)
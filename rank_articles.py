@@ -0,0 +1,43 @@
+"""
+In this script, the link graph of all saved articles is ranked.
+PageRank, PageRank personalized to the root articles and HITS are computed on the sparse adjacency matrix.
+"""
+from util.classes import load_all_articles, get_store
+from util.graph import LinkGraph
+from util.centrality import adjacency_matrix, pagerank, personalized_pagerank, hits, degree_distribution, top, \
+    get_root_titles
+from util.export import export_link_graph
+
+
+def print_ranking(name, graph, scores, n=20):
+    print(f"\n{name}")
+    for i, (title, score) in enumerate(top(graph, scores, n, saved_only=True)):
+        print(f"{str(i + 1).rjust(3)}. {title.ljust(60)} {score:.6f}")
+
+
+if __name__ == "__main__":
+
+    # build the integer indexed link graph, directly from the store tables if a store is set
+    store = get_store()
+    if store is not None:
+        graph = LinkGraph.from_store(store)
+    else:
+        graph = LinkGraph.from_articles(load_all_articles("./saved/articles", autosave=False, compact=True))
+    print(graph)
+
+    adjacency = adjacency_matrix(graph)
+    print_ranking("PageRank", graph, pagerank(graph, adjacency=adjacency))
+    print_ranking("PageRank personalized to the root articles", graph,
+                  personalized_pagerank(graph, get_root_titles(store=store), adjacency=adjacency))
+    hubs, authorities = hits(graph, adjacency=adjacency)
+    print_ranking("HITS hubs", graph, hubs)
+    print_ranking("HITS authorities", graph, authorities)
+
+    for direction in ("in", "out"):
+        degrees, counts = degree_distribution(graph, direction, saved_only=True)
+        print(f"\n{direction}-degree distribution (degree: number of articles)")
+        print(", ".join(f"{degree}: {count}" for degree, count in zip(degrees[:30], counts[:30])))
+
+    # link graph of the saved articles for Gephi
+    num_nodes, num_edges = export_link_graph(graph, "./results/articles.gexf")
+    print(f"\nExported {num_nodes} articles and {num_edges} links to ./results/articles.gexf")
@@ -0,0 +1,41 @@
+from collections import Counter
+from util.classes import load_all_articles, load_all_categories, refresh_articles
+from util.cooccurrence import CooccurrenceAccumulator
+from util.backlinks import BacklinkIndex
+from util.metrics import metrics
+
+
+if __name__ == "__main__":
+    """
+    Weekly refresh: only root articles whose page has a new revision are downloaded again.
+    Their relations are patched in place, and so are the source and related categories of the related articles.
+    """
+
+    metrics.export_on_exit("./saved/metrics/refresh_articles.json")
+
+    # root articles are saved to their own directory below, not by autosave
+    root_articles = load_all_articles("./saved/_root_articles", autosave=False)
+    articles = load_all_articles("./saved/articles")
+
+    # the related categories of related articles are patched, keep the saved category pair counts up to date
+    categories = load_all_categories("./saved/categories", autosave=False)
+    cooccurrences = CooccurrenceAccumulator.load_or_build(articles, categories)
+    cooccurrences.attach()
+    # the relations of the root articles are patched as well, and with them the saved backlinks
+    root_backlinks = BacklinkIndex.load_or_build(root_articles, save_dir="./saved/_root_articles")
+    root_backlinks.attach()
+    try:
+        states = refresh_articles(root_articles, related={article.title: article for article in articles},
+                                  concurrency=16)
+        for article in root_articles:
+            if states[article.title] == "changed":
+                article.save(filepath="./saved/_root_articles")
+        # only now the saved index matches the saved root articles
+        if root_backlinks.changed:
+            root_backlinks.save()
+    finally:
+        cooccurrences.detach()
+        cooccurrences.save()
+        root_backlinks.detach()
+
+    print(Counter(states.values()))
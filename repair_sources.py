@@ -2,6 +2,7 @@ import os
 import glob
 import tqdm
 from util.classes import load_all_articles, Article
+from util.backlinks import BacklinkIndex, repair_sources
 
 
 if __name__ == "__main__":
@@ -17,9 +18,9 @@ if __name__ == "__main__":
 
     articles = load_all_articles("./saved/articles")
 
-    for article in tqdm.tqdm(articles, desc="Repairing Sources"):
-        for root_article in root_articles:
-            if article.title in root_article.relations:
-                article.add_source(root_article.title)
+    # the relations of the root articles inverted once, saved next to them and only built again if they changed
+    root_backlinks = BacklinkIndex.load_or_build(root_articles, save_dir="./saved/_root_articles")
+    repair_sources(articles, root_articles, root_backlinks)
+    print(root_backlinks)
 
     pass
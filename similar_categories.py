@@ -0,0 +1,26 @@
+"""
+In this script, pairs of saved categories with similar article sets are searched.
+Every category is sketched by a MinHash signature of its articles and only categories sharing an LSH band are compared,
+so the full co-occurrence matrix is never built. The candidates are verified with their exact Jaccard similarity.
+
+    python similar_categories.py [threshold]
+"""
+import sys
+from util.classes import load_all_categories
+from util.cooccurrence import short_title
+from util.minhash import LSHIndex
+
+
+if __name__ == "__main__":
+
+    threshold = float(sys.argv[1]) if len(sys.argv) > 1 else 0.5
+    categories = load_all_categories("./saved/categories", autosave=False, compact=True)
+
+    index = LSHIndex.from_categories(categories, threshold=threshold, num_perm=128)
+    print(index)
+
+    sets = {short_title(category.title): category.articles for category in categories}
+    pairs = index.similar_pairs(sets=sets)
+    print(f"{len(pairs)} category pairs with a Jaccard similarity of at least {threshold}")
+    for a, b, similarity in pairs[:100]:
+        print(f"{similarity:.3f}  {a.ljust(50)} {b}")
@@ -18,6 +18,8 @@ def count_articles_by_root_cats(articles):
 
 if __name__ == "__main__":
 
+    metrics.export_on_exit("./saved/metrics/test.json")
+
     """ load categories and articles """
     categories = load_all_categories("./saved/categories")
     articles = load_all_articles("./saved/_root_articles")
@@ -29,9 +31,20 @@ if __name__ == "__main__":
 
     sys.exit()
 
-    """ fill articles """
-    for article in tqdm.tqdm(articles, desc="Finding related articles"):
-        article.fill()
+    """ fill articles, journaled so an interrupted run continues with the articles which are not filled yet """
+    articles_by_title = {article.title: article for article in articles}
+
+    def fill(titles):
+        results = fill_many([articles_by_title[title] for title in titles], concurrency=16)
+        # pages which were not filled (missing, or e.g. a 503 after all retries) are retried on a rerun
+        return {title: result.error if result.error is not None
+                else None if result.result.status in ("ok", "redirect")
+                else ValueError(f"Page status \"{result.result.status}\"")
+                for title, result in results.items()}
+
+    fill_journal = CrawlJournal(get_default_journal_path("fill"))
+    fill_journal.run(articles_by_title, fill, chunk_size=500)
+    fill_journal.close()
 
     """ get number of relations over all articles"""
     num_relations = 0
@@ -39,10 +52,34 @@ if __name__ == "__main__":
         num_relations += len(article.relations)
     print(f"Number of related articles: {num_relations}")
 
-    """ create related articles """
-    for i, article in enumerate(articles):
-        for relation in tqdm.tqdm(article.relations, desc=f"Creating related article instances for {article.title}"):
-            Article(relation, source=article.title, related_cats=article.root_cats, autosave=True)
-        print(f"{i}/{len(articles)} Done!")
+    """ create related articles, journaled per (root article, related title) pair so a rerun only retries the
+    related articles which failed """
+    # category pair counts of the saved articles, updated with the categories of every created or changed article
+    cooccurrences = CooccurrenceAccumulator.load_or_build(load_all_articles("./saved/articles", autosave=False, lazy=True),
+                                                          categories)
+    cooccurrences.attach()
+    related_journal = CrawlJournal(get_default_journal_path("create_related"))
+
+    def create_related(keys):
+        outcomes = {}
+        by_source = {}
+        for key in keys:
+            by_source.setdefault(key.split("|", 1)[0], []).append(key)
+        for source, source_keys in by_source.items():
+            article = articles_by_title[source]
+            created = create_articles([key.split("|", 1)[1] for key in source_keys], source=article.title,
+                                      related_cats=article.root_cats, autosave=True)
+            outcomes.update((key, creation_outcome(related)) for key, related in zip(source_keys, created))
+        return outcomes
+
+    try:
+        related_journal.run((f"{article.title}|{title}" for article in articles for title in article.relations),
+                            create_related, desc="Creating related articles")
+    finally:
+        related_journal.close()
+        cooccurrences.detach()
+        cooccurrences.save()
+    print(related_journal)
+    print(cooccurrences)
 
     pass
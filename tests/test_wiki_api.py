@@ -0,0 +1,130 @@
+"""
+WikiApi against the synthetic wiki of the benchmarks, served on localhost:
+
+    python -m pytest -q tests
+"""
+import pytest
+import requests
+from benchmarks.synthetic_wiki import API_LIMIT, SyntheticWiki, WikiServer
+from util.wiki_api import ApiError, WikiApi
+
+
+class FailingWiki(SyntheticWiki):
+    """ answers continued requests (plcontinue, cmcontinue) with an api error """
+    def api(self, params):
+        if "plcontinue" in params or "cmcontinue" in params:
+            return {"error": {"code": "internal_api_error", "info": "continuation failed"}}
+        return super().api(params)
+
+
+class RecordingGet:
+    """ get function of WikiApi which records the parameters of every request """
+    def __init__(self):
+        self.params = []
+
+    def __call__(self, url, params=None, fresh=False):
+        self.params.append(params)
+        return requests.get(url, params=params, timeout=10)
+
+
+class StatusResponse:
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+    def json(self):
+        raise ValueError("no json body")
+
+
+@pytest.fixture(scope="module")
+def wiki():
+    # 1200 articles in 3 categories: about 800 members per category and 50 * 20 links per batch need continuation
+    return SyntheticWiki(num_articles=1200, links_per_article=20, num_categories=3, padding=0)
+
+
+@pytest.fixture(scope="module")
+def server(wiki):
+    with WikiServer(wiki) as server:
+        yield server
+
+
+@pytest.fixture(scope="module")
+def failing_server():
+    with WikiServer(FailingWiki(num_articles=1200, links_per_article=20, num_categories=3, padding=0)) as server:
+        yield server
+
+
+def _api(server, get=None):
+    return WikiApi(get or RecordingGet(), api_url=f"{server.url}/w/api.php")
+
+
+def _expected_links(wiki, title):
+    return [wiki.titles[target] for target in wiki.links[wiki.ids[title]]]
+
+
+def test_pages_follow_link_continuation(wiki, server):
+    api = _api(server)
+    titles = wiki.titles[:50]
+    pages = api.pages(titles)
+    assert api.requests > 1
+    for title in titles:
+        page = pages[title]
+        assert page["status"] == "ok"
+        assert page["canonical_title"] == title
+        assert sorted(page["links"]) == sorted(_expected_links(wiki, title))
+        article = wiki.ids[title]
+        assert sorted(page["categories"]) == sorted(wiki.categories[category]
+                                                    for category in wiki.article_categories[article])
+        assert page["revision"] == 1000 + article
+
+
+def test_pages_are_requested_in_batches(wiki, server):
+    get = RecordingGet()
+    api = _api(server, get)
+    titles = wiki.titles[:120]
+    pages = api.revisions(titles)
+    assert list(pages) == titles
+    assert len(get.params) == 3
+    assert [len(params["titles"].split("|")) for params in get.params] == [50, 50, 20]
+    assert all(page["revision"] == 1000 + wiki.ids[title] for title, page in pages.items())
+
+
+def test_missing_pages(wiki, server):
+    api = _api(server)
+    pages = api.pages([wiki.titles[0], "No_such_article"])
+    assert pages[wiki.titles[0]]["status"] == "ok"
+    assert pages["No_such_article"]["status"] == "missing"
+    assert api.links(["No_such_article"]) == {"No_such_article": None}
+
+
+def test_category_members_follow_continuation(wiki, server):
+    api = _api(server)
+    for category, members in enumerate(wiki.members):
+        assert len(members) > API_LIMIT
+        titles = api.category_members(wiki.categories[category], member_type="page")
+        assert sorted(titles) == sorted(wiki.titles[article] for article in members)
+    assert api.category_members("Category:Synthetic_root", member_type="subcat") == [wiki.categories[0]]
+
+
+def test_failed_continuation_marks_the_batch_as_error(wiki, failing_server):
+    api = _api(failing_server)
+    titles = wiki.titles[:60]
+    pages = api.pages(titles)
+    # the first batch needs a continuation and fails, the second batch of 10 titles fits into one response
+    assert all(pages[title]["status"] == "error" for title in titles[:50])
+    assert all(pages[title]["status"] == "ok" for title in titles[50:])
+    links = api.links(titles[:50])
+    assert all(value is None for value in links.values())
+
+
+def test_failed_continuation_of_category_members(wiki, failing_server):
+    api = _api(failing_server)
+    assert api.category_members(wiki.categories[0], member_type="page") is None
+
+
+def test_error_status(server):
+    api = WikiApi(lambda url, params=None, fresh=False: StatusResponse(503), api_url=f"{server.url}/w/api.php")
+    with pytest.raises(ApiError):
+        list(api.query({"list": "categorymembers", "cmtitle": "Category:Synthetic root"}))
+    assert api.pages(["Synthetic_article_0"])["Synthetic_article_0"]["status"] == "error"
+    assert api.links(["Synthetic_article_0"]) == {"Synthetic_article_0": None}
+    assert api.category_members("Synthetic root") is None
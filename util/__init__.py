@@ -1,3 +1,14 @@
 from util.scraping import *
 from util.category_scraper import *
-from util.classes import *
\ No newline at end of file
+from util.classes import *
+from util.graph import *
+from util.cooccurrence import *
+from util.category_index import *
+from util.backlinks import *
+from util.wiki_api import *
+from util.journal import *
+from util.scheduler import *
+from util.metrics import *
+from util.centrality import *
+from util.minhash import *
+from util.export import *
\ No newline at end of file
@@ -0,0 +1,163 @@
+import os
+import json
+import tqdm
+from util.classes import add_listener, remove_listener, batch, articles_fingerprint
+
+
+def get_default_backlinks_path():
+    """ :return: path of the persisted backlink index, saved/backlinks.json """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    return os.path.join(root, "saved", "backlinks.json")
+
+
+class BacklinkIndex:
+    """
+    Inbound adjacency of the article link graph: linked title -> titles of the articles linking to it.
+    Built by inverting all relations in a single pass. While attached, it is updated whenever relations of the indexed
+    articles change (instances of other collections, e.g. related articles, are ignored), and it can be saved next to
+    the data and loaded again.
+    With a save_dir, a fingerprint of the saved articles is stored with the index and load_or_build builds it again
+    if the articles changed while it was not attached.
+    """
+    def __init__(self, path=None, save_dir=None):
+        """
+        :param path: path of the json file the index is saved to. Default: saved/backlinks.json
+        :param save_dir: directory (or store collection) of the indexed articles, see articles_fingerprint
+        """
+        self.path = get_default_backlinks_path() if path is None else path
+        self.save_dir = save_dir
+        self.fingerprint = None
+        self.members = None     # indexed article instances, None: every article updates the index
+        self.backlinks = {}
+        self.changed = False
+        self.attached = False
+
+    @classmethod
+    def build(cls, articles, path=None, save_dir=None):
+        """
+        Invert the relations of all articles
+        :param articles: iterable of article instances
+        :param path, save_dir: see __init__
+        :return: BacklinkIndex
+        """
+        index = cls(path, save_dir)
+        index.members = set()
+        for article in tqdm.tqdm(articles, desc="Building backlink index"):
+            index.add(article.title, article.relations)
+            index.members.add(article)
+        return index
+
+    @classmethod
+    def load(cls, path=None):
+        """
+        Load a saved index
+        :param path: see __init__
+        :return: BacklinkIndex
+        """
+        index = cls(path)
+        with open(index.path, "r") as json_file:
+            data = json.load(json_file)
+        if "backlinks" not in data:
+            # index saved without fingerprint: the file only holds the backlinks
+            data = {"backlinks": data}
+        index.save_dir = data.get("save_dir")
+        index.fingerprint = data.get("fingerprint")
+        index.backlinks = {target: set(sources) for target, sources in data["backlinks"].items()}
+        return index
+
+    @classmethod
+    def load_or_build(cls, articles, path=None, save_dir=None):
+        """
+        Load the saved index if it exists (and, with a save_dir, the articles did not change since it was saved),
+        otherwise build it from the articles and save it
+        :param articles: iterable of the article instances of the index, only their relation changes update it
+        :param path, save_dir: see __init__
+        :return: BacklinkIndex
+        """
+        articles = list(articles)
+        index = cls(path)
+        if os.path.exists(index.path):
+            index = cls.load(path)
+            index.members = set(articles)
+            if save_dir is None:
+                return index
+            if index.save_dir == save_dir and index.fingerprint == articles_fingerprint(save_dir):
+                return index
+            print("Articles changed since the backlink index was saved, building it again.")
+        index = cls.build(articles, path, save_dir)
+        index.save()
+        return index
+
+    def save(self, path=None):
+        """
+        Save the index as json file
+        :param path: Default: path the index was created with
+        """
+        path = self.path if path is None else path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.fingerprint = None if self.save_dir is None else articles_fingerprint(self.save_dir)
+        with open(path, "w") as file:
+            json.dump({"save_dir": self.save_dir, "fingerprint": self.fingerprint,
+                       "backlinks": {target: sorted(sources) for target, sources in self.backlinks.items()}}, file)
+        self.changed = False
+
+    def add(self, source, targets):
+        """ record links from source to all targets """
+        for target in targets:
+            self.backlinks.setdefault(target, set()).add(source)
+        self.changed = True
+
+    def remove(self, source, targets):
+        """ forget links from source to all targets """
+        for target in targets:
+            sources = self.backlinks.get(target)
+            if sources is not None:
+                sources.discard(source)
+                if not sources:
+                    del self.backlinks[target]
+        self.changed = True
+
+    def sources(self, title):
+        """ :return: set of titles of the articles linking to title """
+        return self.backlinks.get(title, set())
+
+    def attach(self):
+        """ keep the index up to date with all relation changes of the indexed articles from now on """
+        add_listener(self._on_change)
+        self.attached = True
+
+    def detach(self):
+        remove_listener(self._on_change)
+        self.attached = False
+
+    def _on_change(self, article, field, added, removed):
+        if field == "relations" and (self.members is None or article in self.members):
+            if added:
+                self.add(article.title, added)
+            if removed:
+                self.remove(article.title, removed)
+
+    def __len__(self):
+        return len(self.backlinks)
+
+    def __str__(self):
+        return f"BacklinkIndex: {len(self.backlinks)} linked articles, {sum(map(len, self.backlinks.values()))} links"
+
+
+def repair_sources(articles, root_articles, index=None):
+    """
+    Set the source of every article to the root articles linking to it.
+    Linear in the number of relations of the root articles plus the number of articles;
+    changed articles are written once at the end.
+    :param articles: list of article instances
+    :param root_articles: list of root article instances
+    :param index: BacklinkIndex of the root articles, e.g. from load_or_build. Default: built from root_articles
+    :return: BacklinkIndex of the root articles
+    """
+    index = BacklinkIndex.build(root_articles) if index is None else index
+    with batch():
+        for article in tqdm.tqdm(articles, desc="Repairing Sources"):
+            sources = index.sources(article.title)
+            if sources:
+                article.add_source(sources)
+    return index
@@ -0,0 +1,74 @@
+import numpy as np
+
+
+class CategoryIndex:
+    """
+    Inverted index over a list of articles, built in a single pass:
+    category -> ids of the articles listing it (for related and root categories), and per-article cardinalities
+    of source, relations, root and related categories. All counting queries are answered from the index.
+    """
+    FIELDS = ("source", "relations", "root_cats", "related_cats")
+
+    def __init__(self, articles):
+        """
+        Build the index
+        :param articles: iterable of article instances, e.g. the output of load_all_articles
+        """
+        self.titles = []
+        self.related = {}
+        self.root = {}
+        counts = {field: [] for field in CategoryIndex.FIELDS}
+        relation_targets = set()
+
+        for article_id, article in enumerate(articles):
+            self.titles.append(article.title)
+            for field in CategoryIndex.FIELDS:
+                counts[field].append(len(getattr(article, field)))
+            for category in article.related_cats:
+                self.related.setdefault(category, []).append(article_id)
+            for category in article.root_cats:
+                self.root.setdefault(category, []).append(article_id)
+            relation_targets.update(article.relations)
+
+        self.counts = {field: np.array(values, dtype=np.int64) for field, values in counts.items()}
+        self.num_unique_relations = len(relation_targets)
+
+    def __len__(self):
+        return len(self.titles)
+
+    def articles_in(self, category, root=False):
+        """
+        :param category: category title
+        :param root: look up root categories instead of related categories
+        :return: list of ids of the articles in the category
+        """
+        return (self.root if root else self.related).get(category, [])
+
+    def occurrences(self, categories=None, root=False):
+        """
+        Number of articles per category
+        :param categories: category titles or instances. Default: all indexed categories
+        :param root: count root categories instead of related categories
+        :return: dict mapping category title to number of articles
+        """
+        index = self.root if root else self.related
+        if categories is None:
+            return {category: len(ids) for category, ids in index.items()}
+        titles = [category if isinstance(category, str) else category.title for category in categories]
+        return {title: len(index.get(title, ())) for title in titles}
+
+    def histogram(self, field):
+        """
+        Number of articles by the size of one of their sets
+        :param field: "source", "relations", "root_cats" or "related_cats"
+        :return: dict mapping set size to number of articles, sorted by set size
+        """
+        sizes, numbers = np.unique(self.counts[field], return_counts=True)
+        return {int(size): int(number) for size, number in zip(sizes, numbers)}
+
+    def total(self, field):
+        """ :return: sum of the set sizes of one field over all articles """
+        return int(self.counts[field].sum())
+
+    def __str__(self):
+        return f"CategoryIndex: {len(self.titles)} articles, {len(self.related)} related and {len(self.root)} root categories"
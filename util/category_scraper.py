@@ -1,8 +1,9 @@
-import requests
-import re
-from queue import Queue
-from bs4 import BeautifulSoup
+import os
+import json
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 from util.scraping import *
+from util.html_extract import extract_category_members
 from urllib.parse import quote
 
 
@@ -20,49 +21,30 @@ class Category_Node:
 
 
 def get_direct_subcategories(category):
-    url = "https://en.wikipedia.org/w/api.php"
-    params = {
-        "action": "query",
-        "format": "json",
-        "list": "categorymembers",
-        "cmtitle": f"Category:{category}",
-        "cmtype": "subcat",
-        "cmlimit": "max"
-    }
-
-    response = requests.get(url, params=params)
-    if response.status_code == 200:
-        data = response.json()
-        subcategories = [category['title'].replace(" ", "_") for category
-                         in data['query']['categorymembers']]
-        return subcategories
-    else:
-        print('Error retrieving direct subcategories:', response.status_code)
-        return None
+    """
+    :param category: category name with or without "Category:" prefix
+    :return: list of the titles of all direct subcategories ("Category:Algebra"), following continuation.
+        None if the request failed.
+    """
+    subcategories = get_api().category_members(category, member_type="subcat")
+    if subcategories is None:
+        print('Error retrieving direct subcategories:', category)
+    return subcategories
 
 
 def get_pages_in_category(url):
+    if get_backend() == "api":
+        # all members, the rendered category page only lists the first 200
+        return get_api().category_members(url, member_type="page")
+
     # Make a request to the article URL
     response = url_request(url)
 
     # Check if the request was successful
     if response.status_code == 200:
 
-        # Remove everything before "pages in category" from response text
-        text = "".join(response.text.split("Pages in category", 1)[1:])
-
-        # Parse the manipulated HTML content of the article
-        soup = BeautifulSoup(text, 'html.parser')
-
-        # Find all the anchor tags in the article
-        links = soup.find_all('a')
-
-        # Extract the Wikipedia links
-        wikipedia_links = set()
-        for link in links:
-            href = link.get('href')
-            if href and re.match(r'^/wiki/[^:]+$', href):
-                wikipedia_links.add(url_encode(href.replace("/wiki/", "")))
+        # Extract the Wikipedia links from the "Pages in category" section
+        wikipedia_links = extract_category_members(response.text)
 
         # Remove the link to Main Page
         wikipedia_links.discard("Main_Page")
@@ -73,49 +55,194 @@ def get_pages_in_category(url):
         return None
 
 
-if __name__ == "__main__":
-
-    root_category = Category_Node("Fields of mathematics")
-
-    # define queue for categories not yet explored and categories_done set. Put root category in queue.
-    categories_queue = Queue()
-    categories_queue.put(root_category)
-    # categories_done = set()
-    categories_seen = set()
+def get_default_crawl_path():
+    """ :return: path of the category crawl checkpoint, saved/category_tree.jsonl """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    return os.path.join(root, "saved", "category_tree.jsonl")
+
+
+def category_title(category):
+    """ "Fields of mathematics" -> "Category:Fields_of_mathematics" """
+    category = category.split("/wiki/", 1)[-1].replace(" ", "_")
+    return category if category.startswith("Category:") else f"Category:{category}"
+
+
+class CategoryTreeCrawler:
+    """
+    Breadth first crawl of the subcategories of a root category.
+    Up to `concurrency` categories are requested at the same time, the crawl state is only changed in the
+    calling thread. Every category is expanded once, so cycles in the category graph end the descent.
+    Progress is checkpointed to a json lines file: a header with the root, then one line per checkpoint with the
+    categories expanded, seen and the edges found since the previous one, so a checkpoint costs only the new work.
+    An interrupted crawl continues from there when it is created again with the same checkpoint path,
+    all seen categories which were not expanded (not yet requested, in flight or failed) form the frontier again.
+    """
+    def __init__(self, root, max_depth=None, max_nodes=None, concurrency=8, checkpoint_path=None,
+                 checkpoint_every=100, resume=True):
+        """
+        :param root: name of the root category, with or without "Category:" prefix
+        :param max_depth: do not expand categories deeper than this (root = 0). Default: no limit
+        :param max_nodes: stop adding categories once this many have been seen, edges to categories beyond it
+            are not recorded. Default: no limit
+        :param concurrency: number of requests in flight
+        :param checkpoint_path: json lines file for the crawl state. Default: saved/category_tree.jsonl
+        :param checkpoint_every: write a checkpoint after this many newly expanded categories
+        :param resume: continue from an existing checkpoint of the same root, else the checkpoint is started anew
+        """
+        self.root = category_title(root)
+        self.max_depth = max_depth
+        self.max_nodes = max_nodes
+        self.concurrency = concurrency
+        self.checkpoint_path = get_default_crawl_path() if checkpoint_path is None else checkpoint_path
+        self.checkpoint_every = checkpoint_every
+
+        self.frontier = deque([(self.root, 0)])   # (category, depth) not yet expanded
+        self.seen = {self.root}
+        self.edges = []                           # (parent, child)
+        self.failed = []                          # (category, depth) whose request failed
+        self.expanded = 0
+        # changes since the last checkpoint
+        self._new_expanded = []
+        self._new_seen = [(self.root, 0)]
+        self._new_edges = []
+        self._resumed = False
+        if resume and os.path.exists(self.checkpoint_path):
+            self.load_checkpoint()
+
+    def _within_depth(self, depth):
+        return self.max_depth is None or depth <= self.max_depth
+
+    def load_checkpoint(self):
+        """ Continue from the checkpoint file. Failed and in flight categories are put back into the frontier. """
+        with open(self.checkpoint_path, "rb") as file:
+            data = file.read()
+        complete = data.rfind(b"\n") + 1
+        if complete < len(data):
+            # drop a torn last checkpoint, appending starts on a new line again
+            with open(self.checkpoint_path, "r+b") as file:
+                file.truncate(complete)
+
+        lines = data[:complete].decode("utf-8").splitlines()
+        header = json.loads(lines[0])
+        if header["root"] != self.root:
+            raise ValueError(f"Checkpoint {self.checkpoint_path} belongs to the crawl of \"{header['root']}\".")
+        expanded, seen, self.edges = set(), {}, []
+        for line in lines[1:]:
+            checkpoint = json.loads(line)
+            expanded.update(category for category, _ in checkpoint["expanded"])
+            seen.update((category, depth) for category, depth in checkpoint["seen"])
+            self.edges.extend(tuple(edge) for edge in checkpoint["edges"])
+        self.seen = set(seen)
+        self.frontier = deque((category, depth) for category, depth in seen.items()
+                              if category not in expanded and self._within_depth(depth))
+        self.failed = []
+        self.expanded = len(expanded)
+        self._new_expanded, self._new_seen, self._new_edges = [], [], []
+        self._resumed = True
+
+    def save_checkpoint(self):
+        """ Append the changes since the last checkpoint to the checkpoint file and sync it """
+        if not self._resumed:
+            # a new crawl replaces an old checkpoint
+            os.makedirs(os.path.dirname(os.path.abspath(self.checkpoint_path)), exist_ok=True)
+            with open(self.checkpoint_path, "w", encoding="utf-8") as file:
+                file.write(json.dumps({"root": self.root}) + "\n")
+            self._resumed = True
+        if not (self._new_expanded or self._new_seen or self._new_edges):
+            return
+        checkpoint = {"expanded": self._new_expanded, "seen": self._new_seen, "edges": self._new_edges}
+        with open(self.checkpoint_path, "a", encoding="utf-8") as file:
+            file.write(json.dumps(checkpoint) + "\n")
+            file.flush()
+            os.fsync(file.fileno())
+        self._new_expanded, self._new_seen, self._new_edges = [], [], []
+
+    @property
+    def done(self):
+        return not self.frontier
+
+    def crawl(self, progress=True):
+        """
+        Expand categories until the frontier is empty. Progress is checkpointed regularly and at the end,
+        also if the crawl is interrupted.
+        :param progress: print progress every checkpoint
+        :return: list of (parent, child) edges
+        """
+        in_flight = {}
+        with ThreadPoolExecutor(max_workers=max(1, self.concurrency)) as executor:
+            try:
+                while self.frontier or in_flight:
+                    while self.frontier and len(in_flight) < self.concurrency:
+                        category, depth = self.frontier.popleft()
+                        in_flight[executor.submit(get_direct_subcategories, category)] = (category, depth)
+
+                    finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        category, depth = in_flight[future]
+                        try:
+                            subcategories = future.result()
+                        except Exception as error:
+                            print(f"Error retrieving direct subcategories: {category}: {error}")
+                            subcategories = None
+                        del in_flight[future]
+                        self._expand(category, depth, subcategories)
+
+                        if len(self._new_expanded) >= self.checkpoint_every:
+                            self.save_checkpoint()
+                            if progress:
+                                print(f"Progress: expanded = {self.expanded}, seen = {len(self.seen)}, "
+                                      f"in frontier = {len(self.frontier) + len(in_flight)}, edges = {len(self.edges)}")
+            finally:
+                for future in in_flight:
+                    future.cancel()
+                self.save_checkpoint()
+        return self.edges
+
+    def _expand(self, category, depth, subcategories):
+        """ :param subcategories: list of subcategories, None if the request failed (also a partial one) """
+        if subcategories is None:
+            self.failed.append((category, depth))
+            return
+        self.expanded += 1
+        self._new_expanded.append((category, depth))
+        for child in subcategories:
+            if child not in self.seen:
+                if self.max_nodes is not None and len(self.seen) >= self.max_nodes:
+                    # outside of the budget, an edge to it would dangle
+                    continue
+                self.seen.add(child)
+                self._new_seen.append((child, depth + 1))
+                if self._within_depth(depth + 1):
+                    self.frontier.append((child, depth + 1))
+            self.edges.append((category, child))
+            self._new_edges.append((category, child))
+
+    def children(self):
+        """ :return: dict mapping each expanded category to its list of subcategories """
+        children = {}
+        for parent, child in self.edges:
+            children.setdefault(parent, []).append(child)
+        return children
+
+    def write_edges(self, path):
+        """
+        Write the edge list as tab separated "parent<TAB>child" lines
+        :param path: output file
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w") as file:
+            for parent, child in self.edges:
+                file.write(f"{parent}\t{child}\n")
 
-    i = 0
-
-    while not categories_queue.empty():
-        current_category = categories_queue.get()
-
-        # check if the current category has been processed before
-        if current_category.name in categories_seen:
-            continue
-
-        found_subcategories = get_direct_subcategories(current_category.name)
-
-        # create objects for found subcategories, add them to current_category subcategories and queue.
-        for category in found_subcategories:
-
-            new_class = Category_Node(category, current_category.name)
-            current_category.add_subcategory(new_class)
-            categories_queue.put(new_class)
-
-        # categories_done.add(current_category)
-        categories_seen.add(current_category.name)
-
-        i += 1
-        if i % 10 == 0:
-            print(f"Progress after {i} iterations: Done = {len(categories_seen)}, in Queue = {categories_queue.qsize()}")
+    def __str__(self):
+        return (f"CategoryTreeCrawler {self.root}: {self.expanded} expanded, {len(self.seen)} seen, "
+                f"{len(self.frontier)} in frontier, {len(self.failed)} failed, {len(self.edges)} edges")
 
 
-    pass
+if __name__ == "__main__":
 
-    # subcategories = get_direct_subcategories("Fields of mathematics")
-    # for c in subcategories:
-    #     print(c)
-    #
-    # print()
-    # subcategories = get_direct_subcategories(subcategories[0])
-    # for c in subcategories:
-    #     print(c)
+    crawler = CategoryTreeCrawler("Fields of mathematics", max_depth=4, max_nodes=20000, concurrency=8)
+    print(crawler)
+    crawler.crawl()
+    print(crawler)
+    crawler.write_edges("./saved/category_edges.tsv")
@@ -0,0 +1,137 @@
+import os
+import glob
+import warnings
+import numpy as np
+import scipy.sparse as sp
+
+
+def adjacency_matrix(graph):
+    """
+    :param graph: LinkGraph
+    :return: scipy.sparse.csr_matrix with A[i, j] = 1 if node i links to node j, built from the CSR arrays of the graph
+    """
+    n = len(graph)
+    data = np.ones(len(graph.out_indices), dtype=np.float64)
+    return sp.csr_matrix((data, graph.out_indices, graph.out_indptr), shape=(n, n))
+
+
+def _distribution(graph, weights):
+    """ probability vector over the nodes from None (uniform), a dict title -> weight or an iterable of titles """
+    n = len(graph)
+    if weights is None:
+        return np.full(n, 1.0 / n)
+    vector = np.zeros(n)
+    items = weights.items() if isinstance(weights, dict) else ((title, 1.0) for title in weights)
+    for title, weight in items:
+        node = graph.ids.get(title)
+        if node is not None:
+            vector[node] += weight
+    if vector.sum() <= 0:
+        raise ValueError("None of the personalization titles is a node of the graph.")
+    return vector / vector.sum()
+
+
+def pagerank(graph, damping=0.85, personalization=None, tol=1e-10, max_iter=100, adjacency=None):
+    """
+    PageRank by sparse power iteration. The rank of nodes without outgoing links (e.g. articles which are only linked
+    to) is redistributed according to the personalization vector.
+    :param graph: LinkGraph
+    :param damping: probability of following a link instead of teleporting
+    :param personalization: teleport distribution: None (uniform), dict title -> weight or iterable of titles
+    :param tol: stop when the L1 change of the rank vector is below tol
+    :param max_iter: maximum number of iterations, a warning is issued if the iteration did not converge
+    :param adjacency: precomputed adjacency_matrix(graph), to reuse it for several runs
+    :return: array of scores indexed by node id, summing to 1
+    """
+    n = len(graph)
+    if n == 0:
+        return np.zeros(0)
+    adjacency = adjacency_matrix(graph) if adjacency is None else adjacency
+    teleport = _distribution(graph, personalization)
+    out_degree = np.asarray(adjacency.sum(axis=1)).ravel()
+    dangling = out_degree == 0
+    inverse_degree = np.divide(1.0, out_degree, out=np.zeros(n), where=~dangling)
+    transposed = adjacency.T.tocsr()
+
+    ranks = teleport.copy()
+    for _ in range(max_iter):
+        previous = ranks
+        ranks = damping * (transposed @ (previous * inverse_degree))
+        ranks += (damping * previous[dangling].sum() + (1 - damping)) * teleport
+        if np.abs(ranks - previous).sum() < tol:
+            return ranks
+    warnings.warn(f"PageRank did not converge within {max_iter} iterations.")
+    return ranks
+
+
+def personalized_pagerank(graph, seeds, damping=0.85, tol=1e-10, max_iter=100, adjacency=None):
+    """
+    PageRank with teleports only to the seed articles, i.e. the importance of articles seen from the seeds
+    :param seeds: iterable of seed titles (e.g. get_root_titles()) or dict title -> weight
+    :return: array of scores indexed by node id
+    """
+    return pagerank(graph, damping, personalization=seeds, tol=tol, max_iter=max_iter, adjacency=adjacency)
+
+
+def hits(graph, tol=1e-10, max_iter=100, adjacency=None):
+    """
+    Hub and authority scores (HITS) by power iteration: good hubs link to good authorities
+    :return: (hubs, authorities), arrays indexed by node id, each summing to 1
+    """
+    n = len(graph)
+    if n == 0:
+        return np.zeros(0), np.zeros(0)
+    adjacency = adjacency_matrix(graph) if adjacency is None else adjacency
+    transposed = adjacency.T.tocsr()
+    hubs = np.full(n, 1.0 / n)
+    for _ in range(max_iter):
+        authorities = transposed @ hubs
+        authorities /= authorities.sum() or 1.0
+        previous = hubs
+        hubs = adjacency @ authorities
+        hubs /= hubs.sum() or 1.0
+        if np.abs(hubs - previous).sum() < tol:
+            return hubs, authorities
+    warnings.warn(f"HITS did not converge within {max_iter} iterations.")
+    return hubs, authorities
+
+
+def degree_distribution(graph, direction="in", saved_only=False):
+    """
+    :param direction: "in" or "out"
+    :param saved_only: only count saved articles (not articles which are only linked to)
+    :return: (degrees, counts): the occurring degrees and the number of nodes with that degree
+    """
+    if direction not in ("in", "out"):
+        raise ValueError(f"Unknown direction \"{direction}\". Use \"in\" or \"out\".")
+    degrees = graph.in_degree() if direction == "in" else graph.out_degree()
+    if saved_only:
+        degrees = degrees[:graph.num_saved]
+    counts = np.bincount(degrees)
+    present = np.nonzero(counts)[0]
+    return present, counts[present]
+
+
+def top(graph, scores, n=10, saved_only=False):
+    """
+    :param scores: array of scores indexed by node id
+    :param saved_only: only rank saved articles
+    :return: list of (title, score) of the n nodes with the highest scores
+    """
+    if saved_only:
+        scores = scores[:graph.num_saved]
+    n = min(n, len(scores))
+    best = np.argpartition(-scores, n - 1)[:n] if n else np.zeros(0, dtype=int)
+    best = best[np.argsort(-scores[best], kind="stable")]
+    return [(graph.title(node), float(scores[node])) for node in best]
+
+
+def get_root_titles(save_dir="./saved/_root_articles", store=None):
+    """
+    :param save_dir: directory of the root article json files (named after their titles)
+    :param store: ArticleStore to read the "_root_articles" collection from instead
+    :return: list of the titles of the root articles
+    """
+    if store is not None:
+        return list(store.iter_article_titles("_root_articles"))
+    return [os.path.basename(file)[:-len(".json")] for file in glob.glob(os.path.join(save_dir, "*.json"))]
@@ -1,9 +1,25 @@
 import os
+import sys
 import json
 import glob
 import tqdm
 import warnings
+from array import array
+from bisect import bisect_left
+from collections.abc import Set
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
 from util.scraping import *
+from util.store import ArticleStore
+from util.journal import MISSING
+from util.metrics import metrics
+
+# storage backend. Instances are saved as json files under saved/ if None, see set_store
+_store = None
+# active SaveBatch while inside a `with batch():` block
+_batch = None
+# callbacks notified about changes of article sets, see add_listener
+_listeners = []
 
 
 def get_save_path():
@@ -26,13 +42,165 @@ def get_save_path():
     return path
 
 
-def load_all_categories(save_dir, autosave=True):
+def get_store():
+    """
+    :return: the ArticleStore instances are saved to, None if they are saved as json files
+    """
+    return _store
+
+
+def set_store(store):
+    """
+    Save and load all Article and Category instances through a store instead of json files
+    :param store: ArticleStore, path to a store file, or None to go back to json files
+    """
+    global _store
+    _store = ArticleStore(store) if isinstance(store, str) else store
+
+
+class SaveBatch:
+    """
+    Unit of work for autosave: instead of being written on every change, changed (dirty) instances are collected
+    and each of them is written exactly once when the batch is flushed. Use it through batch() and flush().
+    """
+    def __init__(self):
+        self.pending = {}
+
+    def add(self, instance):
+        """ register a changed instance, replacing a pending instance of the same title """
+        self.pending[("Category" if _is_category(instance) else "Article", instance.title)] = instance
+
+    def get(self, cls, title):
+        """ :return: pending instance of the given class and title or None """
+        return self.pending.get((cls.__name__, title))
+
+    def flush(self):
+        """
+        Write all pending instances that are still dirty. With a store, all of them are written in a single transaction.
+        :return: number of written instances
+        """
+        instances = [instance for instance in self.pending.values() if instance._dirty]
+        self.pending = {}
+        if _store is None:
+            for instance in instances:
+                instance.save()
+            return len(instances)
+
+        with _store.transaction():
+            _store.upsert_articles([instance._create_instance_dict() for instance in instances
+                                    if not _is_category(instance)])
+            _store.upsert_categories([instance._create_instance_dict() for instance in instances
+                                      if _is_category(instance)])
+        for instance in instances:
+            instance._dirty = False
+        return len(instances)
+
+
+@contextmanager
+def batch():
+    """
+    Coalesce autosave writes: inside the block, changed instances are only marked dirty and each of them is
+    written once when the block is left. Unchanged instances are not written at all. Nested blocks join the outer one.
+
+        with batch():
+            for article in articles:
+                article.add_source(...)
+
+    :return: the active SaveBatch
+    """
+    global _batch
+    if _batch is not None:
+        yield _batch
+        return
+    _batch = SaveBatch()
+    try:
+        yield _batch
+    finally:
+        current, _batch = _batch, None
+        current.flush()
+
+
+def flush():
+    """
+    Write all instances changed so far in the active batch
+    :return: number of written instances
+    """
+    return 0 if _batch is None else _batch.flush()
+
+
+def add_listener(callback):
+    """
+    Register a callback which is notified whenever one of the sets of an article changes:
+
+        callback(article, field, added, removed)
+
+    field is "source", "relations", "root_cats" or "related_cats", added and removed are sets of values.
+    Used to keep indexes (e.g. BacklinkIndex) up to date while articles are changed.
+    :param callback: function
+    """
+    if callback not in _listeners:
+        _listeners.append(callback)
+
+
+def remove_listener(callback):
+    """ unregister a callback added with add_listener """
+    if callback in _listeners:
+        _listeners.remove(callback)
+
+
+def _notify(article, field, added=(), removed=()):
+    for callback in list(_listeners):
+        callback(article, field, set(added), set(removed))
+
+
+def _is_category(instance):
+    return isinstance(instance, (Category, CompactCategory))
+
+
+def _collection(save_dir):
+    """ name of the store collection matching a save directory, e.g. "./saved/_root_articles" -> "_root_articles" """
+    return os.path.basename(os.path.normpath(save_dir))
+
+
+def articles_fingerprint(save_dir="./saved/articles"):
+    """
+    Changes whenever an article of a save directory is saved, created or deleted
+    :param save_dir: directory of the article json files, or the matching collection if a store is set
+    :return: [number of articles, latest modification time of the json files (or of the store file)]
+    """
+    store = _store
+    if store is not None:
+        # with write-ahead logging, writes reach the -wal file first
+        files = [path for path in (store.path, f"{store.path}-wal") if os.path.exists(path)]
+        return [store.count_articles(_collection(save_dir)), max(map(os.path.getmtime, files), default=0.0)]
+    count, latest = 0, 0.0
+    if os.path.isdir(save_dir):
+        with os.scandir(save_dir) as entries:
+            for entry in entries:
+                if entry.name.endswith(".json"):
+                    count += 1
+                    latest = max(latest, entry.stat().st_mtime)
+    return [count, latest]
+
+
+@metrics.phase("load_all_categories")
+def load_all_categories(save_dir, autosave=True, compact=False):
     """
     Loads all categories from json files in a given directory.
+    If a store is set, all categories are loaded from the store with a single query instead.
     :param save_dir: Path to directory with category json files
+    :param compact: create CompactCategory instances
     :return: List of all category instances initialized by the function
     """
+    cls = CompactCategory if compact else Category
+    if _store is not None:
+        return [cls.from_dict(data, autosave=autosave) for data in _store.load_category_dicts()]
+
     category_json_files = glob.glob(os.path.join(save_dir, "*.json"))
+    if compact:
+        return [cls.from_dict(_read_json(file), autosave=autosave) for file in
+                tqdm.tqdm(category_json_files, desc=f"Loading categories from {save_dir}")]
+
     categories = []
     for file in tqdm.tqdm(category_json_files, desc=f"Loading categories from {save_dir}"):
         current_category = Category(file, autosave=autosave)
@@ -40,13 +208,42 @@ def load_all_categories(save_dir, autosave=True):
     return categories
 
 
-def load_all_articles(save_dir, autosave=True):
+def _read_json(path):
+    """ read a json file. Module level, so it can be used by process pool workers. """
+    with open(path, "r") as json_file:
+        return json.load(json_file)
+
+
+@metrics.phase("load_all_articles")
+def load_all_articles(save_dir, autosave=True, workers=None, lazy=False, compact=False):
     """
     Loads all articles from json files in a given directory.
+    If a store is set, the articles of the collection named like the directory are loaded with a single query instead.
     :param save_dir: Path to directory with article json files
+    :param workers: parse the json files in this many processes. Results keep the order of the files.
+    :param lazy: return LazyArticle proxies which only read their file when an attribute is accessed
+    :param compact: create CompactArticle instances
     :return: List of all article instances initialized by the function
     """
+    cls = CompactArticle if compact else Article
+    if _store is not None:
+        return [cls.from_dict(data, autosave=autosave) for data in _store.load_article_dicts(_collection(save_dir))]
+
     article_json_files = glob.glob(os.path.join(save_dir, "*.json"))
+    if lazy:
+        return [LazyArticle(file, autosave=autosave) for file in article_json_files]
+
+    if workers is not None and workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            chunksize = max(1, len(article_json_files) // (workers * 16))
+            dicts = executor.map(_read_json, article_json_files, chunksize=chunksize)
+            return [cls.from_dict(data, autosave=autosave) for data in
+                    tqdm.tqdm(dicts, total=len(article_json_files), desc=f"Loading articles from {save_dir}")]
+
+    if compact:
+        return [cls.from_dict(_read_json(file), autosave=autosave) for file in
+                tqdm.tqdm(article_json_files, desc=f"Loading articles from {save_dir}")]
+
     articles = []
     for file in tqdm.tqdm(article_json_files, desc=f"Loading articles from {save_dir}"):
         current_article = Article(file, autosave=autosave)
@@ -54,6 +251,175 @@ def load_all_articles(save_dir, autosave=True):
     return articles
 
 
+@metrics.phase("create_articles")
+def create_articles(titles, **kwargs):
+    """
+    Bulk version of Article(title, ...) for many titles.
+    The existence of all new titles is checked up front with batched api requests (50 titles per request),
+    so the individual Article constructors do not need a request each.
+    :param titles: iterable of article titles
+    :param kwargs: keyword arguments passed to every Article constructor
+    :return: list of article instances
+    """
+    titles = list(titles)
+    new_titles = [title for title in titles if not Article.is_saved(title)]
+    get_title_resolver().resolve([url_encode(title) for title in new_titles])
+    with batch():
+        return [Article(title, **kwargs) for title in titles]
+
+
+def creation_outcome(article):
+    """
+    Outcome of an article of create_articles for a CrawlJournal
+    :return: None if the article was saved, MISSING if its page does not exist, else an error (e.g. the api failed)
+    """
+    if article.autosave:
+        return None
+    status = get_title_resolver().lookup(article.title)
+    if status is not None and not status.exists:
+        return MISSING
+    return ValueError(f"Article \"{article.title}\" was not saved")
+
+
+def _fetch_chunks(titles, fetch_chunk, concurrency=8, desc=None):
+    """
+    fetch_many for functions handling a batch of titles (e.g. WikiApi.pages), WikiApi.BATCH_SIZE titles per call
+    :param fetch_chunk: function taking a list of titles and returning a dict with a result per title
+    :return: dict mapping each title to a FetchResult
+    """
+    titles = list(titles)
+    chunks = {str(i): titles[i:i + WikiApi.BATCH_SIZE] for i in range(0, len(titles), WikiApi.BATCH_SIZE)}
+    chunk_results = fetch_many(chunks, lambda key: fetch_chunk(chunks[key]), concurrency=concurrency, desc=desc)
+    results = {}
+    for key, chunk in chunks.items():
+        result = chunk_results[key]
+        for title in chunk:
+            record = result.result.get(title) if result.error is None else None
+            error = None if record is not None else result.error or ValueError(f"Error retrieving article: {title}")
+            results[title] = FetchResult(title, record, error)
+    return results
+
+
+def _fetch_records(titles, concurrency=8, desc=None, fresh=False):
+    """
+    :param fresh: revalidate cached responses, see fetch_page
+    :return: dict mapping each title to a FetchResult with a PageRecord, using the selected backend
+    """
+    if get_backend() == "api":
+        # one api request per batch of titles instead of one download per page
+        return _fetch_chunks(titles, lambda chunk: fetch_pages(chunk, fresh), concurrency, desc)
+    return fetch_many(titles, lambda title: fetch_page(title, fresh), concurrency=concurrency, desc=desc)
+
+
+@metrics.phase("fill_many")
+def fill_many(articles, concurrency=8, categories=False):
+    """
+    Get related articles for many articles at once.
+    Pages are downloaded concurrently, relations are added (and saved) in the calling thread afterwards.
+    :param articles: list of article instances
+    :param concurrency: maximum number of requests in flight
+    :param categories: also add the categories of the pages to related_cats, see Article.fill
+    :return: dict mapping article titles to FetchResult with PageRecord results. Failed titles are left unchanged.
+    """
+    articles = list(articles)
+    results = _fetch_records([article.title for article in articles], concurrency, "Finding related articles")
+    with batch():
+        for article in articles:
+            result = results[article.title]
+            if result.error is None and result.result.status in ("ok", "redirect"):
+                article._fill_from_record(result.result, categories)
+            else:
+                error = result.error if result.error is not None else result.result.status
+                print(f"\033[91mWarning: Could not fill \"{article.title}\": {error}\033[0m")
+    return results
+
+
+@metrics.phase("refresh_articles")
+def refresh_articles(articles, related=None, concurrency=8, categories=False):
+    """
+    Re-crawl only the articles whose page changed since they were filled.
+    The current revision ids of all articles are requested in bulk (50 titles per api request, no page content),
+    only pages with a new revision (or without a recorded one) are downloaded and parsed again,
+    and their relations are patched in place: links which disappeared are removed, new links are added.
+    :param articles: list of article instances, e.g. load_all_articles("./saved/_root_articles")
+    :param related: dict mapping titles to the instances of the related articles (e.g. of load_all_articles("./saved/articles")).
+        If given, they are patched as well: an article which is no longer linked loses the refreshed article as source
+        (and its root categories from related_cats, unless another source has them), a newly linked article gets it
+        as source and its root categories as related_cats, like when the related articles were created in test.py.
+    :param concurrency: maximum number of requests in flight
+    :param categories: the related_cats of the articles hold the categories of their pages, see Article.fill
+    :return: dict mapping article titles to "unchanged", "changed", "missing" or "error"
+    """
+    articles = list(articles)
+    current = _fetch_chunks([article.title for article in articles], get_api().revisions, concurrency,
+                            "Checking revisions")
+    states = {}
+    changed = []
+    for article in articles:
+        result = current[article.title]
+        if result.error is not None or result.result["status"] == "error":
+            # the revision request failed, the page may well exist
+            states[article.title] = "error"
+        elif result.result["status"] == "missing":
+            states[article.title] = "missing"
+        elif article.revision is not None and article.revision == result.result["revision"]:
+            states[article.title] = "unchanged"
+        else:
+            changed.append(article)
+
+    # both the revisions and the changed pages bypass the response cache, a cached page would still be the old revision
+    records = _fetch_records([article.title for article in changed], concurrency, "Refreshing changed articles",
+                             fresh=True)
+    by_title = {article.title: article for article in articles}
+    with batch():
+        for article in changed:
+            result = records[article.title]
+            if result.error is not None or result.result.status not in ("ok", "redirect"):
+                states[article.title] = "error"
+                continue
+            record = result.result
+            revision = current[article.title].result
+            if record.revision is None:
+                record = record._replace(revision=revision["revision"], touched=revision["touched"])
+            elif record.revision != revision["revision"]:
+                # the page is not the revision which was just reported, e.g. it was edited in between
+                print(f"\033[91mWarning: Could not refresh \"{article.title}\": got revision {record.revision}, "
+                      f"expected {revision['revision']}\033[0m")
+                states[article.title] = "error"
+                continue
+            old_relations = set(article.relations)
+            article._fill_from_record(record, categories, replace=True)
+            states[article.title] = "changed"
+            if related is not None:
+                _patch_related(article, old_relations, related, by_title)
+    return states
+
+
+def _patch_related(article, old_relations, related, sources):
+    """ update source and related_cats of the articles which an article stopped or started linking to """
+    relations = set(article.relations)
+    for title in old_relations.difference(relations):
+        target = related.get(title)
+        if target is None:
+            continue
+        target.remove_source(article.title, no_save=True)
+        # keep categories which are still inherited from another source (unknown sources keep all of them)
+        if all(source in sources for source in target.source):
+            inherited = {category for source in target.source for category in sources[source].root_cats}
+            target.remove_related_cats(set(article.root_cats).difference(inherited), no_save=True)
+        target._autosave()
+
+    new_titles = [title for title in relations.difference(old_relations) if title not in related]
+    for title in relations.difference(old_relations):
+        target = related.get(title)
+        if target is not None:
+            target.add_source(article.title, no_save=True)
+            target.add_related_cats(set(article.root_cats), no_save=True)
+            target._autosave()
+    for target in create_articles(new_titles, source=article.title, related_cats=set(article.root_cats), autosave=True):
+        related[target.title] = target
+
+
 def get_num_pages_in_categories(category_list):
     num_articles = 0
     for category in category_list:
@@ -84,15 +450,14 @@ class Category:
             # initialize new instance
             self.autosave = True if autosave is None else autosave
             self.title = url_encode(title)
-            self.articles = ()
             self.articles = set() if articles is None else {articles} if isinstance(articles, str) else set(articles)
+            self._dirty = True
 
             if not check_wikipedia_article_exists(f"{self.title}"):
                 print(f"\033[91mWarning: Category \"{self.title}\" does not exist.\033[0m")
                 self.autosave = False
 
-            if self.autosave:
-                self.save()
+            self._autosave()
 
     def add_articles(self, new_articles, no_save=False):
         """
@@ -100,17 +465,25 @@ class Category:
         :param new_articles: str or list of articles
         :param no_save: ignore autosave if True
         """
-        def add_articles(self, new_articles):
-            if isinstance(new_articles, list):
-                self.articles.update(new_articles)
-            elif isinstance(new_articles, str):
-                self.articles.add(new_articles)
-            else:
-                raise ValueError(f"Error adding articles to Category \"{self.title}\". Pass new articles as string or list.")
+        num_articles = len(self.articles)
+        if isinstance(new_articles, (list, set)):
+            self.articles.update(new_articles)
+        elif isinstance(new_articles, str):
+            self.articles.add(new_articles)
+        else:
+            raise ValueError(f"Error adding articles to Category \"{self.title}\". Pass new articles as string or list.")
+        self._dirty = self._dirty or len(self.articles) != num_articles
 
-            if not no_save:
-                if self.autosave:
-                    self.save()
+        if not no_save:
+            self._autosave()
+
+    def _autosave(self):
+        """ save if autosave is on and the instance changed. Inside a batch, saving is deferred until the batch is flushed. """
+        if self.autosave and self._dirty:
+            if _batch is not None:
+                _batch.add(self)
+            else:
+                self.save()
 
     def _create_instance_dict(self):
         """ return instance attributes as dict for saving """
@@ -127,6 +500,10 @@ class Category:
         :param filename: file name. Default: Class name
         :param filepath: save path. Default: save\categories
         """
+        if _store is not None and filename is None and filepath is None:
+            _store.upsert_categories([self._create_instance_dict()])
+            self._dirty = False
+            return
         # set file name
         if filename is None:
             filename = self.title
@@ -137,23 +514,44 @@ class Category:
         # make directory
         os.makedirs(os.path.dirname(filepath), exist_ok=True)
         # save file
-        with open(filepath, "w") as file:
-            json.dump(self._create_instance_dict(), file, indent=4)
+        with metrics.timer("save_seconds", "time to write an instance json file", type=type(self).__name__):
+            with open(filepath, "w") as file:
+                json.dump(self._create_instance_dict(), file, indent=4)
+        self._dirty = False
 
     def load(self, path):
         """
         Load instance from json file
         :param path: Path to json file
         """
-        with open(path, "r") as json_file:
-            data = json.load(json_file)
+        with metrics.timer("load_seconds", "time to read an instance json file", type=type(self).__name__):
+            with open(path, "r") as json_file:
+                data = json.load(json_file)
+        self._load_dict(data, path)
+
+    def _load_dict(self, data, path):
+        """ set instance attributes from an instance dict """
         if data["type"] == "Category":
             self.autosave = data["autosave"]
             self.title = data["title"]
             self.articles = set(data["articles"])
+            self._dirty = False
         else:
             raise ValueError(f"Loading Category: \"{path}\" is not a Category.")
 
+    @classmethod
+    def from_dict(cls, data, autosave=None):
+        """
+        Create an instance from a dict as returned by _create_instance_dict, without touching the disk or network
+        :param data: instance dict
+        :param autosave: overwrite autosave settings if not None
+        """
+        category = cls.__new__(cls)
+        category._load_dict(data, data.get("title"))
+        if autosave is not None:
+            category.autosave = autosave
+        return category
+
     def __str__(self):
         return f"{self.title}. {len(self.articles)} articles."
 
@@ -173,8 +571,7 @@ class Article:
         :param autosave: manual call of the save() function necessary if False. Default: True
         """
 
-        file_path = f"{get_save_path()}\\saved\\articles\\{url_encode(title)}.json"
-        exists = os.path.exists(file_path)
+        saved_data = None if title.endswith(".json") else Article._load_saved_dict(title)
 
         if title.endswith(".json"):
             """ load instance from json file """
@@ -182,19 +579,19 @@ class Article:
             # overwrite autosave settings
             self.autosave = autosave if autosave is not None else self.autosave
 
-        elif exists:
+        elif saved_data is not None:
             """ update instance if it already exists"""
             # print(f"{title} already exists.")
-            self.load(file_path)
-            self.add_relations(relations) if relations is not None else None
-            self.add_root_cats(root_cats) if root_cats is not None else None
-            self.add_related_cats(related_cats) if related_cats is not None else None
+            self._load_dict(saved_data, title)
+            self.add_relations(relations, no_save=True) if relations is not None else None
+            self.add_root_cats(root_cats, no_save=True) if root_cats is not None else None
+            self.add_related_cats(related_cats, no_save=True) if related_cats is not None else None
 
             # overwrite autosave settings
             self.autosave = autosave if autosave is not None else self.autosave
 
-            if self.autosave:
-                self.save()
+            # only written if something was added
+            self._autosave()
 
         else:
             """ initialize new instance """
@@ -204,61 +601,130 @@ class Article:
             self.relations = set() if relations is None else {relations} if isinstance(relations, str) else set(relations)
             self.root_cats = set() if root_cats is None else {root_cats} if isinstance(root_cats, str) else set(root_cats)
             self.related_cats = set() if related_cats is None else {related_cats} if isinstance(related_cats, str) else set(related_cats)
+            self.revision = None
+            self.touched = None
+            self._dirty = True
 
             if not check_wikipedia_article_exists(self.title):
                 print(f"\033[91mWarning: Article \"{self.title}\" does not exist.\033[0m")
                 self.autosave = False
+            elif _listeners:
+                # only articles which exist are announced, missing ones are never saved
+                for field in ("source", "relations", "root_cats", "related_cats"):
+                    if getattr(self, field):
+                        _notify(self, field, getattr(self, field))
 
             if autosave:
-                self.save()
+                self._autosave()
 
         if fill:
             self.fill()
 
-    def fill(self):
-        """ get related articles """
-        related_articles = set(extract_wikipedia_links(self.title))
-        self.add_relations(related_articles)
+    def fill(self, categories=False):
+        """
+        get related articles. Links and categories come from a single download of the page.
+        :param categories: also add the categories of the page itself to related_cats
+        :return: PageRecord of the page
+        """
+        record = fetch_page(self.title)
+        if record.status in ("ok", "redirect"):
+            self._fill_from_record(record, categories)
+        return record
 
-    def add_root_cats(self, root_cats):
-        """ adds one or more root category to the article """
-        if isinstance(root_cats, str):
-            self.root_cats.add(root_cats)
-        elif isinstance(root_cats, list):
-            self.root_cats.update(root_cats)
+    def _fill_from_record(self, record, categories=False, replace=False):
+        """
+        add relations (and categories) of a fetched PageRecord, saving at most once
+        :param replace: also remove relations (and categories) which are no longer on the page.
+            Only allowed for complete records ("ok" or "redirect"), the links of a failed fetch are empty.
+        """
+        if replace and record.status not in ("ok", "redirect"):
+            raise ValueError(f"Can not replace the relations of \"{self.title}\" "
+                             f"from a record with status \"{record.status}\"")
+        links = set(record.links)
+        if replace:
+            self.remove_relations(set(self.relations).difference(links), no_save=True)
+            if categories:
+                self.remove_related_cats(set(self.related_cats).difference(record.categories), no_save=True)
+        self.add_relations(links, no_save=True)
+        if categories:
+            self.add_related_cats(record.categories, no_save=True)
+        if record.revision is not None and (record.revision, record.touched) != (self.revision, self.touched):
+            self.revision, self.touched = record.revision, record.touched
+            self._dirty = True
+        self._autosave()
 
-        if self.autosave:
-            self.save()
+    def add_root_cats(self, root_cats, no_save=False):
+        """ adds one or more root category to the article """
+        self._add("root_cats", root_cats, (list,))
+        if not no_save:
+            self._autosave()
 
-    def add_relations(self, relations):
+    def add_relations(self, relations, no_save=False):
         """ adds one or more related articles to the article """
-        if isinstance(relations, str):
-            self.relations.add(relations)
-        elif isinstance(relations, (list, set)):
-            self.relations.update(relations)
+        self._add("relations", relations)
+        if not no_save:
+            self._autosave()
 
-        if self.autosave:
-            self.save()
+    def add_related_cats(self, related_cats, no_save=False):
+        """ adds one or more related articles to the article """
+        self._add("related_cats", related_cats)
+        if not no_save:
+            self._autosave()
 
-    def add_related_cats(self, related_cats):
+    def add_source(self, source, no_save=False):
         """ adds one or more related articles to the article """
-        if isinstance(related_cats, str):
-            self.related_cats.add(related_cats)
-        elif isinstance(related_cats, (list, set)):
-            self.related_cats.update(related_cats)
+        self._add("source", source)
+        if not no_save:
+            self._autosave()
 
-        if self.autosave:
-            self.save()
+    def _add(self, field, values, collection_types=(list, set)):
+        """ add a str or collection of values to one of the instance sets and mark the instance dirty if it changed """
+        target = getattr(self, field)
+        if isinstance(values, str):
+            added = set() if values in target else {values}
+        elif isinstance(values, collection_types):
+            added = set(values).difference(target)
+        else:
+            return
+        if added:
+            target.update(added)
+            self._dirty = True
+            _notify(self, field, added)
 
-    def add_source(self, source):
-        """ adds one or more related articles to the article """
-        if isinstance(source, str):
-            self.source.add(source)
-        elif isinstance(source, (list, set)):
-            self.source.update(source)
+    def remove_relations(self, relations, no_save=False):
+        """ removes one or more related articles from the article """
+        self._remove("relations", relations)
+        if not no_save:
+            self._autosave()
+
+    def remove_related_cats(self, related_cats, no_save=False):
+        """ removes one or more related categories from the article """
+        self._remove("related_cats", related_cats)
+        if not no_save:
+            self._autosave()
+
+    def remove_source(self, source, no_save=False):
+        """ removes one or more sources from the article """
+        self._remove("source", source)
+        if not no_save:
+            self._autosave()
+
+    def _remove(self, field, values):
+        """ remove a str or collection of values from one of the instance sets and mark the instance dirty if it changed """
+        target = getattr(self, field)
+        removed = target.intersection({values} if isinstance(values, str) else values)
+        if removed:
+            target.difference_update(removed)
+            self._dirty = True
+            _notify(self, field, removed=removed)
 
-        if self.autosave:
-            self.save()
+    def _autosave(self):
+        """ save if autosave is on and the instance changed. Inside a batch, saving is deferred until the batch is flushed. """
+        if self.autosave and self._dirty:
+            if _batch is not None:
+                _batch.add(self)
+            else:
+                self.save()
 
     def _create_instance_dict(self):
         """ return instance attributes as dict for saving """
@@ -269,7 +735,9 @@ class Article:
             "source": list(self.source),
             "root categories": list(self.root_cats),
             "related categories": list(self.related_cats),
-            "relations": list(self.relations)
+            "relations": list(self.relations),
+            "revision": self.revision,
+            "touched": self.touched
         }
 
     def save(self, filename=None, filepath=None):
@@ -278,6 +746,11 @@ class Article:
         :param filename: file name. Default: Class name
         :param filepath: save path. Default: save\categories
         """
+        if _store is not None and filename is None and filepath in (None, "./saved/_root_articles"):
+            _store.upsert_articles([self._create_instance_dict()],
+                                   collection="articles" if filepath is None else _collection(filepath))
+            self._dirty = False
+            return
         # set file name
         if filename is None:
             filename = self.title
@@ -291,16 +764,23 @@ class Article:
         # make directory
         os.makedirs(os.path.dirname(filepath), exist_ok=True)
         # save file
-        with open(filepath, "w") as file:
-            json.dump(self._create_instance_dict(), file, indent=4)
+        with metrics.timer("save_seconds", "time to write an instance json file", type=type(self).__name__):
+            with open(filepath, "w") as file:
+                json.dump(self._create_instance_dict(), file, indent=4)
+        self._dirty = False
 
     def load(self, path):
         """
         Load instance from json file
         :param path: Path to json file
         """
-        with open(path, "r") as json_file:
-            data = json.load(json_file)
+        with metrics.timer("load_seconds", "time to read an instance json file", type=type(self).__name__):
+            with open(path, "r") as json_file:
+                data = json.load(json_file)
+        self._load_dict(data, path)
+
+    def _load_dict(self, data, path):
+        """ set instance attributes from an instance dict """
         if data["type"] == "Article":
             self.autosave = data["autosave"]
             self.title = data["title"]
@@ -308,13 +788,352 @@ class Article:
             self.relations = set(data["relations"])
             self.root_cats = set(data["root categories"])
             self.related_cats = set(data["related categories"])
+            self.revision = data.get("revision")
+            self.touched = data.get("touched")
+            self._dirty = False
         else:
             raise ValueError(f"Loading Article: \"{path}\" is not an Article.")
 
+    @classmethod
+    def from_dict(cls, data, autosave=None):
+        """
+        Create an instance from a dict as returned by _create_instance_dict, without touching the disk or network
+        :param data: instance dict
+        :param autosave: overwrite autosave settings if not None
+        """
+        article = cls.__new__(cls)
+        article._load_dict(data, data.get("title"))
+        if autosave is not None:
+            article.autosave = autosave
+        return article
+
+    @staticmethod
+    def _file_path(title):
+        return f"{get_save_path()}\\saved\\articles\\{url_encode(title)}.json"
+
+    @staticmethod
+    def _load_saved_dict(title):
+        """
+        :param title: article title
+        :return: instance dict of the saved article or None if the article has not been saved yet
+        """
+        if _batch is not None and _batch.get(Article, url_encode(title)) is not None:
+            return _batch.get(Article, url_encode(title))._create_instance_dict()
+        if _store is not None:
+            return _store.get_article_dict(url_encode(title))
+        file_path = Article._file_path(title)
+        if not os.path.exists(file_path):
+            return None
+        with open(file_path, "r") as json_file:
+            return json.load(json_file)
+
+    @staticmethod
+    def is_saved(title):
+        """
+        :param title: article title
+        :return: True if an article with this title has been saved before
+        """
+        if _batch is not None and _batch.get(Article, url_encode(title)) is not None:
+            return True
+        if _store is not None:
+            return _store.has_article(url_encode(title))
+        return os.path.exists(Article._file_path(title))
+
     def __str__(self):
         return f"Article:{self.title}. {len(self.relations)} related articles. Root categories: {list(self.root_cats)}"
 
 
+class LazyArticle:
+    """
+    Proxy for an Article saved as json file. The file is only read on first attribute access,
+    and the sets (relations, source, root_cats, related_cats) are only built when they are accessed.
+    Accessing anything else (e.g. add_relations or save) creates the full Article, which the proxy forwards to from then on.
+    """
+    _DATA_ATTRIBUTES = {
+        "source": "source",
+        "relations": "relations",
+        "root_cats": "root categories",
+        "related_cats": "related categories",
+    }
+
+    def __init__(self, path, autosave=None):
+        """
+        :param path: path to the article json file
+        :param autosave: overwrite autosave settings if not None
+        """
+        object.__setattr__(self, "_path", path)
+        object.__setattr__(self, "_autosave_override", autosave)
+        object.__setattr__(self, "_data", None)
+        object.__setattr__(self, "_article", None)
+        object.__setattr__(self, "_sets", {})
+
+    @property
+    def title(self):
+        if self._article is not None:
+            return self._article.title
+        # saved files are named after the article title
+        return os.path.basename(self._path)[:-len(".json")]
+
+    @property
+    def autosave(self):
+        if self._article is not None:
+            return self._article.autosave
+        return self._autosave_override if self._autosave_override is not None else self._get_data()["autosave"]
+
+    @property
+    def loaded(self):
+        """ True once the full Article has been created """
+        return self._article is not None
+
+    def _get_data(self):
+        if self._data is None:
+            object.__setattr__(self, "_data", _read_json(self._path))
+        return self._data
+
+    def materialize(self):
+        """ :return: the full Article instance """
+        if self._article is None:
+            article = Article.from_dict(self._get_data(), autosave=self._autosave_override)
+            # keep sets which might already be referenced by the caller
+            for attribute, values in self._sets.items():
+                setattr(article, attribute, values)
+            object.__setattr__(self, "_article", article)
+            object.__setattr__(self, "_data", None)
+        return self._article
+
+    def __getattr__(self, name):
+        # only called for attributes not found on the proxy itself
+        if self._article is None and name in LazyArticle._DATA_ATTRIBUTES:
+            if name not in self._sets:
+                self._sets[name] = set(self._get_data().get(LazyArticle._DATA_ATTRIBUTES[name], ()))
+            return self._sets[name]
+        return getattr(self.materialize(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self.materialize(), name, value)
+
+    def __str__(self):
+        return str(self.materialize())
+
+
+class TitleTable:
+    """
+    Interns titles to dense integer ids. All compact instances share one table,
+    so every article and category title is stored only once in memory.
+    """
+    def __init__(self):
+        self.ids = {}
+        self.titles = []
+
+    def id(self, title):
+        """ :return: id of a title, the title is added if it is not in the table yet """
+        title_id = self.ids.get(title)
+        if title_id is None:
+            title_id = len(self.titles)
+            title = sys.intern(title)
+            self.ids[title] = title_id
+            self.titles.append(title)
+        return title_id
+
+    def id_array(self, titles):
+        """ :return: sorted array of the unique ids of the given titles """
+        return array("i", sorted({self.id(title) for title in titles}))
+
+    def clear(self):
+        """ remove all titles. Only safe if no compact instance using this table is left. """
+        self.ids.clear()
+        self.titles.clear()
+
+    def __len__(self):
+        return len(self.titles)
+
+
+# title table of all compact instances
+titles_table = TitleTable()
+
+
+class IdSet(Set):
+    """
+    Read-only set of titles backed by a sorted array of title ids.
+    len() is O(1), membership a binary search, iteration yields the shared title strings.
+    """
+    __slots__ = ("_ids", "_table")
+
+    def __init__(self, ids, table=None):
+        self._ids = ids
+        self._table = titles_table if table is None else table
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __iter__(self):
+        titles = self._table.titles
+        return (titles[title_id] for title_id in self._ids)
+
+    def __contains__(self, title):
+        title_id = self._table.ids.get(title)
+        if title_id is None:
+            return False
+        position = bisect_left(self._ids, title_id)
+        return position < len(self._ids) and self._ids[position] == title_id
+
+    def __repr__(self):
+        return f"IdSet({set(self)})"
+
+
+def _merge_ids(ids, values, collection_types=(list, set)):
+    """ :return: sorted id array containing ids and the ids of a str or collection of titles """
+    if isinstance(values, str):
+        values = (values,)
+    elif not isinstance(values, collection_types + (IdSet, frozenset, tuple)):
+        return ids
+    new_ids = {titles_table.id(value) for value in values}.difference(ids)
+    if not new_ids:
+        return ids
+    return array("i", sorted(new_ids.union(ids)))
+
+
+class CompactArticle:
+    """
+    Memory efficient variant of Article with the same add_*, save and _create_instance_dict api.
+    Instead of a __dict__ and four sets of strings per instance, it uses __slots__ and stores
+    source, relations and categories as sorted arrays of ids into the shared titles_table (exposed as IdSet).
+    Compact instances are created with from_dict or load_all_articles(..., compact=True).
+    """
+    __slots__ = ("title", "autosave", "_dirty", "_source", "_relations", "_root_cats", "_related_cats", "revision",
+                 "touched")
+
+    source = property(lambda self: IdSet(self._source))
+    relations = property(lambda self: IdSet(self._relations))
+    root_cats = property(lambda self: IdSet(self._root_cats))
+    related_cats = property(lambda self: IdSet(self._related_cats))
+
+    def add_root_cats(self, root_cats, no_save=False):
+        """ adds one or more root category to the article """
+        self._add("_root_cats", root_cats, (list,))
+        if not no_save:
+            self._autosave()
+
+    def add_relations(self, relations, no_save=False):
+        """ adds one or more related articles to the article """
+        self._add("_relations", relations)
+        if not no_save:
+            self._autosave()
+
+    def add_related_cats(self, related_cats, no_save=False):
+        """ adds one or more related categories to the article """
+        self._add("_related_cats", related_cats)
+        if not no_save:
+            self._autosave()
+
+    def add_source(self, source, no_save=False):
+        """ adds one or more sources to the article """
+        self._add("_source", source)
+        if not no_save:
+            self._autosave()
+
+    def _add(self, attribute, values, collection_types=(list, set)):
+        ids = getattr(self, attribute)
+        merged = _merge_ids(ids, values, collection_types)
+        if merged is not ids:
+            setattr(self, attribute, merged)
+            self._dirty = True
+            if _listeners:
+                _notify(self, attribute[1:], set(IdSet(merged)).difference(IdSet(ids)))
+
+    def remove_relations(self, relations, no_save=False):
+        """ removes one or more related articles from the article """
+        self._remove("_relations", relations)
+        if not no_save:
+            self._autosave()
+
+    def remove_related_cats(self, related_cats, no_save=False):
+        """ removes one or more related categories from the article """
+        self._remove("_related_cats", related_cats)
+        if not no_save:
+            self._autosave()
+
+    def remove_source(self, source, no_save=False):
+        """ removes one or more sources from the article """
+        self._remove("_source", source)
+        if not no_save:
+            self._autosave()
+
+    def _remove(self, attribute, values):
+        ids = getattr(self, attribute)
+        removed = {titles_table.ids.get(value) for value in ({values} if isinstance(values, str) else values)}
+        remaining = array("i", (i for i in ids if i not in removed))
+        if len(remaining) != len(ids):
+            setattr(self, attribute, remaining)
+            self._dirty = True
+            if _listeners:
+                _notify(self, attribute[1:], removed=set(IdSet(ids)).difference(IdSet(remaining)))
+
+    def _load_dict(self, data, path):
+        """ set instance attributes from an instance dict """
+        if data["type"] != "Article":
+            raise ValueError(f"Loading Article: \"{path}\" is not an Article.")
+        self.autosave = data["autosave"]
+        self.title = sys.intern(data["title"])
+        self._source = titles_table.id_array(data.get("source", ()))
+        self._relations = titles_table.id_array(data["relations"])
+        self._root_cats = titles_table.id_array(data["root categories"])
+        self._related_cats = titles_table.id_array(data["related categories"])
+        self.revision = data.get("revision")
+        self.touched = data.get("touched")
+        self._dirty = False
+
+    from_dict = classmethod(Article.from_dict.__func__)
+    fill = Article.fill
+    _fill_from_record = Article._fill_from_record
+    save = Article.save
+    load = Article.load
+    _autosave = Article._autosave
+    _create_instance_dict = Article._create_instance_dict
+    __str__ = Article.__str__
+
+
+class CompactCategory:
+    """
+    Memory efficient variant of Category, storing its articles as sorted array of ids into the shared titles_table.
+    Compact instances are created with from_dict or load_all_categories(..., compact=True).
+    """
+    __slots__ = ("title", "autosave", "_dirty", "_articles")
+
+    articles = property(lambda self: IdSet(self._articles))
+
+    def add_articles(self, new_articles, no_save=False):
+        """
+        Add new articles to the class
+        :param new_articles: str or list of articles
+        :param no_save: ignore autosave if True
+        """
+        if not isinstance(new_articles, (list, set, str)):
+            raise ValueError(f"Error adding articles to Category \"{self.title}\". Pass new articles as string or list.")
+        merged = _merge_ids(self._articles, new_articles)
+        if merged is not self._articles:
+            self._articles = merged
+            self._dirty = True
+        if not no_save:
+            self._autosave()
+
+    def _load_dict(self, data, path):
+        """ set instance attributes from an instance dict """
+        if data["type"] != "Category":
+            raise ValueError(f"Loading Category: \"{path}\" is not a Category.")
+        self.autosave = data["autosave"]
+        self.title = sys.intern(data["title"])
+        self._articles = titles_table.id_array(data["articles"])
+        self._dirty = False
+
+    from_dict = classmethod(Category.from_dict.__func__)
+    save = Category.save
+    load = Category.load
+    _autosave = Category._autosave
+    _create_instance_dict = Category._create_instance_dict
+    __str__ = Category.__str__
+
+
 if __name__ == "__main__":
     """ main block for testing only """
 
@@ -0,0 +1,267 @@
+import os
+import json
+import tqdm
+import numpy as np
+import scipy.sparse as sp
+from util.classes import add_listener, remove_listener, articles_fingerprint
+
+
+def get_default_cooccurrence_path():
+    """ :return: path of the persisted co-occurrence counts, saved/cooccurrence.json """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    return os.path.join(root, "saved", "cooccurrence.json")
+
+
+def short_title(category):
+    """ category title without "Category:" prefix """
+    return category.replace("Category:", "")
+
+
+class CooccurrenceMatrix:
+    """
+    Symmetric category x category matrix labelled by category title.
+    Off-diagonal entries count the articles shared by two categories, the diagonal holds the number of articles
+    of each category.
+    """
+    def __init__(self, labels, matrix):
+        """
+        :param labels: list of category titles (without "Category:" prefix)
+        :param matrix: dense or sparse square matrix
+        """
+        self.labels = list(labels)
+        self.index = {label: i for i, label in enumerate(self.labels)}
+        self.matrix = matrix.toarray() if sp.issparse(matrix) else np.asarray(matrix)
+
+    def __len__(self):
+        return len(self.labels)
+
+    def __getitem__(self, pair):
+        """ matrix[category_a, category_b] """
+        a, b = pair
+        return self.matrix[self.index[short_title(a)], self.index[short_title(b)]]
+
+    @property
+    def occurrences(self):
+        """ :return: array with the number of articles of each category """
+        return np.diag(self.matrix).copy()
+
+    def pairs(self):
+        """ :return: copy of the matrix with zero diagonal, i.e. only counts of category pairs """
+        pairs = self.matrix.copy()
+        np.fill_diagonal(pairs, 0)
+        return pairs
+
+    def normalized(self, method="mean"):
+        """
+        Normalize the pair counts by how often the categories occur
+        :param method:
+            "mean": count * (mean / occurrences_a + mean / occurrences_b), as in evaluate_with_normalization.py
+            "jaccard": count / (occurrences_a + occurrences_b - count)
+            "cosine": count / sqrt(occurrences_a * occurrences_b)
+        :return: CooccurrenceMatrix with the normalized values and zero diagonal
+        """
+        pairs = self.pairs().astype(float)
+        occurrences = self.occurrences.astype(float)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            if method == "mean":
+                inverse = np.where(occurrences > 0, occurrences.mean() / occurrences, 0)
+                values = pairs * (inverse[:, None] + inverse[None, :])
+            elif method == "jaccard":
+                values = pairs / (occurrences[:, None] + occurrences[None, :] - pairs)
+            elif method == "cosine":
+                values = pairs / np.sqrt(np.outer(occurrences, occurrences))
+            else:
+                raise ValueError(f"Unknown normalization method \"{method}\".")
+        values = np.nan_to_num(values, nan=0.0, posinf=0.0)
+        np.fill_diagonal(values, 0)
+        return CooccurrenceMatrix(self.labels, values)
+
+    def iter_edges(self, min_weight=0):
+        """
+        :param min_weight: skip pairs with a weight below this value. Pairs with weight 0 are always skipped.
+        :return: iterator over (index_a, index_b, weight) of the upper triangle
+        """
+        # row by row, so no copy of the whole matrix is made
+        for row in range(len(self.labels)):
+            weights = self.matrix[row, row + 1:]
+            for offset in np.nonzero((weights != 0) & (weights >= min_weight))[0]:
+                yield row, row + 1 + int(offset), weights[offset].item()
+
+    def to_dict(self):
+        """ :return: dict "A+B" -> count of all category pairs, the format evaluate.py used to build """
+        return {f"{self.labels[i]}+{self.labels[j]}": self.matrix[i, j].item()
+                for i in range(len(self.labels)) for j in range(i + 1, len(self.labels))}
+
+    def __str__(self):
+        return f"CooccurrenceMatrix: {len(self.labels)} categories, {int(np.count_nonzero(np.triu(self.matrix, k=1)))} pairs"
+
+
+def incidence_matrix(articles, categories, category_attr="related_cats"):
+    """
+    Sparse article x category incidence matrix
+    :param articles: iterable of article instances
+    :param categories: list of category titles or instances. Categories of articles which are not listed are ignored.
+    :param category_attr: article attribute holding the categories ("related_cats" or "root_cats")
+    :return: (scipy.sparse.csr_matrix, list of category labels)
+    """
+    labels = sorted({short_title(category if isinstance(category, str) else category.title) for category in categories})
+    index = {label: i for i, label in enumerate(labels)}
+
+    rows, cols = [], []
+    num_articles = 0
+    for row, article in enumerate(articles):
+        num_articles += 1
+        for category in getattr(article, category_attr):
+            col = index.get(short_title(category))
+            if col is not None:
+                rows.append(row)
+                cols.append(col)
+
+    data = np.ones(len(rows), dtype=np.int32)
+    matrix = sp.csr_matrix((data, (rows, cols)), shape=(num_articles, len(labels)))
+    # an article can list the same category with and without prefix
+    matrix.data[:] = 1
+    return matrix, labels
+
+
+def cooccurrence(articles, categories, category_attr="related_cats"):
+    """
+    Count for every pair of categories the articles belonging to both, as AᵀA of the article x category incidence matrix
+    :param articles: iterable of article instances
+    :param categories: list of category titles or instances
+    :param category_attr: article attribute holding the categories ("related_cats" or "root_cats")
+    :return: CooccurrenceMatrix labelled by category title (without "Category:" prefix), sorted alphabetically
+    """
+    incidence, labels = incidence_matrix(articles, categories, category_attr)
+    return CooccurrenceMatrix(labels, (incidence.T @ incidence).toarray())
+
+
+class CooccurrenceAccumulator:
+    """
+    Running co-occurrence counts which are kept up to date while articles change, instead of recounting all articles.
+    While attached, every change of the category attribute of an article applies only the pairs of that article:
+    the pairs of its old categories are subtracted and the pairs of its new categories are added.
+    The counts are saved as json file, so evaluation scripts can use them without loading any article.
+    Together with the counts a fingerprint of the saved articles is stored, load_or_build recounts if the articles
+    were changed since by a script which did not attach an accumulator.
+    """
+    def __init__(self, categories, category_attr="related_cats", path=None, save_dir="./saved/articles"):
+        """
+        :param categories: list of category titles or instances. Categories which are not listed are ignored.
+        :param category_attr: article attribute holding the categories ("related_cats" or "root_cats")
+        :param path: path of the json file the counts are saved to. Default: saved/cooccurrence.json
+        :param save_dir: directory (or store collection) of the counted articles, see articles_fingerprint
+        """
+        self.labels = sorted({short_title(category if isinstance(category, str) else category.title)
+                              for category in categories})
+        self.index = {label: i for i, label in enumerate(self.labels)}
+        self.category_attr = category_attr
+        self.path = get_default_cooccurrence_path() if path is None else path
+        self.save_dir = save_dir
+        self.fingerprint = None
+        self.counts = np.zeros((len(self.labels), len(self.labels)), dtype=np.int64)
+        self.changed = False
+        self.attached = False
+
+    @classmethod
+    def build(cls, articles, categories, category_attr="related_cats", path=None, save_dir="./saved/articles"):
+        """
+        Count all articles once
+        :param articles: iterable of article instances
+        :return: CooccurrenceAccumulator
+        """
+        accumulator = cls(categories, category_attr, path, save_dir)
+        incidence, _ = incidence_matrix(tqdm.tqdm(articles, desc="Counting category pairs"), accumulator.labels,
+                                        category_attr)
+        accumulator.counts = (incidence.T @ incidence).toarray().astype(np.int64)
+        accumulator.changed = True
+        return accumulator
+
+    @classmethod
+    def load(cls, path=None):
+        """
+        Load saved counts
+        :param path: see __init__
+        :return: CooccurrenceAccumulator
+        """
+        path = get_default_cooccurrence_path() if path is None else path
+        with open(path, "r") as json_file:
+            data = json.load(json_file)
+        accumulator = cls(data["labels"], data["category_attr"], path, data.get("save_dir", "./saved/articles"))
+        accumulator.fingerprint = data.get("fingerprint")
+        accumulator.counts = np.array(data["counts"], dtype=np.int64).reshape(len(accumulator.labels), -1)
+        return accumulator
+
+    @classmethod
+    def load_or_build(cls, articles, categories, category_attr="related_cats", path=None, save_dir="./saved/articles"):
+        """
+        Load the saved counts if they exist for the same categories and the articles did not change since they were
+        saved, otherwise count the articles and save the counts
+        :param articles: iterable of article instances, only used if the counts have to be built
+        :param save_dir: directory (or store collection) the articles were loaded from
+        :return: CooccurrenceAccumulator
+        """
+        path = get_default_cooccurrence_path() if path is None else path
+        if os.path.exists(path):
+            accumulator = cls.load(path)
+            if accumulator.labels == cls(categories).labels and accumulator.category_attr == category_attr \
+                    and accumulator.save_dir == save_dir:
+                if accumulator.fingerprint == articles_fingerprint(save_dir):
+                    return accumulator
+                print("Articles changed since the co-occurrence counts were saved, counting again.")
+        accumulator = cls.build(articles, categories, category_attr, path, save_dir)
+        accumulator.save()
+        return accumulator
+
+    def save(self, path=None):
+        """
+        Save the counts as json file, with the fingerprint of the saved articles they belong to.
+        Save after the articles, so the counts include all of their changes.
+        :param path: Default: path the accumulator was created with
+        """
+        path = self.path if path is None else path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.fingerprint = articles_fingerprint(self.save_dir)
+        with open(path, "w") as file:
+            json.dump({"labels": self.labels, "category_attr": self.category_attr, "save_dir": self.save_dir,
+                       "fingerprint": self.fingerprint, "counts": self.counts.tolist()}, file)
+        self.changed = False
+
+    def _ids(self, categories):
+        ids = {self.index.get(short_title(category)) for category in categories}
+        ids.discard(None)
+        return np.array(sorted(ids), dtype=np.int64)
+
+    def update(self, old_categories, new_categories):
+        """
+        Replace the contribution of one article
+        :param old_categories: categories of the article before the change
+        :param new_categories: categories of the article after the change
+        """
+        old, new = self._ids(old_categories), self._ids(new_categories)
+        if np.array_equal(old, new):
+            return
+        self.counts[np.ix_(old, old)] -= 1
+        self.counts[np.ix_(new, new)] += 1
+        self.changed = True
+
+    def attach(self):
+        """ keep the counts up to date with all category changes of articles from now on """
+        add_listener(self._on_change)
+        self.attached = True
+
+    def detach(self):
+        remove_listener(self._on_change)
+        self.attached = False
+
+    def _on_change(self, article, field, added, removed):
+        if field == self.category_attr:
+            current = set(getattr(article, field))
+            self.update(current.difference(added).union(removed), current)
+
+    def matrix(self):
+        """ :return: CooccurrenceMatrix of the current counts, as cooccurrence() would return it """
+        return CooccurrenceMatrix(self.labels, self.counts.copy())
+
+    def __str__(self):
+        return f"CooccurrenceAccumulator: {len(self.labels)} categories, {int(np.triu(self.counts, k=1).sum())} pair counts"
@@ -0,0 +1,282 @@
+import os
+import csv
+from itertools import islice
+from xml.sax.saxutils import escape, quoteattr
+
+EXPORT_FORMATS = ("csv", "gexf", "graphml")
+
+
+def export_format(path, format=None):
+    """ :return: format, or the format given by the file extension of path ("csv", "gexf" or "graphml") """
+    if format is None:
+        format = os.path.splitext(path)[1].lstrip(".").lower()
+    if format not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format \"{format}\". Use one of {', '.join(EXPORT_FORMATS)}.")
+    return format
+
+
+def _chunks(iterable, chunk_size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _format_weight(weight):
+    """ integral weights without decimals, e.g. 3 instead of 3.0 """
+    return str(int(weight)) if float(weight).is_integer() else repr(float(weight))
+
+
+class _AtomicFile:
+    """ text file written to <path>.tmp, which replaces path when it is closed without error """
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.temp_path = f"{path}.tmp"
+        self.file = open(self.temp_path, "w", newline="", encoding="utf-8")
+
+    def close(self, commit=True):
+        self.file.close()
+        if commit:
+            os.replace(self.temp_path, self.path)
+        else:
+            os.remove(self.temp_path)
+
+
+class GraphWriter:
+    """
+    Streams nodes and edges of a graph to a file. Nodes and edges are taken from iterators and written in chunks,
+    so the memory use does not depend on the size of the graph. All nodes have to be written before the edges:
+
+        with GexfWriter("./results/graph.gexf") as writer:
+            writer.write_nodes((i, label) for i, label in enumerate(labels))
+            writer.write_edges(matrix.iter_edges(min_weight=1))
+    """
+    def __init__(self, path, directed=False, chunk_size=10000):
+        """
+        :param path: output file, missing directories are created. It is only replaced once the writer is closed.
+        :param directed: edge type of the graph
+        :param chunk_size: number of nodes or edges formatted and written at once
+        """
+        self.path = path
+        self.directed = directed
+        self.chunk_size = chunk_size
+        self.num_nodes = 0
+        self.num_edges = 0
+        self._output = None
+
+    def open(self):
+        self._output = _AtomicFile(self.path)
+        self._output.file.write(self._header())
+        return self
+
+    def write_nodes(self, nodes):
+        """ :param nodes: iterable of (id, label) """
+        for chunk in _chunks(nodes, self.chunk_size):
+            self._output.file.writelines(self._node(node, label) for node, label in chunk)
+            self.num_nodes += len(chunk)
+
+    def write_edges(self, edges, min_weight=None):
+        """
+        :param edges: iterable of (source id, target id, weight)
+        :param min_weight: skip edges with a weight below this value
+        """
+        if min_weight is not None:
+            edges = (edge for edge in edges if edge[2] >= min_weight)
+        for chunk in _chunks(edges, self.chunk_size):
+            self._output.file.writelines(self._edge(self.num_edges + i, source, target, weight)
+                                         for i, (source, target, weight) in enumerate(chunk))
+            self.num_edges += len(chunk)
+
+    def close(self, commit=True):
+        """ :param commit: replace the output file, else the partial output is discarded """
+        if self._output is not None:
+            if commit:
+                self._output.file.write(self._footer())
+            self._output.close(commit)
+            self._output = None
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close(commit=exc_type is None)
+
+    def __str__(self):
+        return f"{type(self).__name__}: {self.num_nodes} nodes, {self.num_edges} edges to {self.path}"
+
+    def _header(self):
+        return ""
+
+    def _footer(self):
+        return ""
+
+    def _node(self, node, label):
+        raise NotImplementedError
+
+    def _edge(self, edge, source, target, weight):
+        raise NotImplementedError
+
+
+class GexfWriter(GraphWriter):
+    """ GEXF 1.3, the native format of Gephi """
+    _edges_started = False
+
+    def _header(self):
+        edge_type = "directed" if self.directed else "undirected"
+        return ('<?xml version="1.0" encoding="UTF-8"?>\n'
+                '<gexf xmlns="http://gexf.net/1.3" version="1.3">\n'
+                f'  <graph mode="static" defaultedgetype="{edge_type}">\n'
+                '    <nodes>\n')
+
+    def write_edges(self, edges, min_weight=None):
+        if not self._edges_started:
+            self._output.file.write('    </nodes>\n    <edges>\n')
+            self._edges_started = True
+        super().write_edges(edges, min_weight)
+
+    def _footer(self):
+        if not self._edges_started:
+            return '    </nodes>\n  </graph>\n</gexf>\n'
+        return '    </edges>\n  </graph>\n</gexf>\n'
+
+    def _node(self, node, label):
+        return f'      <node id="{node}" label={quoteattr(str(label))}/>\n'
+
+    def _edge(self, edge, source, target, weight):
+        return f'      <edge id="{edge}" source="{source}" target="{target}" weight="{_format_weight(weight)}"/>\n'
+
+
+class GraphmlWriter(GraphWriter):
+    """ GraphML with a label attribute for nodes and a weight attribute for edges """
+    def _header(self):
+        edge_type = "directed" if self.directed else "undirected"
+        return ('<?xml version="1.0" encoding="UTF-8"?>\n'
+                '<graphml xmlns="http://graphml.graphdrawing.org/xmlns">\n'
+                '  <key id="label" for="node" attr.name="label" attr.type="string"/>\n'
+                '  <key id="weight" for="edge" attr.name="weight" attr.type="double"/>\n'
+                f'  <graph id="G" edgedefault="{edge_type}">\n')
+
+    def _footer(self):
+        return '  </graph>\n</graphml>\n'
+
+    def _node(self, node, label):
+        return f'    <node id="n{node}"><data key="label">{escape(str(label))}</data></node>\n'
+
+    def _edge(self, edge, source, target, weight):
+        return (f'    <edge id="e{edge}" source="n{source}" target="n{target}">'
+                f'<data key="weight">{_format_weight(weight)}</data></edge>\n')
+
+
+class CsvWriter(GraphWriter):
+    """
+    Gephi spreadsheet import: a node table (Id;Label) and an edge table (Source;Target;Type;Weight)
+    in two files, path and edges_path
+    """
+    def __init__(self, path, edges_path, directed=False, chunk_size=10000, delimiter=";"):
+        """
+        :param path: node csv file
+        :param edges_path: edge csv file
+        :param delimiter: csv delimiter
+        """
+        super().__init__(path, directed, chunk_size)
+        self.edges_path = edges_path
+        self.delimiter = delimiter
+        self._edges_output = None
+
+    def open(self):
+        self._output = _AtomicFile(self.path)
+        self._edges_output = _AtomicFile(self.edges_path)
+        self._nodes_csv = csv.writer(self._output.file, delimiter=self.delimiter)
+        self._edges_csv = csv.writer(self._edges_output.file, delimiter=self.delimiter)
+        self._nodes_csv.writerow(["Id", "Label"])
+        self._edges_csv.writerow(["Source", "Target", "Type", "Weight"])
+        return self
+
+    def write_nodes(self, nodes):
+        for chunk in _chunks(nodes, self.chunk_size):
+            self._nodes_csv.writerows(chunk)
+            self.num_nodes += len(chunk)
+
+    def write_edges(self, edges, min_weight=None):
+        if min_weight is not None:
+            edges = (edge for edge in edges if edge[2] >= min_weight)
+        edge_type = "Directed" if self.directed else "Undirected"
+        for chunk in _chunks(edges, self.chunk_size):
+            self._edges_csv.writerows((source, target, edge_type, _format_weight(weight))
+                                      for source, target, weight in chunk)
+            self.num_edges += len(chunk)
+
+    def close(self, commit=True):
+        if self._edges_output is not None:
+            self._edges_output.close(commit)
+            self._edges_output = None
+        super().close(commit)
+
+
+def graph_writer(path, format=None, directed=False, edges_path=None, chunk_size=10000):
+    """
+    :param path: output file (the node table for csv)
+    :param format: "csv", "gexf" or "graphml". Default: from the file extension of path
+    :param edges_path: edge table for csv. Default: path with "nodes" replaced by "edges", or <name>_edges.csv
+    :return: GraphWriter of the format
+    """
+    format = export_format(path, format)
+    if format == "csv":
+        if edges_path is None:
+            directory, name = os.path.split(path)
+            root, extension = os.path.splitext(name)
+            edges_name = name.replace("nodes", "edges") if "nodes" in name else f"{root}_edges{extension}"
+            edges_path = os.path.join(directory, edges_name)
+        return CsvWriter(path, edges_path, directed, chunk_size)
+    cls = GexfWriter if format == "gexf" else GraphmlWriter
+    return cls(path, directed, chunk_size)
+
+
+def export_graph(path, nodes, edges, format=None, directed=False, min_weight=None, edges_path=None,
+                 chunk_size=10000):
+    """
+    Stream a graph to a file
+    :param nodes: iterable of (id, label)
+    :param edges: iterable of (source id, target id, weight)
+    :param min_weight: skip edges with a weight below this value
+    :return: (number of nodes, number of edges) written
+    """
+    with graph_writer(path, format, directed, edges_path, chunk_size) as writer:
+        writer.write_nodes(nodes)
+        writer.write_edges(edges, min_weight)
+    return writer.num_nodes, writer.num_edges
+
+
+def export_cooccurrence(matrix, path, format=None, min_weight=1, edges_path=None, chunk_size=10000):
+    """
+    Export the category graph of a CooccurrenceMatrix, e.g. for Gephi
+    :param matrix: CooccurrenceMatrix (counts or normalized values)
+    :param min_weight: skip category pairs with a weight below this value, pairs with weight 0 are always skipped
+    :return: (number of nodes, number of edges) written
+    """
+    return export_graph(path, enumerate(matrix.labels), matrix.iter_edges(min_weight), format, directed=False,
+                        edges_path=edges_path, chunk_size=chunk_size)
+
+
+def _link_edges(graph, num_nodes):
+    for source in range(num_nodes):
+        for target in graph.out_neighbors(source):
+            if target < num_nodes:
+                yield source, int(target), 1
+
+
+def export_link_graph(graph, path, format=None, saved_only=True, edges_path=None, chunk_size=10000):
+    """
+    Export the directed article graph of a LinkGraph, one edge of weight 1 per link
+    :param graph: LinkGraph
+    :param saved_only: only export saved articles and the links between them,
+        else also the articles which are only linked to
+    :return: (number of nodes, number of edges) written
+    """
+    num_nodes = graph.num_saved if saved_only else len(graph)
+    nodes = ((node, graph.title(node)) for node in range(num_nodes))
+    return export_graph(path, nodes, _link_edges(graph, num_nodes), format, directed=True, edges_path=edges_path,
+                        chunk_size=chunk_size)
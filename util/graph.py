@@ -0,0 +1,252 @@
+import numpy as np
+
+
+def _build_csr(num_rows, rows, cols):
+    """
+    Build CSR arrays from (row, col) pairs
+    :param num_rows: number of rows
+    :param rows: int array of row ids
+    :param cols: int array of column ids
+    :return: indptr (int64, num_rows + 1), indices (int32, sorted within each row)
+    """
+    rows = np.asarray(rows, dtype=np.int64)
+    cols = np.asarray(cols, dtype=np.int32)
+    order = np.lexsort((cols, rows))
+    indptr = np.zeros(num_rows + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=num_rows), out=indptr[1:])
+    return indptr, cols[order]
+
+
+def _transpose_csr(indptr, indices, num_cols):
+    """ CSR arrays of the transposed matrix """
+    rows = np.repeat(np.arange(len(indptr) - 1, dtype=np.int64), np.diff(indptr))
+    return _build_csr(num_cols, indices, rows)
+
+
+def _bit_counts(bits, num_groups, chunk_size=1 << 16):
+    """ :return: number of rows in which each of the first num_groups bits is set, of a (rows, words) uint64 array """
+    counts = np.zeros(bits.shape[1] * 64, dtype=np.int64)
+    for start in range(0, len(bits), chunk_size):
+        chunk = np.ascontiguousarray(bits[start:start + chunk_size]).view(np.uint8)
+        counts += np.unpackbits(chunk, axis=1, bitorder="little").sum(axis=0, dtype=np.int64)
+    return counts[:num_groups]
+
+
+class LinkGraph:
+    """
+    Compact directed link graph of articles.
+    Titles are interned to dense integer ids (saved articles first, then articles that are only linked to).
+    Outgoing and incoming links are stored as CSR arrays (indptr/indices), category membership as a sparse
+    article x category incidence matrix in CSR form (and its transpose for category -> articles lookups),
+    so neighbor, degree and membership queries are array slices.
+    """
+    def __init__(self, titles, out_indptr, out_indices, categories, cat_indptr, cat_indices, num_saved=None):
+        """
+        Initialize a link graph from CSR arrays. Use LinkGraph.from_articles or LinkGraph.from_store to build one.
+        :param titles: list of node titles, index = node id
+        :param out_indptr, out_indices: CSR arrays of outgoing links
+        :param categories: list of category titles, index = category id
+        :param cat_indptr, cat_indices: CSR arrays of the article x category incidence matrix
+        :param num_saved: number of saved articles (ids 0 .. num_saved - 1). Default: all nodes
+        """
+        self.titles = list(titles)
+        self.ids = {title: i for i, title in enumerate(self.titles)}
+        self.num_saved = len(self.titles) if num_saved is None else num_saved
+        self.out_indptr, self.out_indices = out_indptr, out_indices
+        self.in_indptr, self.in_indices = _transpose_csr(out_indptr, out_indices, len(self.titles))
+
+        self.categories = list(categories)
+        self.category_ids = {category: i for i, category in enumerate(self.categories)}
+        self.cat_indptr, self.cat_indices = cat_indptr, cat_indices
+        self.member_indptr, self.member_indices = _transpose_csr(cat_indptr, cat_indices, len(self.categories))
+
+    @classmethod
+    def from_edges(cls, saved_titles, relations, memberships):
+        """
+        Build a graph from title pairs
+        :param saved_titles: iterable of titles of saved articles
+        :param relations: iterable of (title, linked title) pairs
+        :param memberships: iterable of (title, category) pairs
+        :return: LinkGraph
+        """
+        ids = {}
+        for title in saved_titles:
+            ids.setdefault(title, len(ids))
+        num_saved = len(ids)
+
+        sources, targets = [], []
+        for title, target in relations:
+            sources.append(ids.setdefault(title, len(ids)))
+            targets.append(ids.setdefault(target, len(ids)))
+
+        category_ids = {}
+        members, member_categories = [], []
+        for title, category in memberships:
+            members.append(ids.setdefault(title, len(ids)))
+            member_categories.append(category_ids.setdefault(category, len(category_ids)))
+
+        out_indptr, out_indices = _build_csr(len(ids), sources, targets)
+        cat_indptr, cat_indices = _build_csr(len(ids), members, member_categories)
+        return cls(ids, out_indptr, out_indices, category_ids, cat_indptr, cat_indices, num_saved=num_saved)
+
+    @classmethod
+    def from_articles(cls, articles, category_attr="related_cats"):
+        """
+        Build a graph from article instances, e.g. the output of load_all_articles
+        :param articles: iterable of Article instances
+        :param category_attr: article attribute used for category membership ("related_cats" or "root_cats")
+        :return: LinkGraph
+        """
+        articles = list(articles)
+        return cls.from_edges(
+            (article.title for article in articles),
+            ((article.title, target) for article in articles for target in article.relations),
+            ((article.title, category) for article in articles for category in getattr(article, category_attr)))
+
+    @classmethod
+    def from_store(cls, store, collection="articles", category_attr="related_cats"):
+        """
+        Build a graph directly from the tables of an ArticleStore, without creating Article instances
+        :param store: ArticleStore
+        :param collection: "articles" or "_root_articles"
+        :param category_attr: "related_cats" or "root_cats"
+        :return: LinkGraph
+        """
+        return cls.from_edges(store.iter_article_titles(collection),
+                              store.iter_relations(collection),
+                              store.iter_categories(collection, category_attr))
+
+    def __len__(self):
+        return len(self.titles)
+
+    @property
+    def num_edges(self):
+        return len(self.out_indices)
+
+    def id(self, title):
+        """ :return: node id of a title. Raises KeyError for unknown titles. """
+        return self.ids[title]
+
+    def title(self, node):
+        """ :return: title of a node id """
+        return self.titles[node]
+
+    def out_neighbors(self, node):
+        """ :return: ids of the articles linked by a node """
+        return self.out_indices[self.out_indptr[node]:self.out_indptr[node + 1]]
+
+    def in_neighbors(self, node):
+        """ :return: ids of the articles linking to a node """
+        return self.in_indices[self.in_indptr[node]:self.in_indptr[node + 1]]
+
+    def out_degree(self, node=None):
+        """ :return: number of outgoing links of a node, or an array of all out-degrees if node is None """
+        if node is None:
+            return np.diff(self.out_indptr)
+        return int(self.out_indptr[node + 1] - self.out_indptr[node])
+
+    def in_degree(self, node=None):
+        """ :return: number of incoming links of a node, or an array of all in-degrees if node is None """
+        if node is None:
+            return np.diff(self.in_indptr)
+        return int(self.in_indptr[node + 1] - self.in_indptr[node])
+
+    def categories_of(self, node):
+        """ :return: category ids of a node """
+        return self.cat_indices[self.cat_indptr[node]:self.cat_indptr[node + 1]]
+
+    def members(self, category):
+        """
+        :param category: category id or title
+        :return: ids of the articles in a category
+        """
+        if isinstance(category, str):
+            category = self.category_ids[category]
+        return self.member_indices[self.member_indptr[category]:self.member_indptr[category + 1]]
+
+    def is_member(self, node, category):
+        """ :return: True if the node belongs to the category (id or title) """
+        if isinstance(category, str):
+            category = self.category_ids.get(category)
+            if category is None:
+                return False
+        row = self.categories_of(node)
+        position = np.searchsorted(row, category)
+        return bool(position < len(row) and row[position] == category)
+
+    def has_edge(self, source, target):
+        """ :return: True if node source links to node target """
+        row = self.out_neighbors(source)
+        position = np.searchsorted(row, target)
+        return bool(position < len(row) and row[position] == target)
+
+    def _expand(self, nodes):
+        """ :return: ids of all out-neighbors of the given node ids, with duplicates """
+        starts = self.out_indptr[nodes]
+        lengths = self.out_indptr[nodes + 1] - starts
+        offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+        return self.out_indices[offsets]
+
+    def _source_ids(self, sources):
+        """ dict group -> titles or ids  ->  (list of groups, list of id arrays). Unknown titles are skipped. """
+        if sources is None:
+            return list(self.categories), [self.members(category) for category in range(len(self.categories))]
+        groups, ids = [], []
+        for group, members in sources.items():
+            members = [self.ids.get(member) if isinstance(member, str) else member for member in members]
+            groups.append(group)
+            ids.append(np.unique(np.array([member for member in members if member is not None], dtype=np.int64)))
+        return groups, ids
+
+    def reachable_counts(self, k, sources=None, bitset=True):
+        """
+        Count for every group of source articles the distinct articles reachable within 0 .. k hops along links.
+        All groups are expanded in one pass: every node carries a bitset (uint64 words) of the groups which reached it,
+        and one hop ORs the bitsets of the in-neighbors of every node, so each link is visited once per hop.
+        :param k: maximum number of hops
+        :param sources: dict mapping a group name to its source titles or node ids, e.g. {category.title: category.articles}.
+            Default: the members of every category of the graph
+        :param bitset: expand all groups at once with bitsets. If False, every group is expanded on its own with a
+            boolean visited array, which needs less memory for many groups.
+        :return: (list of group names, int array counts of shape (k + 1, number of groups)):
+            counts[h, g] is the number of distinct articles reachable from group g within h hops (h = 0: the sources)
+        """
+        groups, ids = self._source_ids(sources)
+        if not bitset:
+            counts = np.zeros((k + 1, len(groups)), dtype=np.int64)
+            for g, frontier in enumerate(ids):
+                visited = np.zeros(len(self.titles), dtype=bool)
+                visited[frontier] = True
+                counts[0, g] = len(frontier)
+                for hop in range(1, k + 1):
+                    neighbors = self._expand(frontier)
+                    frontier = np.unique(neighbors[~visited[neighbors]])
+                    visited[frontier] = True
+                    counts[hop, g] = counts[hop - 1, g] + len(frontier)
+            return groups, counts
+
+        num_words = max(1, (len(groups) + 63) // 64)
+        reached = np.zeros((len(self.titles), num_words), dtype=np.uint64)
+        for g, members in enumerate(ids):
+            reached[members, g // 64] |= np.uint64(1 << (g % 64))
+        frontier = reached.copy()
+
+        has_in = np.diff(self.in_indptr) > 0
+        starts = self.in_indptr[:-1][has_in]
+        counts = [_bit_counts(reached, len(groups))]
+        for _ in range(k):
+            incoming = np.zeros_like(reached)
+            if len(starts):
+                incoming[has_in] = np.bitwise_or.reduceat(frontier[self.in_indices], starts, axis=0)
+            frontier = incoming & ~reached
+            reached |= frontier
+            counts.append(counts[-1] + _bit_counts(frontier, len(groups)))
+        return groups, np.array(counts, dtype=np.int64)
+
+    def edges(self):
+        """ :return: arrays (sources, targets) of all links """
+        return np.repeat(np.arange(len(self.titles), dtype=np.int32), np.diff(self.out_indptr)), self.out_indices
+
+    def __str__(self):
+        return (f"LinkGraph: {len(self.titles)} articles ({self.num_saved} saved), {self.num_edges} links, "
+                f"{len(self.categories)} categories")
@@ -0,0 +1,142 @@
+import re
+from html.parser import HTMLParser
+from util.metrics import metrics
+
+# same rule as the former BeautifulSoup based extraction: article links without namespace (no colon)
+WIKI_LINK_PATTERN = re.compile(r"^/wiki/([^:]+)$")
+
+# div ids of the page regions the extractor can visit
+REGIONS = {
+    "mw-content-text": "content",
+    "mw-normal-catlinks": "categories",
+    "mw-pages": "members",
+}
+
+
+def url_encode(url):
+    return url.replace("*", "%2A").replace("/", "%2F")
+
+
+class _Done(Exception):
+    """ raised to stop parsing once all requested regions have been visited """
+
+
+class WikiPageExtractor(HTMLParser):
+    """
+    Event driven extractor for rendered wikipedia pages. No document tree is built:
+    the parser only tracks div nesting and collects data while it is inside one of the requested regions
+    (article content, normal category links, category members) or the page heading.
+    Parsing stops as soon as all requested regions have been closed.
+    """
+    def __init__(self, regions=("content", "categories"), title=False):
+        """
+        :param regions: regions to visit: "content", "categories" and/or "members"
+        :param title: also extract the page heading (h1#firstHeading) and the canonical url
+        """
+        super().__init__(convert_charrefs=True)
+        self.wanted = set(regions)
+        self.want_title = title
+
+        self.links = set()
+        self.members = set()
+        self.categories = []
+        self.title = None
+        self.canonical = None
+
+        self._div_depth = 0
+        self._stack = []            # (region name, div depth at which the region was entered)
+        self._anchor_text = None    # text of the current anchor in the categories region
+        self._title_text = None     # text of the page heading while inside it
+
+    def extract(self, html):
+        """
+        Parse a page
+        :param html: page html
+        :return: self
+        """
+        with metrics.timer("parse_seconds", "time to extract data from a page"):
+            try:
+                self.feed(html)
+                self.close()
+            except _Done:
+                pass
+        metrics.counter("parsed_bytes", "size of the parsed html").inc(len(html))
+        return self
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "a":
+            if self._stack:
+                self._handle_anchor(attrs)
+        elif tag == "div":
+            self._div_depth += 1
+            for name, value in attrs:
+                if name == "id":
+                    region = REGIONS.get(value)
+                    if region in self.wanted:
+                        self._stack.append((region, self._div_depth))
+                    break
+        elif self.want_title:
+            if tag == "h1" and ("id", "firstHeading") in attrs:
+                self._title_text = []
+            elif tag == "link" and ("rel", "canonical") in attrs:
+                self.canonical = dict(attrs).get("href")
+
+    def _handle_anchor(self, attrs):
+        region = self._stack[-1][0]
+        if region == "categories":
+            self._anchor_text = []
+            return
+        for name, value in attrs:
+            if name == "href":
+                if value:
+                    match = WIKI_LINK_PATTERN.match(value)
+                    if match:
+                        title = url_encode(match.group(1).split("#", 1)[0])
+                        (self.links if region == "content" else self.members).add(title)
+                break
+
+    def handle_endtag(self, tag):
+        if tag == "div":
+            if self._stack and self._stack[-1][1] == self._div_depth:
+                region = self._stack.pop()[0]
+                self.wanted.discard(region)
+                if not self.wanted and not (self.want_title and self.title is None):
+                    raise _Done()
+            self._div_depth -= 1
+        elif tag == "a":
+            if self._anchor_text is not None:
+                text = "".join(self._anchor_text)
+                if text != "Categories":
+                    self.categories.append(text)
+                self._anchor_text = None
+        elif tag == "h1" and self._title_text is not None:
+            self.title = "".join(self._title_text)
+            self._title_text = None
+            if not self.wanted:
+                raise _Done()
+
+    def handle_data(self, data):
+        if self._anchor_text is not None:
+            self._anchor_text.append(data)
+        elif self._title_text is not None:
+            self._title_text.append(data)
+
+
+def extract_links(html):
+    """ :return: set of titles of the articles linked in the content of a page """
+    return WikiPageExtractor(("content",)).extract(html).links
+
+
+def extract_categories(html):
+    """ :return: list of the names of the normal categories of a page """
+    return WikiPageExtractor(("categories",)).extract(html).categories
+
+
+def extract_category_members(html):
+    """ :return: set of titles of the pages listed on a category page """
+    return WikiPageExtractor(("members",)).extract(html).members
+
+
+def extract_title(html):
+    """ :return: text of the page heading """
+    return WikiPageExtractor((), title=True).extract(html).title
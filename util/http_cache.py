@@ -0,0 +1,292 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from urllib.parse import urlencode, urldefrag
+
+
+def get_default_cache_dir():
+    """
+    The response cache lives next to the saved instances:
+
+        project_root
+         └─── saved
+               └─── http_cache
+                     ├─── index.sqlite      # url -> status, validators, body digest, timestamps
+                     └─── bodies            # response bodies, named by their sha256 digest
+
+    :return: path of the default cache directory
+    """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    return os.path.join(root, "saved", "http_cache")
+
+
+def normalize_url(url, params=None):
+    """
+    Build the cache key of a request: the url without fragment and with sorted query parameters
+    :param url: full url
+    :param params: dict of query parameters
+    :return: normalized url
+    """
+    url = urldefrag(url)[0]
+    if params:
+        separator = "&" if "?" in url else "?"
+        url = f"{url}{separator}{urlencode(sorted(params.items()))}"
+    return url
+
+
+class CachedResponse:
+    """
+    Minimal stand-in for requests.Response, returned for both cached and freshly downloaded responses.
+    Supports the attributes used by the scraping functions: status_code, text, content, headers and json().
+    """
+    def __init__(self, url, status_code, content=b"", headers=None, from_cache=False):
+        self.url = url
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers if headers is not None else {}
+        self.from_cache = from_cache
+
+    @property
+    def text(self):
+        return self.content.decode("utf-8", errors="replace")
+
+    def json(self):
+        return json.loads(self.content)
+
+    def __repr__(self):
+        return f"<CachedResponse [{self.status_code}] {self.url}{' (cached)' if self.from_cache else ''}>"
+
+
+class ResponseCache:
+    """
+    Persistent on-disk cache for http responses.
+    Entries younger than ttl are served without any request. Older entries are revalidated with
+    If-None-Match/If-Modified-Since, so an unchanged page only costs a 304 response.
+    Bodies are stored content-addressed, the total body size is bounded by evicting least recently used entries.
+    """
+    # only these responses are stored. 404 is kept so missing articles are not requested again.
+    CACHEABLE_STATUS = (200, 404)
+    # access times of hits are written in batches of this size (or with the next stored response)
+    ACCESS_BATCH = 256
+    # number of least recently used entries removed per query while evicting
+    EVICT_BATCH = 100
+
+    def __init__(self, directory=None, ttl=7 * 24 * 3600, max_bytes=2 * 1024 ** 3):
+        """
+        Initialize a response cache
+        :param directory: cache directory. Default: saved/http_cache
+        :param ttl: seconds in which an entry is served without revalidation
+        :param max_bytes: maximum total size of all cached bodies
+        """
+        self.directory = get_default_cache_dir() if directory is None else directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self.evictions = 0
+
+        os.makedirs(os.path.join(self.directory, "bodies"), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(self.directory, "index.sqlite"), check_same_thread=False)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                status INTEGER NOT NULL,
+                digest TEXT,
+                size INTEGER NOT NULL DEFAULT 0,
+                etag TEXT,
+                last_modified TEXT,
+                fetched_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )""")
+        self._db.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed_at)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS entries_digest ON entries (digest)")
+        self._db.commit()
+        # running total of the body sizes and access times of hits which are not written yet
+        self._total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        self._accessed = {}
+
+    def _body_path(self, digest):
+        return os.path.join(self.directory, "bodies", digest[:2], digest)
+
+    def _read_body(self, digest):
+        if digest is None:
+            return b""
+        try:
+            with open(self._body_path(digest), "rb") as file:
+                return file.read()
+        except FileNotFoundError:
+            return None
+
+    def _write_body(self, content):
+        digest = hashlib.sha256(content).hexdigest()
+        path = self._body_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as file:
+                file.write(content)
+            os.replace(tmp_path, path)
+        return digest
+
+    def fetch(self, send, url, params=None, method="GET", max_age=None):
+        """
+        Return the response for a request, from the cache if possible
+        :param send: function(method, url, params, headers) performing the actual request
+        :param url: full url
+        :param params: dict of query parameters
+        :param method: "GET" or "HEAD"
+        :param max_age: seconds in which an entry is served without revalidation. Default: ttl.
+            With 0 every entry is revalidated, i.e. the response is always current.
+        :return: CachedResponse
+        """
+        key = f"{method} {normalize_url(url, params)}"
+        now = time.time()
+        max_age = self.ttl if max_age is None else max_age
+
+        with self._lock:
+            entry = self._db.execute(
+                "SELECT status, digest, etag, last_modified, fetched_at FROM entries WHERE key = ?", (key,)).fetchone()
+
+        if entry is not None:
+            status, digest, etag, last_modified, fetched_at = entry
+            content = self._read_body(digest) if method == "GET" else b""
+            if content is None:
+                # body was removed from disk, treat as miss
+                entry = None
+            elif now - fetched_at < max_age:
+                with self._lock:
+                    self.hits += 1
+                    self._accessed[key] = now
+                    if len(self._accessed) >= self.ACCESS_BATCH:
+                        self._write_accessed()
+                        self._db.commit()
+                return CachedResponse(url, status, content, from_cache=True)
+
+        headers = {}
+        if entry is not None:
+            if entry[2]:
+                headers["If-None-Match"] = entry[2]
+            if entry[3]:
+                headers["If-Modified-Since"] = entry[3]
+
+        response = send(method, url, params, headers)
+
+        if entry is not None and response.status_code == 304:
+            with self._lock:
+                self.revalidated += 1
+                self._accessed.pop(key, None)
+                self._db.execute("UPDATE entries SET fetched_at = ?, accessed_at = ? WHERE key = ?", (now, now, key))
+                self._db.commit()
+            return CachedResponse(url, entry[0], content, from_cache=True)
+
+        with self._lock:
+            self.misses += 1
+        content = response.content if method == "GET" else b""
+        if response.status_code in self.CACHEABLE_STATUS:
+            self._store(key, response, content, now)
+        return CachedResponse(url, response.status_code, content, dict(response.headers))
+
+    def _store(self, key, response, content, now):
+        digest = self._write_body(content) if content else None
+        with self._lock:
+            old = self._db.execute("SELECT size, digest FROM entries WHERE key = ?", (key,)).fetchone()
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries (key, status, digest, size, etag, last_modified, fetched_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, response.status_code, digest, len(content), response.headers.get("ETag"),
+                 response.headers.get("Last-Modified"), now, now))
+            self._accessed.pop(key, None)
+            self._total += len(content) - (old[0] if old is not None else 0)
+            if old is not None and old[1] != digest:
+                # the replaced body, e.g. of an older revision of the page
+                self._remove_unused_body(old[1])
+            self._write_accessed()
+            self._evict()
+            self._db.commit()
+
+    def _write_accessed(self):
+        """ write the pending access times of hits. Caller holds the lock and commits. """
+        if self._accessed:
+            self._db.executemany("UPDATE entries SET accessed_at = ? WHERE key = ?",
+                                 [(accessed_at, key) for key, accessed_at in self._accessed.items()])
+            self._accessed = {}
+
+    def _evict(self):
+        """
+        remove least recently used entries until the cached bodies fit into max_bytes.
+        Caller holds the lock, has written the pending access times and commits.
+        """
+        while self._total > self.max_bytes:
+            rows = self._db.execute("SELECT key, digest, size FROM entries ORDER BY accessed_at LIMIT ?",
+                                    (self.EVICT_BATCH,)).fetchall()
+            if not rows:
+                self._total = 0
+                return
+            for key, digest, size in rows:
+                if self._total <= self.max_bytes:
+                    return
+                self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self._total -= size
+                self.evictions += 1
+                self._remove_unused_body(digest)
+
+    def _remove_unused_body(self, digest):
+        """ delete the body file of a digest once no entry references it anymore. Caller holds the lock. """
+        if digest is None:
+            return
+        shared = self._db.execute("SELECT 1 FROM entries WHERE digest = ? LIMIT 1", (digest,)).fetchone()
+        if shared is None:
+            try:
+                os.remove(self._body_path(digest))
+            except FileNotFoundError:
+                pass
+
+    def flush(self):
+        """ write the pending access times of cache hits """
+        with self._lock:
+            self._write_accessed()
+            self._db.commit()
+
+    def stats(self):
+        """
+        Counters of this cache instance
+        :return: dict with hits, misses, revalidated (304), evictions, hit_rate and the number and size of entries
+        """
+        with self._lock:
+            entries = self._db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            size = self._total
+        requests_total = self.hits + self.misses + self.revalidated
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "revalidated": self.revalidated,
+            "evictions": self.evictions,
+            "hit_rate": (self.hits + self.revalidated) / requests_total if requests_total else 0.0,
+            "entries": entries,
+            "bytes": size,
+        }
+
+    def clear(self):
+        """ remove all entries and bodies """
+        with self._lock:
+            digests = [row[0] for row in self._db.execute("SELECT DISTINCT digest FROM entries WHERE digest IS NOT NULL")]
+            self._db.execute("DELETE FROM entries")
+            self._db.commit()
+            self._total = 0
+            self._accessed = {}
+        for digest in digests:
+            try:
+                os.remove(self._body_path(digest))
+            except FileNotFoundError:
+                pass
+
+    def __str__(self):
+        stats = self.stats()
+        return (f"ResponseCache: {stats['entries']} entries, {stats['bytes'] / 1024 ** 2:.1f} MB. "
+                f"{stats['hits']} hits, {stats['revalidated']} revalidated, {stats['misses']} misses "
+                f"({stats['hit_rate']:.1%} hit rate)")
@@ -0,0 +1,231 @@
+import os
+import time
+import threading
+import tqdm
+
+
+def get_default_journal_path(name):
+    """ :return: path of a named crawl journal, saved/journals/<name>.log """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    return os.path.join(root, "saved", "journals", f"{name}.log")
+
+
+ENQUEUED = "enqueued"
+FETCHED = "fetched"
+FAILED = "failed"
+MISSING = "missing"     # done without a result, e.g. the page does not exist. Not retried, unlike FAILED.
+
+# one record per line: "<code>\t<key>" or "X\t<key>\t<error>"
+_CODES = {ENQUEUED: "E", FETCHED: "F", FAILED: "X", MISSING: "M"}
+_DONE = (FETCHED, MISSING)
+_STATUSES = {code: status for status, code in _CODES.items()}
+
+
+def _clean(text):
+    return str(text).replace("\t", " ").replace("\n", " ")
+
+
+class CrawlJournal:
+    """
+    Append-only journal of crawl work. Every unit of work (usually a title) is recorded when it is enqueued,
+    fetched, missing or failed, so an interrupted crawl can be resumed: completed (fetched or missing) keys are
+    skipped with a dict lookup and only failed or never finished keys are processed again.
+    Records are flushed and fsynced in batches (every sync_every records or sync_interval seconds). A record that
+    was only partially written when the process died is discarded when the journal is opened again.
+    """
+    def __init__(self, path, sync_every=256, sync_interval=1.0):
+        """
+        Open (and create) a journal and replay its records
+        :param path: journal file, e.g. get_default_journal_path("create_articles")
+        :param sync_every: fsync after this many records
+        :param sync_interval: fsync if the last sync is older than this many seconds
+        """
+        self.path = path
+        self.sync_every = sync_every
+        self.sync_interval = sync_interval
+        self.status = {}    # key -> status, in order of first enqueue
+        self.errors = {}    # key -> error of the last failure
+        self._lock = threading.Lock()
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._replay()
+        self._file = open(path, "a", encoding="utf-8")
+
+    def _replay(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "rb") as file:
+            data = file.read()
+        complete = data.rfind(b"\n") + 1
+        if complete < len(data):
+            # drop a torn last record, appending starts on a new line again
+            with open(self.path, "r+b") as file:
+                file.truncate(complete)
+
+        for line in data[:complete].decode("utf-8").splitlines():
+            code, key, *error = line.split("\t", 2)
+            status = _STATUSES.get(code)
+            if status is None:
+                continue
+            if status == ENQUEUED:
+                self.status.setdefault(key, ENQUEUED)
+            else:
+                self.status[key] = status
+                if status == FAILED:
+                    self.errors[key] = error[0] if error else ""
+                else:
+                    self.errors.pop(key, None)
+
+    def _write(self, status, key, error=None):
+        record = f"{_CODES[status]}\t{key}" if error is None else f"{_CODES[status]}\t{key}\t{_clean(error)}"
+        self._file.write(record + "\n")
+        self._unsynced += 1
+        if self._unsynced >= self.sync_every or time.monotonic() - self._last_sync >= self.sync_interval:
+            self._sync()
+
+    def _sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def sync(self):
+        """ Write all buffered records to disk """
+        with self._lock:
+            self._sync()
+
+    def enqueue(self, keys):
+        """
+        Record keys as work to do. Keys which are already known keep their status.
+        :param keys: iterable of keys (titles), must not contain tabs or newlines
+        :return: number of new keys
+        """
+        count = 0
+        with self._lock:
+            for key in keys:
+                if key not in self.status:
+                    self.status[key] = ENQUEUED
+                    self._write(ENQUEUED, key)
+                    count += 1
+        return count
+
+    def mark_fetched(self, key):
+        """ Record that the work of a key is done """
+        with self._lock:
+            self.status[key] = FETCHED
+            self.errors.pop(key, None)
+            self._write(FETCHED, key)
+
+    def mark_missing(self, key):
+        """ Record that the work of a key is done because there is nothing to fetch, e.g. the page does not exist """
+        with self._lock:
+            self.status[key] = MISSING
+            self.errors.pop(key, None)
+            self._write(MISSING, key)
+
+    def mark_failed(self, key, error=""):
+        """ Record that the work of a key failed, it is processed again when the crawl is resumed """
+        with self._lock:
+            self.status[key] = FAILED
+            self.errors[key] = _clean(error)
+            self._write(FAILED, key, error)
+
+    def is_done(self, key):
+        return self.status.get(key) in _DONE
+
+    def pending(self, keys=None):
+        """
+        :param keys: keys to check. Default: all keys of the journal
+        :return: list of the keys which are not done yet (never finished or failed), in order
+        """
+        keys = self.status if keys is None else keys
+        return [key for key in keys if self.status.get(key) not in _DONE]
+
+    def failed(self):
+        """ :return: dict mapping failed keys to their last error """
+        return {key: self.errors.get(key, "") for key, status in self.status.items() if status == FAILED}
+
+    def counts(self):
+        """ :return: dict mapping each status to its number of keys """
+        counts = {status: 0 for status in _CODES}
+        for status in self.status.values():
+            counts[status] += 1
+        return counts
+
+    def run(self, keys, process, chunk_size=50, desc=None):
+        """
+        Process all keys which are not done yet, in chunks, and journal the outcome of every key
+        :param keys: iterable of keys
+        :param process: function taking a list of keys. If it raises, all keys of the chunk are marked as failed.
+            It may return a dict mapping keys to an error (or None for success) to fail single keys,
+            or to MISSING for keys which are done without a result.
+        :param chunk_size: number of keys per call of process
+        :param desc: show a progress bar with this description if given
+        :return: number of failed keys (missing keys are not counted)
+        """
+        keys = list(dict.fromkeys(keys))
+        self.enqueue(keys)
+        pending = self.pending(keys)
+        chunks = range(0, len(pending), chunk_size)
+        if desc is not None:
+            chunks = tqdm.tqdm(chunks, desc=desc)
+
+        num_failed = 0
+        for i in chunks:
+            chunk = pending[i:i + chunk_size]
+            try:
+                errors = process(chunk) or {}
+            except Exception as error:
+                errors = {key: error for key in chunk}
+            for key in chunk:
+                if errors.get(key) is None:
+                    self.mark_fetched(key)
+                elif errors[key] == MISSING:
+                    self.mark_missing(key)
+                else:
+                    self.mark_failed(key, errors[key])
+                    num_failed += 1
+        self.sync()
+        return num_failed
+
+    def compact(self):
+        """ Rewrite the journal with only the latest state of every key """
+        with self._lock:
+            self._file.close()
+            temp_path = f"{self.path}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as file:
+                for key, status in self.status.items():
+                    file.write(f"{_CODES[ENQUEUED]}\t{key}\n")
+                    if status == FAILED:
+                        file.write(f"{_CODES[FAILED]}\t{key}\t{self.errors.get(key, '')}\n")
+                    elif status in _DONE:
+                        file.write(f"{_CODES[status]}\t{key}\n")
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(temp_path, self.path)
+            self._file = open(self.path, "a", encoding="utf-8")
+            self._unsynced = 0
+
+    def close(self):
+        with self._lock:
+            self._sync()
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __contains__(self, key):
+        return key in self.status
+
+    def __len__(self):
+        return len(self.status)
+
+    def __str__(self):
+        counts = self.counts()
+        return (f"CrawlJournal {self.path}: {counts[FETCHED]} fetched, {counts[MISSING]} missing, "
+                f"{counts[FAILED]} failed, {counts[ENQUEUED]} pending")
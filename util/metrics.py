@@ -0,0 +1,260 @@
+import os
+import json
+import time
+import atexit
+import threading
+from contextlib import contextmanager
+
+# upper bounds in seconds of the latency histogram buckets
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _label_key(labels):
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in pairs) + "}"
+
+
+class Counter:
+    """ monotonically increasing value per label set, e.g. requests by status """
+    kind = "counter"
+
+    def __init__(self, name, description, lock):
+        self.name = name
+        self.description = description
+        self.values = {}
+        self._lock = lock
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def get(self, **labels):
+        return self.values.get(_label_key(labels), 0)
+
+    def items(self):
+        """ :return: list of (label key, value), copied under the lock so other threads can keep updating """
+        with self._lock:
+            return list(self.values.items())
+
+    def to_dict(self):
+        return {_format_labels(key) or "value": value for key, value in self.items()}
+
+    def prometheus(self):
+        return [f"{self.name}_total{_format_labels(key)} {value}" for key, value in self.items()]
+
+
+class Gauge(Counter):
+    """ value which can go up and down, e.g. the cache hit ratio """
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        with self._lock:
+            self.values[_label_key(labels)] = value
+
+    def prometheus(self):
+        return [f"{self.name}{_format_labels(key)} {value}" for key, value in self.items()]
+
+
+class Histogram:
+    """ distribution of observed values (usually seconds) in cumulative buckets, with sum and count """
+    kind = "histogram"
+
+    def __init__(self, name, description, lock, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.description = description
+        self.buckets = tuple(buckets)
+        self.values = {}    # label key -> [bucket counts..., +Inf count, sum]
+        self._lock = lock
+
+    def observe(self, value, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            counts = self.values.get(key)
+            if counts is None:
+                counts = self.values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            counts[-2] += 1
+            counts[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """ observe the wall time of the with block """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels):
+        counts = self.values.get(_label_key(labels))
+        return 0 if counts is None else counts[-2]
+
+    def items(self):
+        """ :return: list of (label key, counts), copied under the lock since observe updates the counts in place """
+        with self._lock:
+            return [(key, list(counts)) for key, counts in self.values.items()]
+
+    def to_dict(self):
+        result = {}
+        for key, counts in self.items():
+            count, total = counts[-2], counts[-1]
+            result[_format_labels(key) or "value"] = {
+                "count": count,
+                "sum": total,
+                "mean": total / count if count else 0.0,
+                "buckets": {str(bound): counts[i] for i, bound in enumerate(self.buckets)},
+            }
+        return result
+
+    def prometheus(self):
+        lines = []
+        for key, counts in self.items():
+            for i, bound in enumerate(self.buckets):
+                lines.append(f"{self.name}_bucket{_format_labels(key, [('le', bound)])} {counts[i]}")
+            lines.append(f"{self.name}_bucket{_format_labels(key, [('le', '+Inf')])} {counts[-2]}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {counts[-1]}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {counts[-2]}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Named counters, gauges and histograms of a process.
+    Metrics are created on first use, so instrumented code just calls e.g. metrics.counter("http_requests").inc(status=200).
+    Collectors are called before every export to update gauges from other objects (e.g. the response cache).
+    """
+    def __init__(self, prefix="wiki"):
+        """
+        :param prefix: prefix of all metric names in the prometheus export
+        """
+        self.prefix = prefix
+        self.metrics = {}
+        self.collectors = []
+        self.started = time.time()
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name, description, **kwargs):
+        metric = self.metrics.get(name)
+        if metric is None:
+            with self._lock:
+                metric = self.metrics.get(name)
+                if metric is None:
+                    metric = cls(f"{self.prefix}_{name}", description, self._lock, **kwargs)
+                    self.metrics[name] = metric
+        return metric
+
+    def counter(self, name, description=""):
+        return self._get(Counter, name, description)
+
+    def gauge(self, name, description=""):
+        return self._get(Gauge, name, description)
+
+    def histogram(self, name, description="", buckets=LATENCY_BUCKETS):
+        return self._get(Histogram, name, description, buckets=buckets)
+
+    def timer(self, name, description="", **labels):
+        """ with metrics.timer("parse_seconds"): ... observes the wall time of the block in a histogram """
+        return self.histogram(name, description).time(**labels)
+
+    @contextmanager
+    def phase(self, name):
+        """ with metrics.phase("load_all_articles"): ... adds the wall time of the block to phase_seconds """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.counter("phase_seconds", "wall time per pipeline phase").inc(time.perf_counter() - start, phase=name)
+            self.counter("phase_runs", "number of runs per pipeline phase").inc(phase=name)
+
+    def add_collector(self, collector):
+        """ :param collector: function(registry) called before every export """
+        self.collectors.append(collector)
+
+    def collect(self):
+        for collector in self.collectors:
+            collector(self)
+
+    def _sorted_metrics(self):
+        # metrics may be created by other threads while exporting
+        with self._lock:
+            return sorted(self.metrics.items())
+
+    def to_dict(self):
+        """ :return: dict with the values of all metrics """
+        self.collect()
+        return {
+            "uptime_seconds": time.time() - self.started,
+            "metrics": {name: {"type": metric.kind, "description": metric.description, "values": metric.to_dict()}
+                        for name, metric in self._sorted_metrics()},
+        }
+
+    def to_json(self):
+        return json.dumps(self.to_dict(), indent=4)
+
+    def to_prometheus(self):
+        """ :return: all metrics in the prometheus text exposition format """
+        self.collect()
+        lines = []
+        for name, metric in self._sorted_metrics():
+            if metric.description:
+                lines.append(f"# HELP {metric.name} {metric.description}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.prometheus())
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path, format=None):
+        """
+        Write all metrics to a file, replacing it atomically
+        :param path: output file
+        :param format: "json" or "prometheus". Default: "prometheus" for .prom files, else "json"
+        """
+        if format is None:
+            format = "prometheus" if path.endswith(".prom") else "json"
+        text = self.to_prometheus() if format == "prometheus" else self.to_json()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w") as file:
+            file.write(text)
+        os.replace(temp_path, path)
+
+    def export_on_exit(self, path, format=None):
+        """ dump the metrics when the interpreter exits """
+        atexit.register(self.dump, path, format)
+
+    def export_every(self, path, interval=30.0, format=None):
+        """
+        dump the metrics periodically from a daemon thread
+        :param interval: seconds between two dumps
+        :return: threading.Event, set it to stop exporting
+        """
+        stop = threading.Event()
+
+        def export():
+            while not stop.wait(interval):
+                try:
+                    self.dump(path, format)
+                except Exception as error:
+                    # keep exporting, e.g. after a full disk or a failing collector
+                    print(f"\033[91mWarning: Could not export metrics to \"{path}\": {error}\033[0m")
+
+        threading.Thread(target=export, name="metrics-export", daemon=True).start()
+        return stop
+
+    def reset(self):
+        """ remove all metric values """
+        with self._lock:
+            self.metrics = {}
+        self.started = time.time()
+
+
+# registry shared by all modules
+metrics = MetricsRegistry()
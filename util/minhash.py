@@ -0,0 +1,205 @@
+import hashlib
+import numpy as np
+from util.cooccurrence import short_title
+
+# prime modulus of the permutations. Hashes are reduced below it and a, b < 2^31, so a * x + b < 2^62 fits into uint64
+MERSENNE_PRIME = np.uint64((1 << 31) - 1)
+# signature value of an empty set, larger than all permuted hashes (which are below MERSENNE_PRIME)
+MAX_HASH = MERSENNE_PRIME
+
+
+def title_hash(title):
+    """ :return: stable 32 bit hash of a title (unlike hash(), equal across processes) """
+    return int.from_bytes(hashlib.blake2b(title.encode("utf-8"), digest_size=4).digest(), "little")
+
+
+class MinHash:
+    """
+    MinHash sketches of sets of titles. A signature holds the minimum of num_perm random universal hash permutations
+    h(x) = (a * x + b) mod MERSENNE_PRIME over the title hashes x of the set, the share of equal signature values of
+    two sets estimates their Jaccard similarity with a standard error of about 1 / sqrt(num_perm).
+    """
+    def __init__(self, num_perm=128, seed=1):
+        """
+        :param num_perm: number of permutations, i.e. signature length. More is more accurate and slower.
+        :param seed: seed of the permutations. Only signatures of equal num_perm and seed can be compared.
+        """
+        self.num_perm = num_perm
+        self.seed = seed
+        rng = np.random.RandomState(seed)
+        self.a = rng.randint(1, int(MERSENNE_PRIME), size=num_perm, dtype=np.uint64)
+        self.b = rng.randint(0, int(MERSENNE_PRIME), size=num_perm, dtype=np.uint64)
+        self._hashes = {}
+
+    def _hash_values(self, items):
+        hashes = self._hashes
+        values = []
+        for item in items:
+            value = hashes.get(item)
+            if value is None:
+                value = hashes[item] = title_hash(item) % int(MERSENNE_PRIME)
+            values.append(value)
+        return np.array(values, dtype=np.uint64)
+
+    def signature(self, items, chunk_size=4096):
+        """
+        :param items: iterable of titles
+        :return: uint64 array of length num_perm. All values are MAX_HASH for an empty set.
+        """
+        values = self._hash_values(items)
+        signature = np.full(self.num_perm, MAX_HASH, dtype=np.uint64)
+        for start in range(0, len(values), chunk_size):
+            chunk = values[start:start + chunk_size]
+            permuted = (self.a[:, None] * chunk[None, :] + self.b[:, None]) % MERSENNE_PRIME
+            np.minimum(signature, permuted.min(axis=1), out=signature)
+        return signature
+
+    def signatures(self, sets):
+        """ :return: uint64 array (number of sets, num_perm) with the signatures of an iterable of title sets """
+        return np.array([self.signature(items) for items in sets], dtype=np.uint64).reshape(-1, self.num_perm)
+
+    @staticmethod
+    def jaccard(signature_a, signature_b):
+        """ :return: estimated Jaccard similarity of the sets of two signatures """
+        return float(np.mean(signature_a == signature_b))
+
+
+def _candidate_probability(similarities, bands, rows):
+    """ probability that two sets of the given similarities share at least one band """
+    return 1 - (1 - similarities ** rows) ** bands
+
+
+def _false_positive_probability(threshold, bands, rows, steps=100):
+    # midpoint rule over the similarities below the threshold
+    similarities = (np.arange(steps) + 0.5) * threshold / steps
+    return _candidate_probability(similarities, bands, rows).mean() * threshold
+
+
+def _false_negative_probability(threshold, bands, rows, steps=100):
+    similarities = threshold + (np.arange(steps) + 0.5) * (1 - threshold) / steps
+    return (1 - _candidate_probability(similarities, bands, rows)).mean() * (1 - threshold)
+
+
+def optimal_bands(threshold, num_perm, false_positive_weight=0.5, false_negative_weight=0.5):
+    """
+    Choose the LSH banding for a similarity threshold: two sets become candidates if all `rows` values of at least
+    one of `bands` bands are equal, which happens with probability 1 - (1 - s^rows)^bands for similarity s.
+    :param threshold: Jaccard similarity from which on pairs should be found
+    :param num_perm: signature length, bands * rows <= num_perm
+    :param false_positive_weight: weight of candidates below the threshold (cost: verification time)
+    :param false_negative_weight: weight of missed pairs above the threshold (cost: recall)
+    :return: (bands, rows) minimizing the weighted error
+    """
+    best, best_error = (1, num_perm), float("inf")
+    for bands in range(1, num_perm + 1):
+        for rows in range(1, num_perm // bands + 1):
+            error = (false_positive_weight * _false_positive_probability(threshold, bands, rows) +
+                     false_negative_weight * _false_negative_probability(threshold, bands, rows))
+            if error < best_error:
+                best, best_error = (bands, rows), error
+    return best
+
+
+class LSHIndex:
+    """
+    Locality sensitive hashing index over MinHash signatures. Signatures are split into bands, keys sharing
+    a band are candidates, so similar pairs are found without comparing all pairs. Candidates are verified
+    with their estimated (or exact) Jaccard similarity.
+    Accuracy and speed are traded with num_perm (estimate quality), the threshold and the weights of false
+    positives and false negatives, or directly with bands and rows.
+    """
+    def __init__(self, threshold=0.5, num_perm=128, bands=None, rows=None, weights=(0.5, 0.5), seed=1):
+        """
+        :param threshold: Jaccard similarity of the pairs to find
+        :param num_perm: signature length
+        :param bands, rows: LSH banding. Default: optimal_bands(threshold, num_perm, *weights)
+        :param weights: weights of false positives and false negatives used to choose the banding
+        :param seed: seed of the MinHash permutations
+        """
+        if bands is None or rows is None:
+            bands, rows = optimal_bands(threshold, num_perm, *weights)
+        if bands * rows > num_perm:
+            raise ValueError(f"{bands} bands x {rows} rows need more than {num_perm} permutations.")
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = rows
+        self.minhash = MinHash(num_perm, seed)
+        self.signatures = {}
+        self.buckets = [{} for _ in range(bands)]
+
+    @classmethod
+    def from_categories(cls, categories, threshold=0.5, num_perm=128, **kwargs):
+        """
+        Index the article sets of categories
+        :param categories: iterable of Category (or CompactCategory) instances
+        :return: LSHIndex with the category titles (without "Category:" prefix) as keys
+        """
+        index = cls(threshold, num_perm, **kwargs)
+        for category in categories:
+            index.add(short_title(category.title), category.articles)
+        return index
+
+    def _band_keys(self, signature):
+        for band in range(self.bands):
+            yield band, signature[band * self.rows:(band + 1) * self.rows].tobytes()
+
+    def add(self, key, items):
+        """ sketch a set of titles and insert it. Empty sets are not inserted. """
+        items = list(items)
+        if items:
+            self.insert(key, self.minhash.signature(items))
+
+    def insert(self, key, signature):
+        """ insert a precomputed signature of this index's MinHash """
+        self.signatures[key] = signature
+        for band, band_key in self._band_keys(signature):
+            self.buckets[band].setdefault(band_key, []).append(key)
+
+    def query(self, items, threshold=None):
+        """
+        :param items: set of titles
+        :param threshold: minimum estimated Jaccard similarity. Default: threshold of the index
+        :return: list of (key, estimated similarity) of the indexed sets similar to items, most similar first
+        """
+        threshold = self.threshold if threshold is None else threshold
+        signature = self.minhash.signature(items)
+        candidates = set()
+        for band, band_key in self._band_keys(signature):
+            candidates.update(self.buckets[band].get(band_key, ()))
+        results = [(key, MinHash.jaccard(signature, self.signatures[key])) for key in candidates]
+        return sorted((result for result in results if result[1] >= threshold), key=lambda result: -result[1])
+
+    def candidate_pairs(self):
+        """ :return: set of (key_a, key_b) pairs sharing at least one band """
+        pairs = set()
+        for buckets in self.buckets:
+            for keys in buckets.values():
+                for i in range(len(keys)):
+                    for j in range(i + 1, len(keys)):
+                        pairs.add((keys[i], keys[j]) if keys[i] <= keys[j] else (keys[j], keys[i]))
+        return pairs
+
+    def similar_pairs(self, threshold=None, sets=None):
+        """
+        :param threshold: minimum similarity. Default: threshold of the index
+        :param sets: dict mapping keys to their sets, to verify candidates with the exact Jaccard similarity
+        :return: list of (key_a, key_b, similarity) of all candidate pairs above the threshold, most similar first
+        """
+        threshold = self.threshold if threshold is None else threshold
+        results = []
+        for a, b in self.candidate_pairs():
+            if sets is None:
+                similarity = MinHash.jaccard(self.signatures[a], self.signatures[b])
+            else:
+                set_a, set_b = set(sets[a]), set(sets[b])
+                similarity = len(set_a & set_b) / len(set_a | set_b)
+            if similarity >= threshold:
+                results.append((a, b, similarity))
+        return sorted(results, key=lambda result: -result[2])
+
+    def __len__(self):
+        return len(self.signatures)
+
+    def __str__(self):
+        return (f"LSHIndex: {len(self.signatures)} sets, threshold {self.threshold}, "
+                f"{self.bands} bands x {self.rows} rows of {self.minhash.num_perm} permutations")
@@ -0,0 +1,204 @@
+import time
+import random
+import threading
+import requests
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+# responses which are retried: throttling and transient server errors
+RETRY_STATUS = (429, 500, 502, 503, 504)
+# responses which mean that the server wants fewer requests
+THROTTLE_STATUS = (429, 503)
+
+
+def retry_after(response):
+    """
+    :param response: response with a Retry-After header (seconds or http date)
+    :return: number of seconds to wait, None if the header is missing or invalid
+    """
+    value = response.headers.get("Retry-After")
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """ Allows `rate` requests per second on average and bursts of up to `burst` requests """
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.burst = max(1.0, rate if burst is None else burst)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """ take a token, blocks until one is available """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class HostLimiter:
+    """
+    Limits of a single host: a token bucket for the request rate and an AIMD window for the number of requests
+    in flight. The window grows by one request per window of successful responses (additive increase) and is
+    multiplied by `decrease` when the host throttles or fails (multiplicative decrease).
+    A Retry-After answer pauses all requests to the host.
+    """
+    def __init__(self, rate, burst=None, initial_concurrency=4, max_concurrency=32, decrease=0.5):
+        self.bucket = TokenBucket(rate, burst)
+        self.limit = float(min(initial_concurrency, max_concurrency))
+        self.max_concurrency = max_concurrency
+        self.decrease = decrease
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        """ wait for a free slot in the window and a token """
+        with self._condition:
+            while True:
+                pause = self.paused_until - time.monotonic()
+                if pause > 0:
+                    self._condition.wait(pause)
+                elif self.in_flight >= int(self.limit):
+                    self._condition.wait()
+                else:
+                    break
+            self.in_flight += 1
+        self.bucket.acquire()
+
+    def release(self, success=True):
+        """
+        free the slot of a finished request and adapt the window
+        :param success: False if the host throttled the request or failed
+        """
+        with self._condition:
+            self.in_flight -= 1
+            if success:
+                self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+            else:
+                self.limit = max(1.0, self.limit * self.decrease)
+            self._condition.notify_all()
+
+    def pause(self, seconds):
+        """ hold back all requests to the host for some seconds """
+        with self._condition:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+
+class RequestScheduler:
+    """
+    Shared gate for all http requests. Requests are rate limited and their concurrency adapted per host,
+    throttled (429/503), failed (5xx) and broken (connection errors, timeouts) requests are retried
+    with exponential backoff and full jitter, respecting Retry-After headers.
+    """
+    def __init__(self, rate=50.0, burst=None, initial_concurrency=4, max_concurrency=32, max_retries=5,
+                 backoff=0.5, max_backoff=60.0, host_rates=None):
+        """
+        :param rate: default number of requests per second and host
+        :param burst: default number of requests which may be sent at once. Default: rate
+        :param initial_concurrency: requests in flight per host before the window adapts
+        :param max_concurrency: upper limit of requests in flight per host, e.g. the connection pool size
+        :param max_retries: retries of a single request before giving up
+        :param backoff: base delay of the first retry in seconds, doubled for each further retry
+        :param max_backoff: upper limit of a single delay in seconds
+        :param host_rates: dict mapping hosts ("en.wikipedia.org") to their own rate
+        """
+        self.rate = rate
+        self.burst = burst
+        self.initial_concurrency = initial_concurrency
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.host_rates = {} if host_rates is None else dict(host_rates)
+        self.hosts = {}
+        self._lock = threading.Lock()
+
+        self.requests = 0
+        self.retries = 0
+        self.throttled = 0
+        self.errors = 0
+
+    def limiter(self, host):
+        """ :return: HostLimiter of a host, created on first use """
+        with self._lock:
+            limiter = self.hosts.get(host)
+            if limiter is None:
+                limiter = HostLimiter(self.host_rates.get(host, self.rate), self.burst, self.initial_concurrency,
+                                      self.max_concurrency)
+                self.hosts[host] = limiter
+            return limiter
+
+    def delay(self, attempt):
+        """ :return: backoff delay before retry number attempt + 1, with full jitter """
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    def request(self, send, method, url, params=None, headers=None):
+        """
+        Send a request through the limiter of its host and retry it if necessary
+        :param send: function(method, url, params, headers) sending the request, e.g. a session request
+        :return: response. After the last retry the failed response is returned or the request exception raised.
+        """
+        limiter = self.limiter(urlsplit(url).netloc)
+        attempt = 0
+        while True:
+            limiter.acquire()
+            response = error = None
+            try:
+                response = send(method, url, params, headers)
+            except requests.RequestException as exception:
+                error = exception
+            finally:
+                # the slot is released for every outcome, also for exceptions which are not retried
+                limiter.release(success=response is not None and response.status_code not in RETRY_STATUS)
+
+            if error is not None:
+                with self._lock:
+                    self.requests += 1
+                    self.errors += 1
+                if attempt >= self.max_retries:
+                    raise error
+                wait = self.delay(attempt)
+            else:
+                retry = response.status_code in RETRY_STATUS
+                with self._lock:
+                    self.requests += 1
+                    self.throttled += response.status_code in THROTTLE_STATUS
+                    self.errors += retry and response.status_code not in THROTTLE_STATUS
+                if not retry or attempt >= self.max_retries:
+                    return response
+                wait = self.delay(attempt)
+                server_wait = retry_after(response)
+                if server_wait is not None:
+                    wait = max(wait, min(server_wait, self.max_backoff))
+                    limiter.pause(wait)
+
+            with self._lock:
+                self.retries += 1
+            attempt += 1
+            time.sleep(wait)
+
+    def stats(self):
+        """ :return: dict with request counters and the current concurrency window of each host """
+        return {"requests": self.requests, "retries": self.retries, "throttled": self.throttled,
+                "errors": self.errors, "concurrency": {host: round(limiter.limit, 2) for host, limiter in self.hosts.items()}}
+
+    def __str__(self):
+        return (f"RequestScheduler: {self.requests} requests, {self.retries} retries, {self.throttled} throttled, "
+                f"{self.errors} errors")
@@ -1,26 +1,273 @@
 import requests
 import re
-from bs4 import BeautifulSoup
-from urllib.parse import urljoin
+import time
+import threading
+import tqdm
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from requests.adapters import HTTPAdapter
+from urllib.parse import urljoin, unquote
+from util.html_extract import url_encode, extract_links, extract_categories, extract_title, WikiPageExtractor
+from util.http_cache import ResponseCache
+from util.metrics import metrics
+from util.scheduler import RequestScheduler
+from util.title_resolver import TitleResolver
+from util.wiki_api import WikiApi
+
+# maximum number of pooled keep-alive connections to wikipedia
+POOL_SIZE = 32
+
+# base url of the wiki, can be pointed to a local stand-in server with set_wiki_base
+WIKI_BASE = "https://en.wikipedia.org"
+
+# backend used to get links and category members: "html" (scrape rendered pages) or "api" (api.php), see set_backend
+BACKENDS = ("html", "api")
+_backend = "html"
+
+_session = None
+_session_lock = threading.Lock()
+
+# response cache used by http_get/http_head. Created on first use, disabled with set_cache(None)
+_cache = ...
+# rate limiting and retries of all requests. Created on first use, disabled with set_scheduler(None)
+_scheduler = ...
+# memoized existence checks, created on first use
+_title_resolver = None
+# api.php backend, created on first use
+_api = None
+
+# result of fetching a single title with fetch_many: either result or error is set
+FetchResult = namedtuple("FetchResult", ["title", "result", "error"])
+
+# everything extracted from a single download of an article, see fetch_page.
+# status is "ok", "redirect", "missing" or "error"
+# revision (and touched) are None if the backend does not provide them
+PageRecord = namedtuple("PageRecord", ["title", "canonical_title", "links", "categories", "status", "redirected_from",
+                                       "revision", "touched"], defaults=(None, None))
+
+# current revision id in the page config of rendered pages
+REVISION_PATTERN = re.compile(r'"wgCurRevisionId":(\d+)')
 
 
-def url_encode(url):
-    return url.replace("*", "%2A").replace("/", "%2F")
-
 def wiki_url(url):
-    if url.startswith("https://en.wikipedia.org/wiki/"):
+    if url.startswith(f"{WIKI_BASE}/wiki/"):
         return url
+    elif url.startswith("https://en.wikipedia.org/wiki/"):
+        return f"{WIKI_BASE}/wiki/{url[len('https://en.wikipedia.org/wiki/'):]}"
     else:
-        return f"https://en.wikipedia.org/wiki/{url}"
+        return f"{WIKI_BASE}/wiki/{url}"
+
+
+def api_url():
+    """ :return: url of api.php of the wiki """
+    return f"{WIKI_BASE}/w/api.php"
+
+
+def set_wiki_base(base):
+    """
+    Send all requests to another wiki, e.g. a local stand-in server for tests and benchmarks
+    :param base: base url, e.g. "http://localhost:8000"
+    """
+    global WIKI_BASE
+    WIKI_BASE = base.rstrip("/")
+    with _session_lock:
+        for backend in (_title_resolver, _api):
+            if backend is not None:
+                backend.api_url = api_url()
+
+
+def set_backend(backend):
+    """
+    Select how links and category members are retrieved
+    :param backend: "html" to scrape the rendered pages, "api" to use api.php with continuation and batching
+    """
+    global _backend
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend \"{backend}\". Use one of {BACKENDS}.")
+    _backend = backend
+
+
+def get_backend():
+    """ :return: name of the selected backend """
+    return _backend
+
+
+def get_session():
+    """
+    Returns the requests session shared by all scraping functions.
+    Connections are pooled and kept alive, so consecutive requests to wikipedia skip the TCP/TLS handshake.
+    The pool blocks when all POOL_SIZE connections are in use, which bounds the number of requests in flight.
+    :return: requests.Session
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=POOL_SIZE, pool_block=True)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+    return _session
+
+
+def get_cache():
+    """
+    Returns the response cache shared by all scraping functions, or None if caching is disabled.
+    :return: ResponseCache or None
+    """
+    global _cache
+    with _session_lock:
+        if _cache is ...:
+            _cache = ResponseCache()
+    return _cache
 
 
-def url_request(url):
+def set_cache(cache):
+    """
+    Replace the shared response cache
+    :param cache: ResponseCache instance, or None to disable caching
+    """
+    global _cache
+    with _session_lock:
+        _cache = cache
+
+
+def get_scheduler():
+    """
+    Returns the request scheduler shared by all scraping functions, or None if requests are sent directly.
+    :return: RequestScheduler or None
+    """
+    global _scheduler
+    with _session_lock:
+        if _scheduler is ...:
+            _scheduler = RequestScheduler(max_concurrency=POOL_SIZE)
+    return _scheduler
+
+
+def set_scheduler(scheduler):
+    """
+    Replace the shared request scheduler
+    :param scheduler: RequestScheduler instance, or None to send requests without rate limit and retries
+    """
+    global _scheduler
+    with _session_lock:
+        _scheduler = scheduler
+
+
+def get_title_resolver():
+    """
+    Returns the TitleResolver used by check_wikipedia_article_exists
+    :return: TitleResolver
+    """
+    global _title_resolver
+    with _session_lock:
+        if _title_resolver is None:
+            _title_resolver = TitleResolver(http_get, api_url=api_url())
+    return _title_resolver
+
+
+def set_title_resolver(resolver):
+    """
+    Replace the shared TitleResolver
+    :param resolver: TitleResolver instance
+    """
+    global _title_resolver
+    with _session_lock:
+        _title_resolver = resolver
+
+
+def get_api():
+    """
+    Returns the api.php backend shared by all scraping functions
+    :return: WikiApi
+    """
+    global _api
+    with _session_lock:
+        if _api is None:
+            _api = WikiApi(http_get, api_url=api_url())
+    return _api
+
+
+def _session_send(method, url, params=None, headers=None):
+    requests_counter = metrics.counter("http_requests", "http requests sent, by method and status")
+    start = time.perf_counter()
+    try:
+        # like requests.head, HEAD requests do not follow redirects
+        response = get_session().request(method, url, params=params, headers=headers, allow_redirects=method != "HEAD")
+    except requests.RequestException:
+        requests_counter.inc(method=method, status="error")
+        raise
+    metrics.histogram("http_request_seconds", "latency of http requests sent").observe(time.perf_counter() - start,
+                                                                                         method=method)
+    requests_counter.inc(method=method, status=response.status_code)
+    metrics.counter("http_content_bytes", "bytes of the response bodies after content decoding (gzip)").inc(
+        len(response.content))
+    return response
+
+
+def _send(method, url, params=None, headers=None):
+    scheduler = get_scheduler()
+    if scheduler is None:
+        return _session_send(method, url, params, headers)
+    return scheduler.request(_session_send, method, url, params, headers)
+
+
+def http_get(url, params=None, fresh=False):
+    """
+    GET request through the shared session and response cache
+    :param url: full url
+    :param params: dict of query parameters
+    :param fresh: revalidate a cached response instead of serving it (an unchanged page only costs a 304 response)
+    :return: response of the request
+    """
+    cache = get_cache()
+    with metrics.timer("fetch_seconds", "latency of http_get including the response cache"):
+        if cache is None:
+            return _send("GET", url, params)
+        return cache.fetch(_send, url, params, method="GET", max_age=0 if fresh else None)
+
+
+def http_head(url):
+    """
+    HEAD request through the shared session and response cache
+    :param url: full url
+    :return: response of the request
+    """
+    cache = get_cache()
+    if cache is None:
+        return _send("HEAD", url)
+    return cache.fetch(_send, url, method="HEAD")
+
+
+def _collect_metrics(registry):
+    """ copy the counters of the shared cache and scheduler into gauges before an export """
+    cache = _cache
+    if isinstance(cache, ResponseCache):
+        lookups = cache.hits + cache.misses + cache.revalidated
+        registry.gauge("cache_lookups", "response cache lookups by result").set(cache.hits, result="hit")
+        registry.gauge("cache_lookups").set(cache.misses, result="miss")
+        registry.gauge("cache_lookups").set(cache.revalidated, result="revalidated")
+        registry.gauge("cache_hit_ratio", "share of lookups answered from the cache").set(
+            (cache.hits + cache.revalidated) / lookups if lookups else 0.0)
+    scheduler = _scheduler
+    if isinstance(scheduler, RequestScheduler):
+        for name in ("retries", "throttled", "errors"):
+            registry.gauge(f"scheduler_{name}", f"{name} of the request scheduler").set(getattr(scheduler, name))
+        for host, limiter in scheduler.hosts.items():
+            registry.gauge("scheduler_concurrency", "current concurrency window per host").set(limiter.limit, host=host)
+
+
+metrics.add_collector(_collect_metrics)
+
+
+def url_request(url, fresh=False):
     """
     Make a request to the given url
     :param url
+    :param fresh: do not serve the response from the cache without revalidating it
     :return: response of the request
     """
-    return requests.get(wiki_url(url))
+    return http_get(wiki_url(url), fresh=fresh)
 
 
 def get_categories(url):
@@ -30,45 +277,29 @@ def get_categories(url):
 
     # Check if the request was successful
     if response.status_code == 200:
-        # Parse the HTML content of the article
-        soup = BeautifulSoup(response.text, 'html.parser')
-
-        # Find the categories section in the article
-        categories_section = soup.find(id='mw-normal-catlinks')
-
-        # Extract the category links
-        categories = []
-        if categories_section:
-            category_links = categories_section.find_all('a')
-            for link in category_links:
-                category = link.text
-                if category != 'Categories':
-                    categories.append(category)
-
-        return categories
+        # Extract the category links from the categories section of the article
+        return extract_categories(response.text)
     else:
         print("Error retrieving article:", response.status_code)
         return None
 
 
 def extract_wikipedia_links(article_url):
+    if _backend == "api":
+        title = article_url.split("/wiki/", 1)[-1]
+        links = get_api().links([title])[title]
+        if links is None:
+            print('Error retrieving article:', title)
+            return None
+        return [link for link in links if link != title]
+
     # Make a request to the article URL
     response = url_request(article_url)
 
     # Check if the request was successful
     if response.status_code == 200:
-        # Parse the HTML content of the article
-        soup = BeautifulSoup(response.text, 'html.parser')
-
-        # Find all the anchor tags in the article
-        links = soup.find_all('a')
-
-        # Extract the Wikipedia links
-        wikipedia_links = set()
-        for link in links:
-            href = link.get('href')
-            if href and re.match(r'^/wiki/[^:]+$', href):
-                wikipedia_links.add(url_encode(href.replace("/wiki/", "").split("#", 1)[0]))
+        # Extract the Wikipedia links from the content of the article
+        wikipedia_links = extract_links(response.text)
 
         # Remove the link to the page itself
         wikipedia_links.discard(article_url.replace("https://en.wikipedia.org", ""))
@@ -79,17 +310,125 @@ def extract_wikipedia_links(article_url):
         return None
 
 
+def _same_title(a, b):
+    return unquote(a).replace(" ", "_") == unquote(b).replace(" ", "_")
+
+
+def fetch_page(title, fresh=False):
+    """
+    Download an article once and extract everything needed from it in a single parse pass
+    :param title: title or url of the article
+    :param fresh: revalidate a cached page, e.g. to get the current revision
+    :return: PageRecord with
+        links: list of linked article titles in the content of the article
+        categories: list of the normal categories as category titles ("Category:Fields_of_mathematics")
+        canonical_title: title the article is served under, differs from the requested title for redirects
+        revision: id of the current revision of the page
+    """
+    title = title.split("/wiki/", 1)[-1]
+    if _backend == "api":
+        return fetch_pages([title], fresh)[title]
+
+    response = url_request(title, fresh)
+    if response.status_code == 404:
+        return PageRecord(title, None, [], [], "missing", None)
+    if response.status_code != 200:
+        print('Error retrieving article:', response.status_code)
+        return PageRecord(title, None, [], [], "error", None)
+
+    page = WikiPageExtractor(("content", "categories"), title=True).extract(response.text)
+    if page.canonical and "/wiki/" in page.canonical:
+        canonical_title = url_encode(page.canonical.split("/wiki/", 1)[1])
+    else:
+        canonical_title = url_encode((page.title or title).replace(" ", "_"))
+
+    links = page.links
+    links.discard(canonical_title)
+    categories = [f"Category:{category.replace(' ', '_')}" for category in page.categories]
+
+    match = REVISION_PATTERN.search(response.text)
+    revision = int(match.group(1)) if match else None
+
+    if _same_title(title, canonical_title):
+        return PageRecord(title, canonical_title, list(links), categories, "ok", None, revision)
+    return PageRecord(title, canonical_title, list(links), categories, "redirect", title, revision)
+
+
+def fetch_pages(titles, fresh=False):
+    """
+    Get the PageRecords of many articles. With the api backend up to 50 titles are requested per call,
+    with the html backend every page is downloaded on its own.
+    :param titles: iterable of titles
+    :param fresh: revalidate cached responses, see fetch_page
+    :return: dict mapping each title to its PageRecord
+    """
+    titles = [title.split("/wiki/", 1)[-1] for title in titles]
+    if _backend != "api":
+        return {title: fetch_page(title, fresh) for title in titles}
+
+    records = {}
+    for title, page in get_api().pages(titles, fresh=fresh).items():
+        links = [link for link in page["links"] if link != page["canonical_title"]]
+        redirected_from = title if page["status"] == "redirect" else None
+        records[title] = PageRecord(title, page["canonical_title"], links, page["categories"], page["status"],
+                                    redirected_from, page["revision"], page["touched"])
+    return records
+
+
 def check_wikipedia_article_exists(url):
-    # if not url.startswith("https://en.wikipedia.org/wiki/"):
-    #     url = f"https://en.wikipedia.org/wiki/{url}"
-    response = requests.head(wiki_url(url))
+    """
+    Check if an article exists. The answer is memoized by the title resolver,
+    use get_title_resolver().resolve(titles) to check many titles at once beforehand.
+    :param url: title or url of the article
+    :return: True if the article exists
+    """
+    status = get_title_resolver().resolve([url])[url]
+    if status is not None:
+        return status.exists
+    # api not reachable, fall back to a HEAD request of the page
+    response = http_head(wiki_url(url))
     return response.status_code == 200
 
 
+def fetch_many(titles, fetch=None, concurrency=8, desc=None):
+    """
+    Call a scraping function for many titles concurrently.
+    At most `concurrency` requests are in flight at the same time, all of them sharing the pooled session.
+    A failing title does not stop the others: exceptions and empty (None) results are reported per title.
+    :param titles: iterable of article titles or urls
+    :param fetch: function taking a single title. Default: extract_wikipedia_links
+    :param concurrency: number of worker threads
+    :param desc: show a progress bar with this description if given
+    :return: dict mapping each title to a FetchResult
+    """
+    fetch = extract_wikipedia_links if fetch is None else fetch
+    titles = list(dict.fromkeys(titles))
+    results = {}
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        futures = {executor.submit(fetch, title): title for title in titles}
+        completed = as_completed(futures)
+        if desc is not None:
+            completed = tqdm.tqdm(completed, total=len(futures), desc=desc)
+
+        for future in completed:
+            title = futures[future]
+            try:
+                result = future.result()
+            except Exception as error:
+                results[title] = FetchResult(title, None, error)
+                continue
+            if result is None:
+                results[title] = FetchResult(title, None, ValueError(f"Error retrieving article: {title}"))
+            else:
+                results[title] = FetchResult(title, result, None)
+
+    # keep input order
+    return {title: results[title] for title in titles}
+
+
 def get_title(html_content):
-    soup = BeautifulSoup(html_content, 'html.parser')
-    title_element = soup.find('h1', id='firstHeading')
-    return title_element.text
+    return extract_title(html_content)
 
 
 if __name__ == "__main__":
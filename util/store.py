@@ -0,0 +1,302 @@
+import os
+import json
+import glob
+import sqlite3
+import threading
+import tqdm
+from contextlib import contextmanager
+from util.metrics import metrics
+
+
+def get_default_store_path():
+    """ :return: path of the default store, saved/store.sqlite """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    return os.path.join(root, "saved", "store.sqlite")
+
+
+# article set attributes: json key in _create_instance_dict -> (table, value column)
+ARTICLE_SETS = {
+    "source": ("article_sources", "source"),
+    "relations": ("article_relations", "target"),
+    "root categories": ("article_root_cats", "category"),
+    "related categories": ("article_related_cats", "category"),
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS articles (
+    id INTEGER PRIMARY KEY,
+    collection TEXT NOT NULL,
+    title TEXT NOT NULL,
+    autosave INTEGER NOT NULL,
+    revision INTEGER,
+    touched TEXT,
+    UNIQUE (collection, title)
+);
+CREATE TABLE IF NOT EXISTS article_sources (
+    article_id INTEGER NOT NULL REFERENCES articles (id) ON DELETE CASCADE,
+    source TEXT NOT NULL,
+    PRIMARY KEY (article_id, source)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS article_relations (
+    article_id INTEGER NOT NULL REFERENCES articles (id) ON DELETE CASCADE,
+    target TEXT NOT NULL,
+    PRIMARY KEY (article_id, target)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS article_root_cats (
+    article_id INTEGER NOT NULL REFERENCES articles (id) ON DELETE CASCADE,
+    category TEXT NOT NULL,
+    PRIMARY KEY (article_id, category)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS article_related_cats (
+    article_id INTEGER NOT NULL REFERENCES articles (id) ON DELETE CASCADE,
+    category TEXT NOT NULL,
+    PRIMARY KEY (article_id, category)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS categories (
+    id INTEGER PRIMARY KEY,
+    title TEXT NOT NULL UNIQUE,
+    autosave INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS category_articles (
+    category_id INTEGER NOT NULL REFERENCES categories (id) ON DELETE CASCADE,
+    article TEXT NOT NULL,
+    PRIMARY KEY (category_id, article)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS article_relations_target ON article_relations (target);
+CREATE INDEX IF NOT EXISTS article_sources_source ON article_sources (source);
+CREATE INDEX IF NOT EXISTS article_root_cats_category ON article_root_cats (category);
+CREATE INDEX IF NOT EXISTS article_related_cats_category ON article_related_cats (category);
+CREATE INDEX IF NOT EXISTS category_articles_article ON category_articles (article);
+"""
+
+# columns added after the first version of the schema: table -> [(column, type)]
+ADDED_COLUMNS = {
+    "articles": [("revision", "INTEGER"), ("touched", "TEXT")],
+}
+
+
+class ArticleStore:
+    """
+    Single-file sqlite storage for Article and Category instances.
+    Instances are written and read in the same dict format as the json files (see _create_instance_dict),
+    articles are grouped into collections ("articles", "_root_articles") like the directories under saved/.
+    """
+    def __init__(self, path=None):
+        """
+        Open (and create) a store
+        :param path: path of the sqlite file. Default: saved/store.sqlite
+        """
+        self.path = get_default_store_path() if path is None else path
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._lock = threading.RLock()
+        self._depth = 0
+        self._db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode = WAL")
+        self._db.execute("PRAGMA synchronous = NORMAL")
+        self._db.execute("PRAGMA foreign_keys = ON")
+        self._db.executescript(SCHEMA)
+        self._migrate()
+
+    def _migrate(self):
+        """ add columns missing in stores created with an older schema """
+        for table, columns in ADDED_COLUMNS.items():
+            existing = {row[1] for row in self._db.execute(f"PRAGMA table_info({table})")}
+            for column, column_type in columns:
+                if column not in existing:
+                    self._db.execute(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}")
+
+    @contextmanager
+    def transaction(self):
+        """
+        Group writes into one transaction. Nested transactions join the outermost one.
+        Everything is rolled back if an exception is raised inside the block.
+        """
+        with self._lock:
+            if self._depth == 0:
+                self._db.execute("BEGIN")
+            self._depth += 1
+            try:
+                yield self
+            except BaseException:
+                self._depth -= 1
+                if self._depth == 0:
+                    self._db.execute("ROLLBACK")
+                raise
+            else:
+                self._depth -= 1
+                if self._depth == 0:
+                    self._db.execute("COMMIT")
+
+    def upsert_articles(self, article_dicts, collection="articles"):
+        """
+        Insert or replace articles in one transaction
+        :param article_dicts: iterable of dicts as returned by Article._create_instance_dict
+        :param collection: "articles" or "_root_articles"
+        :return: number of written articles
+        """
+        count = 0
+        with metrics.timer("store_write_seconds", "time of a store write transaction", table="articles"), self.transaction():
+            for data in article_dicts:
+                article_id = self._db.execute(
+                    "INSERT INTO articles (collection, title, autosave, revision, touched) VALUES (?, ?, ?, ?, ?) "
+                    "ON CONFLICT (collection, title) DO UPDATE SET autosave = excluded.autosave, "
+                    "revision = excluded.revision, touched = excluded.touched RETURNING id",
+                    (collection, data["title"], int(data["autosave"]), data.get("revision"),
+                     data.get("touched"))).fetchone()[0]
+                for key, (table, column) in ARTICLE_SETS.items():
+                    self._db.execute(f"DELETE FROM {table} WHERE article_id = ?", (article_id,))
+                    self._db.executemany(f"INSERT OR IGNORE INTO {table} (article_id, {column}) VALUES (?, ?)",
+                                         ((article_id, value) for value in data.get(key, ())))
+                count += 1
+        metrics.counter("store_writes", "instances written to the store").inc(count, table="articles")
+        return count
+
+    def upsert_categories(self, category_dicts):
+        """
+        Insert or replace categories in one transaction
+        :param category_dicts: iterable of dicts as returned by Category._create_instance_dict
+        :return: number of written categories
+        """
+        count = 0
+        with metrics.timer("store_write_seconds", "time of a store write transaction", table="categories"), self.transaction():
+            for data in category_dicts:
+                category_id = self._db.execute(
+                    "INSERT INTO categories (title, autosave) VALUES (?, ?) "
+                    "ON CONFLICT (title) DO UPDATE SET autosave = excluded.autosave RETURNING id",
+                    (data["title"], int(data["autosave"]))).fetchone()[0]
+                self._db.execute("DELETE FROM category_articles WHERE category_id = ?", (category_id,))
+                self._db.executemany("INSERT OR IGNORE INTO category_articles (category_id, article) VALUES (?, ?)",
+                                     ((category_id, article) for article in data["articles"]))
+                count += 1
+        metrics.counter("store_writes", "instances written to the store").inc(count, table="categories")
+        return count
+
+    def _select_articles(self, where, params):
+        columns = ", ".join(f"(SELECT json_group_array({column}) FROM {table} WHERE article_id = a.id)"
+                            for table, column in ARTICLE_SETS.values())
+        with self._lock:
+            rows = self._db.execute(f"SELECT a.title, a.autosave, a.revision, a.touched, {columns} FROM articles a "
+                                    f"WHERE {where} ORDER BY a.id", params).fetchall()
+        for title, autosave, revision, touched, *sets in rows:
+            data = {"type": "Article", "autosave": bool(autosave), "title": title, "revision": revision,
+                    "touched": touched}
+            for key, values in zip(ARTICLE_SETS, sets):
+                data[key] = json.loads(values)
+            yield data
+
+    def _select_categories(self, where, params):
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT c.title, c.autosave, "
+                "(SELECT json_group_array(article) FROM category_articles WHERE category_id = c.id) "
+                f"FROM categories c WHERE {where} ORDER BY c.id", params).fetchall()
+        for title, autosave, articles in rows:
+            yield {"type": "Category", "autosave": bool(autosave), "title": title, "articles": json.loads(articles)}
+
+    def load_article_dicts(self, collection="articles"):
+        """
+        Load all articles of a collection with a single query
+        :param collection: "articles" or "_root_articles"
+        :return: list of article dicts
+        """
+        return list(self._select_articles("a.collection = ?", (collection,)))
+
+    def load_category_dicts(self):
+        """
+        Load all categories with a single query
+        :return: list of category dicts
+        """
+        return list(self._select_categories("1", ()))
+
+    def get_article_dict(self, title, collection="articles"):
+        """
+        :param title: article title
+        :param collection: "articles" or "_root_articles"
+        :return: article dict or None if the article is not in the store
+        """
+        return next(self._select_articles("a.collection = ? AND a.title = ?", (collection, title)), None)
+
+    def get_category_dict(self, title):
+        """
+        :param title: category title
+        :return: category dict or None if the category is not in the store
+        """
+        return next(self._select_categories("c.title = ?", (title,)), None)
+
+    def iter_article_titles(self, collection="articles"):
+        """ :return: iterator over the titles of all articles in a collection """
+        with self._lock:
+            rows = self._db.execute("SELECT title FROM articles WHERE collection = ? ORDER BY id", (collection,)).fetchall()
+        return (row[0] for row in rows)
+
+    def iter_relations(self, collection="articles"):
+        """ :return: iterator over (title, linked title) pairs of all articles in a collection """
+        with self._lock:
+            rows = self._db.execute("SELECT a.title, r.target FROM article_relations r JOIN articles a ON a.id = r.article_id "
+                                    "WHERE a.collection = ? ORDER BY a.id", (collection,)).fetchall()
+        return iter(rows)
+
+    def iter_categories(self, collection="articles", category_attr="related_cats"):
+        """
+        :param category_attr: "related_cats" or "root_cats"
+        :return: iterator over (title, category) pairs of all articles in a collection
+        """
+        table = {"related_cats": "article_related_cats", "root_cats": "article_root_cats"}[category_attr]
+        with self._lock:
+            rows = self._db.execute(f"SELECT a.title, c.category FROM {table} c JOIN articles a ON a.id = c.article_id "
+                                    "WHERE a.collection = ? ORDER BY a.id", (collection,)).fetchall()
+        return iter(rows)
+
+    def has_article(self, title, collection="articles"):
+        with self._lock:
+            return self._db.execute("SELECT 1 FROM articles WHERE collection = ? AND title = ?",
+                                    (collection, title)).fetchone() is not None
+
+    def count_articles(self, collection="articles"):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM articles WHERE collection = ?", (collection,)).fetchone()[0]
+
+    def count_categories(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM categories").fetchone()[0]
+
+    def import_json_tree(self, saved_dir, batch_size=1000):
+        """
+        Migrate a directory tree of json files into the store:
+
+            saved_dir
+             ├─── categories        -> categories
+             ├─── articles          -> collection "articles"
+             └─── _root_articles    -> collection "_root_articles"
+
+        :param saved_dir: path to the "saved" directory
+        :param batch_size: number of instances written per transaction
+        :return: dict mapping the imported directories to the number of imported instances
+        """
+        imported = {}
+        for directory in ("categories", "articles", "_root_articles"):
+            files = glob.glob(os.path.join(saved_dir, directory, "*.json"))
+            batch = []
+            count = 0
+            for file in tqdm.tqdm(files, desc=f"Importing {directory}"):
+                with open(file, "r") as json_file:
+                    batch.append(json.load(json_file))
+                if len(batch) >= batch_size:
+                    count += self._import_batch(directory, batch)
+                    batch = []
+            count += self._import_batch(directory, batch)
+            imported[directory] = count
+        return imported
+
+    def _import_batch(self, directory, batch):
+        if directory == "categories":
+            return self.upsert_categories(batch)
+        return self.upsert_articles(batch, collection=directory)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def __str__(self):
+        return (f"ArticleStore {self.path}: {self.count_articles()} articles, "
+                f"{self.count_articles('_root_articles')} root articles, {self.count_categories()} categories")
@@ -0,0 +1,156 @@
+import os
+import time
+import sqlite3
+import threading
+from collections import namedtuple
+from urllib.parse import unquote
+
+API_URL = "https://en.wikipedia.org/w/api.php"
+
+
+class TitleStatus(namedtuple("TitleStatus", ["status", "target"])):
+    """ status is one of "exists", "missing" or "redirect". target is the title a redirect points to. """
+    __slots__ = ()
+
+    @property
+    def exists(self):
+        return self.status != "missing"
+
+
+def get_default_resolver_path():
+    """ :return: path of the persistent title table, saved/titles.sqlite """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    return os.path.join(root, "saved", "titles.sqlite")
+
+
+def api_title(title):
+    """
+    Convert a title as used in article urls (underscores, percent encoding) to the form used by the MediaWiki api
+    :param title: title or url of an article, of the wiki set with set_wiki_base or of en.wikipedia.org
+    :return: title with spaces
+    """
+    # scraping imports this module, and its base can be changed at runtime
+    from util import scraping
+    for prefix in (f"{scraping.WIKI_BASE}/wiki/", "https://en.wikipedia.org/wiki/"):
+        if title.startswith(prefix):
+            title = title[len(prefix):]
+            break
+    return unquote(title).replace("_", " ").strip()
+
+
+def url_title(title):
+    """ inverse of api_title: replace spaces by underscores """
+    return title.replace(" ", "_")
+
+
+class TitleResolver:
+    """
+    Checks whether wikipedia pages exist, asking the MediaWiki query api about up to 50 titles per request.
+    Results (exists / missing / redirect target) are memoized in a persistent sqlite table,
+    so every title is only requested once.
+    """
+    BATCH_SIZE = 50
+
+    def __init__(self, get, path=None, api_url=API_URL):
+        """
+        Initialize a resolver
+        :param get: function(url, params) returning a response, e.g. util.scraping.http_get
+        :param path: path of the sqlite table. Default: saved/titles.sqlite
+        :param api_url: url of api.php
+        """
+        self.get = get
+        self.api_url = api_url
+        self.path = get_default_resolver_path() if path is None else path
+        self.requests = 0
+
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS titles (
+                title TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                target TEXT,
+                checked_at REAL NOT NULL
+            )""")
+        self._db.commit()
+
+    def lookup(self, title):
+        """
+        Memoized status of a title, without making a request
+        :param title: article title
+        :return: TitleStatus or None if the title has not been resolved yet
+        """
+        with self._lock:
+            row = self._db.execute("SELECT status, target FROM titles WHERE title = ?", (api_title(title),)).fetchone()
+        return None if row is None else TitleStatus(*row)
+
+    def resolve(self, titles):
+        """
+        Get the status of many titles. Unknown titles are requested in batches of BATCH_SIZE.
+        :param titles: iterable of article titles
+        :return: dict mapping each title to its TitleStatus. Titles the api could not be asked about map to None.
+        """
+        titles = list(dict.fromkeys(titles))
+        results = {title: self.lookup(title) for title in titles}
+
+        unknown = list(dict.fromkeys(api_title(title) for title, status in results.items() if status is None))
+        resolved = {}
+        for i in range(0, len(unknown), self.BATCH_SIZE):
+            batch_result = self._query(unknown[i:i + self.BATCH_SIZE])
+            if batch_result is not None:
+                resolved.update(batch_result)
+
+        if resolved:
+            now = time.time()
+            with self._lock:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO titles (title, status, target, checked_at) VALUES (?, ?, ?, ?)",
+                    [(title, status.status, status.target, now) for title, status in resolved.items()])
+                self._db.commit()
+
+        for title, status in results.items():
+            if status is None:
+                results[title] = resolved.get(api_title(title))
+        return results
+
+    def _query(self, titles):
+        """
+        Ask the api about a single batch of titles
+        :param titles: list of at most BATCH_SIZE api titles
+        :return: dict mapping the given titles to TitleStatus, None if the request failed
+        """
+        params = {
+            "action": "query",
+            "format": "json",
+            "formatversion": "2",
+            "redirects": "1",
+            "titles": "|".join(titles),
+        }
+        response = self.get(self.api_url, params=params)
+        self.requests += 1
+        if response.status_code != 200:
+            print("Error resolving titles:", response.status_code)
+            return None
+
+        query = response.json().get("query", {})
+        normalized = {entry["from"]: entry["to"] for entry in query.get("normalized", [])}
+        redirects = {entry["from"]: entry["to"] for entry in query.get("redirects", [])}
+        missing = {page["title"] for page in query.get("pages", []) if page.get("missing") or page.get("invalid")}
+
+        results = {}
+        for title in titles:
+            current = normalized.get(title, title)
+            if current in redirects:
+                target = redirects[current]
+                status = "missing" if target in missing else "redirect"
+                results[title] = TitleStatus(status, url_title(target))
+            elif current in missing:
+                results[title] = TitleStatus("missing", None)
+            else:
+                results[title] = TitleStatus("exists", None)
+        return results
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM titles").fetchone()[0]
@@ -0,0 +1,176 @@
+from urllib.parse import quote
+from util.html_extract import url_encode
+from util.title_resolver import api_title
+
+API_URL = "https://en.wikipedia.org/w/api.php"
+
+
+class ApiError(Exception):
+    """ an api request (or one of its continuation requests) failed, so its result would be incomplete """
+
+
+def href_title(title):
+    """
+    Convert a title returned by the api ("Gödel's theorem") to the form used in article hrefs and therefore
+    in saved articles ("G%C3%B6del%27s_theorem"), so both backends produce the same titles
+    :param title: api title
+    :return: title as extracted from an article href
+    """
+    return url_encode(quote(title.replace(" ", "_"), safe=";@$!*(),/~:"))
+
+
+class WikiApi:
+    """
+    Backend for the MediaWiki action api (api.php). Compared to scraping rendered html, responses only contain
+    the requested data (no navboxes or page chrome), continuation is followed so results are complete,
+    and up to BATCH_SIZE titles are requested per call.
+    """
+    BATCH_SIZE = 50
+
+    def __init__(self, get, api_url=API_URL):
+        """
+        :param get: function(url, params, fresh) returning a response, e.g. util.scraping.http_get
+        :param api_url: url of api.php, can point to a local stand-in server
+        """
+        self.get = get
+        self.api_url = api_url
+        self.requests = 0
+
+    def query(self, params, fresh=False):
+        """
+        Run an action=query request and follow its continuation
+        :param params: query parameters (action, format and formatversion are added)
+        :param fresh: do not serve responses from the cache without revalidating them
+        :return: iterator over the "query" part of every response
+        :raises ApiError: if a request fails, also after earlier parts were yielded
+        """
+        params = dict(params, action="query", format="json", formatversion="2")
+        continuation = {}
+        while True:
+            response = self.get(self.api_url, params=dict(params, **continuation), fresh=fresh)
+            self.requests += 1
+            if response.status_code != 200:
+                raise ApiError(f"Error querying api: status {response.status_code}")
+            data = response.json()
+            if "error" in data:
+                raise ApiError(f"Error querying api: {data['error'].get('info', data['error'])}")
+            yield data.get("query", {})
+            if "continue" not in data:
+                return
+            continuation = data["continue"]
+
+    def pages(self, titles, props=("links", "categories", "info"), fresh=False):
+        """
+        Get links, categories and/or revision info of many pages, BATCH_SIZE titles per request
+        :param titles: iterable of article titles (as in saved articles, with underscores)
+        :param props: "links" (links to articles), "categories" (normal categories) and/or "info" (revision)
+        :param fresh: do not serve responses from the cache without revalidating them
+        :return: dict mapping each title to a dict with
+            status: "ok", "redirect", "missing" or "error" (a request of its batch failed, nothing else is known)
+            canonical_title: title of the page the title resolves to
+            links: list of linked article titles
+            categories: list of category titles ("Category:Fields_of_mathematics")
+            revision: id of the current revision (lastrevid), None without "info"
+            touched: timestamp of the last change of the page, None without "info"
+        """
+        titles = list(dict.fromkeys(titles))
+        params = {"prop": "|".join(props), "redirects": "1"}
+        if "links" in props:
+            params.update(plnamespace="0", pllimit="max")
+        if "categories" in props:
+            params.update(clshow="!hidden", cllimit="max")
+
+        results = {}
+        for i in range(0, len(titles), self.BATCH_SIZE):
+            batch = titles[i:i + self.BATCH_SIZE]
+            api_titles = {title: api_title(title) for title in batch}
+            try:
+                mapping, pages = self._collect_pages(dict(params, titles="|".join(api_titles.values())), fresh)
+            except ApiError as error:
+                print(error)
+                for title in batch:
+                    results[title] = {"status": "error", "canonical_title": None, "links": [], "categories": [],
+                                      "revision": None, "touched": None}
+                continue
+            for title, requested in api_titles.items():
+                current = mapping["normalized"].get(requested, requested)
+                target = mapping["redirects"].get(current, current)
+                page = pages.get(target)
+                if page is None or page.get("missing") or page.get("invalid"):
+                    results[title] = {"status": "missing", "canonical_title": None, "links": [], "categories": [],
+                                      "revision": None, "touched": None}
+                    continue
+                results[title] = {
+                    "status": "redirect" if target != current else "ok",
+                    "canonical_title": href_title(target),
+                    "links": [href_title(link["title"]) for link in page.get("links", [])],
+                    "categories": [category["title"].replace(" ", "_") for category in page.get("categories", [])],
+                    "revision": page.get("lastrevid"),
+                    "touched": page.get("touched"),
+                }
+        return results
+
+    def _collect_pages(self, params, fresh=False):
+        """
+        Merge the (continued) responses of a multi-title query
+        :return: ({"normalized": {from: to}, "redirects": {from: to}}, dict mapping page title to merged page)
+        """
+        mapping = {"normalized": {}, "redirects": {}}
+        pages = {}
+        for query in self.query(params, fresh):
+            for key in mapping:
+                mapping[key].update({entry["from"]: entry["to"] for entry in query.get(key, [])})
+            for page in query.get("pages", []):
+                merged = pages.setdefault(page["title"], {key: value for key, value in page.items()
+                                                          if key not in ("links", "categories")})
+                for key in ("links", "categories"):
+                    if key in page:
+                        merged.setdefault(key, []).extend(page[key])
+        return mapping, pages
+
+    def links(self, titles):
+        """
+        :param titles: iterable of article titles
+        :return: dict mapping each title to the list of linked article titles, None for missing pages
+            and pages whose links could not be requested completely
+        """
+        return {title: page["links"] if page["status"] in ("ok", "redirect") else None
+                for title, page in self.pages(titles, props=("links",)).items()}
+
+    def revisions(self, titles, fresh=True):
+        """
+        Current revisions of many pages, BATCH_SIZE titles per request and without page content
+        :param titles: iterable of article titles
+        :param fresh: revalidate cached responses, so the revisions are current
+        :return: dict mapping each title to a dict with status, canonical_title, revision and touched (see pages)
+        """
+        return self.pages(titles, props=("info",), fresh=fresh)
+
+    def category_members(self, category, member_type="page"):
+        """
+        All members of a category, following cmcontinue
+        :param category: category title with or without "Category:" prefix
+        :param member_type: "page" (articles), "subcat" or "file"
+        :return: list of member titles, None if any request failed
+        """
+        category = category.split("/wiki/", 1)[-1]
+        if not category.startswith("Category:"):
+            category = f"Category:{category}"
+        params = {"list": "categorymembers", "cmtitle": category.replace("_", " "), "cmtype": member_type,
+                  "cmlimit": "max"}
+        if member_type == "page":
+            params["cmnamespace"] = "0"
+
+        members = []
+        try:
+            for query in self.query(params):
+                for member in query.get("categorymembers", []):
+                    if member_type == "page":
+                        members.append(href_title(member["title"]))
+                    else:
+                        members.append(member["title"].replace(" ", "_"))
+        except ApiError as error:
+            # a partial member list would look complete to the caller
+            print(error)
+            return None
+        return members
@@ -1,7 +1,7 @@
 import matplotlib.pyplot as plt
-import tqdm
 from statistics import mean, stdev
-from util.classes import load_all_categories, load_all_articles, Article
+from util.classes import load_all_categories, load_all_articles
+from util.graph import LinkGraph
 from counting import count_cat_occurrences_in_articles
 
 
@@ -24,10 +24,13 @@ def draw_horizontal_bar_chart(plot_dict, title="", xlabel="", ylabel=""):
     plt.show()
 
 
-def draw_category_article_number(categories, n=0):
+def draw_category_article_number(categories, articles, n=0, hops=1):
     """
     Counts the articles belonging to each category and represents the data in a bar chart
     :param categories: list of category objects
+    :param articles: list of (lazy) article objects
+    :param hops: also count the distinct articles reachable from the articles of each category within 1 .. hops links,
+        without the articles of the category itself
     :return:
     """
 
@@ -50,61 +53,57 @@ def draw_category_article_number(categories, n=0):
 
 
 
-    loaded_articles = {}
-    related_article_count = {}
-    for category in categories:
-        related_article_count[category.title.replace("Category:", "").replace("_", " ")] = 0
-        for article_title in category.articles:
-            _current_article = None
-            if article_title not in loaded_articles:
-                _current_article = Article(article_title, autosave=False)
-                loaded_articles[article_title] = _current_article
-            else:
-                _current_article = loaded_articles[article_title]
-            related_article_count[category.title.replace("Category:", "").replace("_", " ")] += len(_current_article.relations)
+    # distinct articles reachable within 1 .. hops links, all categories in one pass over the link graph
+    graph = LinkGraph.from_articles(articles)
+    short_titles = [category.title.replace("Category:", "").replace("_", " ") for category in categories]
+    _, reachable = graph.reachable_counts(hops, {title: category.articles for title, category in zip(short_titles, categories)})
+    # the counts are cumulative and include the sources (hop 0), only count the related articles
+    reachable = reachable - reachable[0]
 
-    # sort and get max name length
-    # related_article_count = dict(sorted(related_article_count.items(), key=lambda item: item[1], reverse=True))
-    related_article_count = {key: related_article_count[key] for key in cat_article_count.keys()}
-    # related_article_count = dict(sorted(related_article_count.items(), key=lambda item: item[1], reverse=True))
-    max_name_length = max(map(len, related_article_count.keys()))
+    related_article_counts = []
+    for hop in range(1, hops + 1):
+        related_article_count = dict(zip(short_titles, reachable[hop].tolist()))
+        related_article_count = {key: related_article_count[key] for key in cat_article_count.keys()}
+        related_article_counts.append(related_article_count)
+        max_name_length = max(map(len, related_article_count.keys()))
 
-    # print and draw
-    for category, num_articles in related_article_count.items():
-        print(f"\033[34;1m{category.ljust(max_name_length)}: {num_articles} Related Articles (1st degree)\033[31;0m")
-    print(f"-> Mean: {mean(related_article_count.values())}")
-    print(f"-> Standard Deviation: {stdev(related_article_count.values())}")
-    print()
+        # print and draw
+        for category, num_articles in related_article_count.items():
+            print(f"\033[34;1m{category.ljust(max_name_length)}: {num_articles} Related Articles (within {hop} links)\033[31;0m")
+        print(f"-> Mean: {mean(related_article_count.values())}")
+        print(f"-> Standard Deviation: {stdev(related_article_count.values())}")
+        print()
 
     # draw_horizontal_bar_chart(related_article_count, title="Number of related Articles", xlabel="Articles", ylabel="Category")
 
     """ representation as bar chart """
-    # Create a figure with two subplots arranged side by side
-    fig, axs = plt.subplots(1, 2, figsize=(12, 6))
+    # Create a figure with one subplot per chart arranged side by side
+    fig, axs = plt.subplots(1, 1 + hops, figsize=(6 * (1 + hops), 6))
 
     # Plot the first bar chart (directly linked articles)
-    bars1 = axs[0].barh(list(cat_article_count.keys())[::-1], list(cat_article_count.values())[::-1], color='blue')
+    bars = [axs[0].barh(list(cat_article_count.keys())[::-1], list(cat_article_count.values())[::-1], color='blue')]
     axs[0].set_title('Directly Linked Articles')
     axs[0].set_xlabel('Number of Articles')
 
-    # Plot the second bar chart (indirectly linked articles)
-    bars2 = axs[1].barh(list(related_article_count.keys())[::-1], list(related_article_count.values())[::-1],
-                        color='green')
-    axs[1].set_title('Indirectly Linked Articles')
-    axs[1].set_xlabel('Number of Articles')
-    axs[1].set_yticklabels([])
+    # Plot the other bar charts (articles reachable within 1 .. hops links)
+    for hop, related_article_count in enumerate(related_article_counts, start=1):
+        bars.append(axs[hop].barh(list(related_article_count.keys())[::-1], list(related_article_count.values())[::-1],
+                                  color='green'))
+        axs[hop].set_title('Indirectly Linked Articles' if hop == 1 else f'Articles within {hop} Links')
+        axs[hop].set_xlabel('Number of Articles')
+        axs[hop].set_yticklabels([])
 
-    for i, bars in enumerate([bars1, bars2]):
-        for bar in bars:
+    for i, category_bars in enumerate(bars):
+        for bar in category_bars:
             axs[i].text(bar.get_width(), bar.get_y() + bar.get_height() / 2, f'{bar.get_width():.0f}', ha='left',
                             va='center', color='black')
 
     # Configure grid and layout
-    axs[0].grid(axis='x', which='both', linestyle='dashed', linewidth=0.8, color='gray')
-    axs[1].grid(axis='x', which='both', linestyle='dashed', linewidth=0.8, color='gray')
+    for ax in axs:
+        ax.grid(axis='x', which='both', linestyle='dashed', linewidth=0.8, color='gray')
     plt.tight_layout()
 
-    # Show the combined figure with both bar charts
+    # Show the combined figure with all bar charts
     plt.show()
 
     if n == 2:
@@ -119,8 +118,9 @@ def draw_category_article_number(categories, n=0):
 if __name__ == "__main__":
 
     categories = load_all_categories("./saved/categories", autosave=False)
-    articles = load_all_articles("./saved/articles", autosave=False)
-    draw_category_article_number(categories, n=2)
+    # lazy: only the relations and related categories of the articles are read
+    articles = load_all_articles("./saved/articles", autosave=False, lazy=True)
+    draw_category_article_number(categories, articles, n=2, hops=3)
 
 
     pass